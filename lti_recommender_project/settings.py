@@ -98,6 +98,16 @@ LTI_TOOL_CONFIG = {
     'MOODLE_JWKS_URL': 'http://localhost/stable_main/mod/lti/certs.php', # Ej: https://your-moodle.com/mod/lti/certs.php
 }
 
+# Configuración del motor de recomendaciones (ver recommender_app/conf.py para todas las opciones)
+RECOMMENDER_CONFIG = {
+    'RECOMMENDATION_COUNT': 5,
+    'NEIGHBORS_TOP_K': 50,
+    # Devuelve la página del lanzamiento sin esperar a las recomendaciones.
+    'DEFERRED_LAUNCH': True,
+    # Límites de admisión comunes a todos los workers (a través de la caché compartida).
+    'RATE_LIMIT_BACKEND': 'cache',
+}
+
 WSGI_APPLICATION = 'lti_recommender_project.wsgi.application'
 
 
@@ -152,9 +162,17 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# Caché compartida por todos los procesos de la máquina (memoria del proceso + SQLite en WAL):
+# el estado OIDC que guarda lti_login lo lee lti_launch aunque llegue a otro worker.
+# Ver recommender_app/cache_backend.py.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake', # Un nombre único para tu caché
+        'BACKEND': 'recommender_app.cache_backend.TwoTierCache',
+        'LOCATION': BASE_DIR / 'recommender_data' / 'cache.sqlite3',
+        # El valor por defecto (300) es demasiado pequeño para la caché de recomendaciones por estudiante.
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'L1_TIMEOUT': 2, 'L1_MAX_ENTRIES': 5000},
     }
-}
\ No newline at end of file
+}
+
+# Las pruebas usan una caché como la de arriba pero en un directorio temporal.
+TEST_RUNNER = 'recommender_app.test_runner.RecommenderTestRunner'
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EducationalResource, UserInteraction
+from .models import CourseMembership, CourseTitle, EducationalResource, InteractionDailyRollup, UserInteraction
 
 @admin.register(EducationalResource)
 class EducationalResourceAdmin(admin.ModelAdmin):
@@ -15,4 +15,31 @@ class UserInteractionAdmin(admin.ModelAdmin):
     search_fields = ('lti_user_id', 'lti_context_id', 'resource__title', 'interaction_type')
     list_filter = ('interaction_type', 'lti_context_id', 'timestamp')
     raw_id_fields = ('resource',) # Utiliza un widget de búsqueda para ForeignKey
-    readonly_fields = ('timestamp',)
\ No newline at end of file
+    readonly_fields = ('timestamp',)
+
+
+@admin.register(InteractionDailyRollup)
+class InteractionDailyRollupAdmin(admin.ModelAdmin):
+    # Las consultas por curso y fecha van aquí: no recorren la tabla de interacciones en bruto.
+    list_display = ('day', 'lti_context_id', 'resource', 'interaction_type', 'count', 'value_sum')
+    list_filter = ('interaction_type', 'lti_context_id', 'day')
+    date_hierarchy = 'day'
+    raw_id_fields = ('resource',)
+    readonly_fields = ('day', 'lti_context_id', 'resource', 'interaction_type', 'count', 'value_sum', 'value_count')
+
+
+@admin.register(CourseMembership)
+class CourseMembershipAdmin(admin.ModelAdmin):
+    # Lo escribe roster.sync_members con cada descarga de NRPS.
+    list_display = ('lti_context_id', 'lti_user_id', 'synced_at')
+    search_fields = ('lti_context_id', 'lti_user_id')
+    list_filter = ('lti_context_id',)
+    readonly_fields = ('lti_context_id', 'lti_user_id', 'synced_at')
+
+
+@admin.register(CourseTitle)
+class CourseTitleAdmin(admin.ModelAdmin):
+    # Lo escribe el lanzamiento LTI (snapshots.remember_course_title).
+    list_display = ('lti_context_id', 'title', 'updated_at')
+    search_fields = ('lti_context_id', 'title')
+    readonly_fields = ('updated_at',)
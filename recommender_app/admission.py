@@ -0,0 +1,207 @@
+# lti_recommender_project/recommender_app/admission.py
+
+"""
+Control de admisión de los endpoints de interacciones.
+
+Un cliente con un bucle defectuoso o una clase entera enviando eventos a la vez pueden
+saturar la base de datos que también usa lti_launch. Antes de procesar una petición:
+
+1. Límite global de concurrencia: como mucho INTERACTION_MAX_CONCURRENCY peticiones de
+   interacciones a la vez en este proceso; el resto se rechaza en el acto (load shedding).
+2. Cubetas de tokens por lti_user_id y por lti_context_id: cada evento gasta un token y
+   las cubetas se rellenan a RATE_LIMIT_*_RATE tokens por segundo hasta RATE_LIMIT_*_BURST.
+   Un lote se admite entero o se rechaza entero.
+
+Los rechazos responden 429 con Retry-After. Con RATE_LIMIT_BACKEND = 'process' las cubetas
+viven en la memoria del proceso (LRU acotado, como sampling.py), así que no cuestan ninguna
+consulta, pero cada worker aplica sus propios límites. Con 'cache' las mismas cubetas se
+comparten entre procesos: el estado de cada una (tokens, instante) se guarda en la caché de
+Django y las de una petición se actualizan juntas con un compare-and-set
+(cache_backend.TwoTierCache.compare_and_set_many), una sola transacción de escritura por
+petición admitida; un rechazo no escribe nada. Los contadores admission.* se exponen en
+/api/metrics/.
+"""
+
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conf import get_setting
+from . import metrics
+
+MAX_BUCKETS = 100000
+
+
+class TokenBuckets:
+    """Cubetas de tokens por clave con un LRU acotado (las cubetas olvidadas vuelven llenas)."""
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _level(self, key, rate, burst, now):
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        return min(burst, tokens + (now - updated_at) * rate)
+
+    def take(self, costs, now=None):
+        """
+        `costs` es una lista de (clave, coste, ritmo, capacidad). Si todas las cubetas tienen
+        tokens suficientes los gasta y devuelve (True, 0, None); si no, no gasta nada y devuelve
+        (False, segundos hasta poder admitir la petición, clave que la rechaza).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels = {}
+            for key, cost, rate, burst in costs:
+                level = self._level(key, rate, burst, now)
+                if cost > burst:
+                    return False, math.inf, key
+                if level < cost:
+                    return False, (cost - level) / rate, key
+                levels[key] = level - cost
+            for key, level in levels.items():
+                self._buckets[key] = (level, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return True, 0, None
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheTokenBuckets:
+    """
+    Cubetas de tokens compartidas entre procesos a través de la caché de Django, con la misma
+    interfaz que TokenBuckets. Requiere una caché con compare_and_set_many (TwoTierCache).
+    """
+
+    GENERATION_KEY = 'admission:generation'
+    # Intentos de compare-and-set cuando otro proceso cambia las mismas cubetas a la vez.
+    MAX_ATTEMPTS = 5
+
+    @staticmethod
+    def _cache_key(generation, key):
+        digest = hashlib.sha1(str(key[1]).encode('utf-8')).hexdigest()
+        return f"admission:{generation}:{key[0]}:{digest}"
+
+    def take(self, costs, now=None):
+        if not hasattr(cache, 'compare_and_set_many'):
+            raise ValueError("RATE_LIMIT_BACKEND = 'cache' requiere una caché con compare_and_set_many (cache_backend.TwoTierCache).")
+        if not costs:
+            return True, 0, None
+        generation = cache.get(self.GENERATION_KEY, 0)
+        buckets = {self._cache_key(generation, cost[0]): cost for cost in costs}
+        # Una cubeta sin clave está llena: basta con que la entrada dure lo que tarda en llenarse.
+        timeout = math.ceil(max(burst / rate for _, _, rate, burst in costs)) + 1
+        for _ in range(self.MAX_ATTEMPTS):
+            current = time.time() if now is None else now
+            stored = cache.get_many(buckets)
+            updates = {}
+            for cache_key, (key, cost, rate, burst) in buckets.items():
+                if cost > burst:
+                    return False, math.inf, key
+                previous = stored.get(cache_key)
+                tokens, updated_at = previous if previous is not None else (burst, current)
+                level = min(burst, tokens + max(current - updated_at, 0.0) * rate)
+                if level < cost:
+                    return False, (cost - level) / rate, key
+                updates[cache_key] = (previous, (level - cost, current))
+            if cache.compare_and_set_many(updates, timeout=timeout):
+                return True, 0, None
+            metrics.incr('admission.conflict')
+        return False, 1, costs[0][0]
+
+    def clear(self):
+        try:
+            cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            cache.set(self.GENERATION_KEY, 1, timeout=None)
+
+
+buckets = TokenBuckets()
+shared_buckets = CacheTokenBuckets()
+RATE_LIMIT_BACKENDS = ('process', 'cache')
+
+
+def _buckets():
+    backend = get_setting('RATE_LIMIT_BACKEND')
+    if backend not in RATE_LIMIT_BACKENDS:
+        raise ValueError(f"RATE_LIMIT_BACKEND debe ser uno de {RATE_LIMIT_BACKENDS}, no {backend!r}.")
+    return shared_buckets if backend == 'cache' else buckets
+
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def _too_many(reason, retry_after):
+    metrics.incr(f'admission.rejected.{reason}')
+    retry_after = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 60
+    return Response(
+        {'error': 'Demasiadas peticiones. Inténtalo de nuevo más tarde.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)},
+    )
+
+
+def _costs(events):
+    """Cubetas a consultar para un lote: un token por evento en la de su usuario y en la de su curso."""
+    users, contexts = Counter(), Counter()
+    for event in events:
+        if isinstance(event, dict):
+            if event.get('lti_user_id'):
+                users[event['lti_user_id']] += 1
+            if event.get('lti_context_id'):
+                contexts[event['lti_context_id']] += 1
+    costs = []
+    user_rate, user_burst = get_setting('RATE_LIMIT_USER_RATE'), get_setting('RATE_LIMIT_USER_BURST')
+    if user_rate:
+        costs += [(('user', user_id), count, user_rate, user_burst) for user_id, count in users.items()]
+    context_rate, context_burst = get_setting('RATE_LIMIT_CONTEXT_RATE'), get_setting('RATE_LIMIT_CONTEXT_BURST')
+    if context_rate:
+        costs += [(('context', context_id), count, context_rate, context_burst) for context_id, count in contexts.items()]
+    return costs
+
+
+def limit_interactions(events_of):
+    """
+    Decorador para vistas de interacciones (debajo de @api_view). `events_of(request.data)`
+    devuelve la lista de eventos de la petición, o None si no tiene forma válida (en ese caso
+    decide la vista).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            global _in_flight
+            max_concurrency = get_setting('INTERACTION_MAX_CONCURRENCY')
+            with _in_flight_lock:
+                if max_concurrency and _in_flight >= max_concurrency:
+                    overloaded = True
+                else:
+                    overloaded = False
+                    _in_flight += 1
+            if overloaded:
+                return _too_many('concurrency', 1)
+            try:
+                events = events_of(request.data)
+                if events:
+                    admitted, retry_after, key = _buckets().take(_costs(events))
+                    if not admitted:
+                        return _too_many(key[0], retry_after)
+                metrics.incr('admission.accepted')
+                return view(request, *args, **kwargs)
+            finally:
+                with _in_flight_lock:
+                    _in_flight -= 1
+        return wrapper
+    return decorator
@@ -0,0 +1,191 @@
+# lti_recommender_project/recommender_app/ann_index.py
+
+"""
+Índice aproximado de vecinos más cercanos (ANN) para "más como este".
+
+Cada recurso se representa con un vector denso normalizado (bolsa de palabras con hashing,
+o cualquier embedding local con la misma forma). El índice usa LSH de proyecciones
+aleatorias: para cada una de las T tablas, B hiperplanos aleatorios generan un código de
+B bits por vector, y los vectores con el mismo código comparten cubeta. Una consulta
+recoge los candidatos de su cubeta en cada tabla (más las cubetas vecinas con `probes`)
+y los re-ordena con el producto escalar exacto.
+
+Todo se guarda como arreglos NumPy planos (.npy) en un artefacto versionado
+(INDEX_DIR/ann_index, ver artifacts.py) y se abre con mmap en modo lectura. Lo consulta el
+endpoint api/resources/<pk>/similar/ (recommendations.similar_resources).
+"""
+
+import logging
+import zlib
+
+import numpy as np
+
+from .artifacts import ArtifactLoader, publish
+from .content_index import _document_terms
+from .models import EducationalResource
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_KIND = 'ann_index'
+
+DEFAULT_DIM = 256
+
+_ARRAYS = ('planes', 'vectors', 'ids', 'id_order', 'bucket_codes', 'bucket_items')
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def hashed_vectors(rows, dim=DEFAULT_DIM):
+    """
+    Vectores de bolsa de palabras con hashing con signo (mismos términos y pesos que el índice TF-IDF).
+    Se usa crc32 en lugar de hash() para que el resultado no dependa del proceso.
+    """
+    vectors = np.zeros((len(rows), dim), dtype=np.float32)
+    for row_number, row in enumerate(rows):
+        for term, count in _document_terms(row).items():
+            digest = zlib.crc32(term.encode('utf-8'))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vectors[row_number, digest % dim] += sign * (1.0 + np.log(count))
+    return _normalize(vectors)
+
+
+class LSHIndex:
+    """
+    Índice LSH de proyecciones aleatorias con re-ordenación exacta.
+    `bucket_codes[t]` son los códigos de la tabla t ordenados y `bucket_items[t]` las filas
+    correspondientes, de modo que cada cubeta es un rango contiguo localizado con searchsorted.
+    """
+
+    def __init__(self, planes, vectors, ids, id_order, bucket_codes, bucket_items):
+        self.planes = planes
+        self.vectors = vectors
+        self.ids = ids
+        self.id_order = id_order
+        self.bucket_codes = bucket_codes
+        self.bucket_items = bucket_items
+        n_tables, n_bits, dim = planes.shape
+        self._flat_planes = np.ascontiguousarray(planes).reshape(n_tables * n_bits, dim)
+        self._powers = (1 << np.arange(n_bits, dtype=np.int64))
+
+    @property
+    def n_tables(self):
+        return self.planes.shape[0]
+
+    @property
+    def n_bits(self):
+        return self.planes.shape[1]
+
+    @classmethod
+    def build(cls, vectors, ids, n_tables=24, n_bits=14, seed=0):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        planes = rng.standard_normal((n_tables, n_bits, vectors.shape[1])).astype(np.float32)
+
+        powers = 1 << np.arange(n_bits, dtype=np.int64)
+        bucket_codes = np.empty((n_tables, len(ids)), dtype=np.int64)
+        bucket_items = np.empty((n_tables, len(ids)), dtype=np.int32)
+        for table in range(n_tables):
+            codes = ((vectors @ planes[table].T) > 0) @ powers
+            order = np.argsort(codes, kind='stable')
+            bucket_codes[table] = codes[order]
+            bucket_items[table] = order
+        return cls(planes, vectors, ids, np.argsort(ids, kind='stable'), bucket_codes, bucket_items)
+
+    def candidates(self, vector, probes=0):
+        """
+        Filas candidatas para el vector de consulta.
+        Con probes > 0 también se visitan, en cada tabla, las cubetas que resultan de invertir
+        los `probes` bits cuya proyección está más cerca del hiperplano.
+        """
+        projections = (self._flat_planes @ vector).reshape(self.n_tables, self.n_bits)
+        codes = (projections > 0) @ self._powers
+        if probes:
+            closest_bits = np.argsort(np.abs(projections), axis=1)[:, :probes]
+            codes = np.concatenate([codes[:, None], codes[:, None] ^ self._powers[closest_bits]], axis=1)
+        else:
+            codes = codes[:, None]
+        found = []
+        for table in range(self.n_tables):
+            sorted_codes = self.bucket_codes[table]
+            starts = np.searchsorted(sorted_codes, codes[table], side='left')
+            ends = np.searchsorted(sorted_codes, codes[table], side='right')
+            for start, end in zip(starts, ends):
+                if end > start:
+                    found.append(self.bucket_items[table][start:end])
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def query(self, vector, k, probes=0, exclude_row=None):
+        """Devuelve (ids, similitudes) de los k vecinos aproximados, de mayor a menor similitud."""
+        vector = np.asarray(vector, dtype=np.float32)
+        rows = self.candidates(vector, probes=probes)
+        if exclude_row is not None:
+            rows = rows[rows != exclude_row]
+        if not len(rows):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors[rows] @ vector
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self.ids[rows[top]], scores[top]
+
+    def row_of(self, resource_pk):
+        """Fila del recurso en el índice o None si no está indexado."""
+        position = np.searchsorted(self.ids, resource_pk, sorter=self.id_order)
+        if position < len(self.ids) and self.ids[self.id_order[position]] == resource_pk:
+            return int(self.id_order[position])
+        return None
+
+    def more_like_this(self, resource_pk, k, probes=2):
+        row = self.row_of(resource_pk)
+        if row is None:
+            return []
+        ids, _ = self.query(self.vectors[row], k, probes=probes, exclude_row=row)
+        return [int(resource_id) for resource_id in ids]
+
+    def save(self, directory):
+        for name in _ARRAYS:
+            np.save(directory / f'{name}.npy', getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        return cls(**{name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode) for name in _ARRAYS})
+
+
+def exact_search(vectors, vector, k, exclude_row=None):
+    """Búsqueda exacta por fuerza bruta (referencia para medir el recall)."""
+    scores = vectors @ vector
+    if exclude_row is not None:
+        scores[exclude_row] = -np.inf
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def build_ann_index(dim=DEFAULT_DIM, n_tables=24, n_bits=14, seed=0, batch_size=2000):
+    """Vectoriza todo el catálogo con hashing y guarda el índice LSH. Devuelve el número de recursos."""
+    fields = ('pk', 'title', 'tags', 'author', 'description')
+    rows = list(EducationalResource.objects.values(*fields).order_by('pk').iterator(chunk_size=batch_size))
+    vectors = hashed_vectors(rows, dim=dim)
+    index = LSHIndex.build(vectors, [row['pk'] for row in rows], n_tables=n_tables, n_bits=n_bits, seed=seed)
+    publish(ARTIFACT_KIND, index.save)
+    logger.info(f"Índice ANN construido: {len(rows)} recursos, {n_tables} tablas de {n_bits} bits.")
+    return len(rows)
+
+
+# Índice abierto con mmap por proceso; se recarga cuando se publica una versión nueva.
+_loaded = ArtifactLoader(ARTIFACT_KIND, LSHIndex.load)
+
+
+def similar_resources(resource_pk, limit):
+    """PKs de los recursos más parecidos a uno dado ("más como este")."""
+    index = _loaded.get()
+    if index is None:
+        return []
+    return index.more_like_this(resource_pk, limit)
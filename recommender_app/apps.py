@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecommenderAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recommender_app'
+
+    def ready(self):
+        # Registra los receptores de señales (invalidación de cachés en memoria).
+        from . import signals  # noqa: F401
@@ -0,0 +1,207 @@
+# lti_recommender_project/recommender_app/archive.py
+
+"""
+Archivo en frío de UserInteraction.
+
+Las interacciones anteriores a INTERACTION_RETENTION_DAYS se sacan de la base de datos a
+archivos JSON Lines comprimidos con gzip, uno o varios por mes:
+
+    <ARCHIVE_DIR>/interactions-2026-03-<ms>.jsonl.gz
+
+Cada pasada escribe un archivo nuevo (nunca se añade a uno existente), lo sincroniza en
+disco y lo renombra a su nombre final antes de borrar las filas, así que un fallo a mitad
+deja como mucho filas repetidas en el archivo, nunca filas perdidas. Cada línea guarda el
+`id` original, de modo que restaurar dos veces la misma fila no la duplica.
+
+Los resúmenes diarios (rollups.py) y las tablas derivadas no se tocan al archivar ni al
+restaurar: ya contienen esas interacciones. Por lo mismo, una interacción restaurada no
+emite interactions_recorded. Cuando replay_events reconstruye las tablas derivadas lee
+también los archivos (archived_interactions) para no perder el historial archivado.
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .conf import get_index_dir, get_setting
+from .models import EducationalResource, UserInteraction
+from . import event_log
+
+FIELDS = ('id', 'lti_user_id', 'lti_context_id', 'resource_id', 'resource__resource_id', 'interaction_type', 'value', 'timestamp')
+RESTORED_DIR = 'restored'
+
+
+def get_archive_dir():
+    """Directorio de los archivos mensuales (None equivale a INDEX_DIR / 'archive')."""
+    directory = get_setting('INTERACTION_ARCHIVE_DIR')
+    if directory is None:
+        return get_index_dir() / 'archive'
+    return Path(directory)
+
+
+def retention_cutoff(days=None):
+    """Medianoche (hora local) de hace `days` días: las interacciones anteriores se archivan."""
+    days = get_setting('INTERACTION_RETENTION_DAYS') if days is None else days
+    today = timezone.localdate()
+    return timezone.make_aware(datetime.combine(today - timedelta(days=days), datetime.min.time()))
+
+
+def _month_bounds(timestamp):
+    local = timezone.localtime(timestamp)
+    start = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _record(row):
+    return {
+        'id': row['id'],
+        'lti_user_id': row['lti_user_id'],
+        'lti_context_id': row['lti_context_id'],
+        'resource': row['resource_id'],
+        'resource_id': row['resource__resource_id'],
+        'interaction_type': row['interaction_type'],
+        'value': row['value'],
+        'timestamp': row['timestamp'].isoformat(),
+    }
+
+
+def _write_month(rows, directory, month):
+    """Escribe las filas en un archivo nuevo del mes. Devuelve (ruta, PKs escritas)."""
+    final = directory / f"interactions-{month}-{int(time.time() * 1000)}.jsonl.gz"
+    temporary = final.with_name(final.name + '.tmp')
+    pks = []
+    with open(temporary, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+            for row in rows:
+                compressed.write(json.dumps(_record(row), separators=(',', ':')).encode('utf-8') + b'\n')
+                pks.append(row['id'])
+        raw.flush()
+        os.fsync(raw.fileno())
+    if not pks:
+        temporary.unlink()
+        return None, pks
+    os.replace(temporary, final)
+    event_log._fsync_dir(directory)
+    return final, pks
+
+
+def archive_before(cutoff, directory=None, batch_size=5000):
+    """
+    Mueve a los archivos mensuales las interacciones anteriores a `cutoff`, mes a mes.
+    Devuelve una lista de (ruta, interacciones archivadas).
+    """
+    directory = directory or get_archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    archived = []
+    while True:
+        oldest = UserInteraction.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return archived
+        start, end = _month_bounds(oldest)
+        rows = UserInteraction.objects.filter(timestamp__gte=start, timestamp__lt=min(end, cutoff)).order_by('pk').values(*FIELDS)
+        path, pks = _write_month(rows.iterator(chunk_size=batch_size), directory, start.strftime('%Y-%m'))
+        for offset in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                UserInteraction.objects.filter(pk__in=pks[offset:offset + batch_size]).delete()
+        archived.append((path, len(pks)))
+
+
+def archive_files(month=None, directory=None):
+    """Archivos de un mes ('AAAA-MM') o de todos, en orden."""
+    directory = directory or get_archive_dir()
+    return sorted(directory.glob(f"interactions-{month or '*'}-*.jsonl.gz"))
+
+
+def _read(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _interactions(records):
+    """UserInteraction sin guardar (con su id original) de los registros cuyo recurso sigue existiendo."""
+    # resource_id es único: se resuelve por el ID externo por si la PK del recurso cambió.
+    resources = dict(EducationalResource.objects.filter(
+        resource_id__in={record['resource_id'] for record in records}
+    ).values_list('resource_id', 'pk'))
+    return [
+        UserInteraction(
+            id=record['id'],
+            lti_user_id=record['lti_user_id'],
+            lti_context_id=record['lti_context_id'],
+            resource_id=resources[record['resource_id']],
+            interaction_type=record['interaction_type'],
+            value=record['value'],
+            timestamp=datetime.fromisoformat(record['timestamp']),
+        )
+        for record in records
+        if record['resource_id'] in resources
+    ]
+
+
+def archived_interactions(directory=None):
+    """
+    Interacciones archivadas (UserInteraction sin guardar) en orden de (timestamp, id), para
+    reproducirlas con replay_events. Se carga un mes cada vez: dentro de un mes los archivos
+    pueden solaparse (una pasada interrumpida repite filas) y se ordenan en memoria.
+    Se omiten las de recursos que ya no existen.
+    """
+    directory = directory or get_archive_dir()
+    months = {}
+    for path in archive_files(directory=directory):
+        # interactions-AAAA-MM-<ms>.jsonl.gz
+        _, year, month, _ = path.name.split('-', 3)
+        months.setdefault(f'{year}-{month}', []).append(path)
+    for month in sorted(months):
+        records = {}
+        for path in months[month]:
+            for record in _read(path):
+                records[record['id']] = record
+        interactions = []
+        records = list(records.values())
+        for offset in range(0, len(records), 5000):
+            interactions += _interactions(records[offset:offset + 5000])
+        interactions.sort(key=lambda interaction: (interaction.timestamp, interaction.pk))
+        yield from interactions
+
+
+def _restore_batch(records):
+    """Inserta un lote conservando los id originales. Devuelve (restauradas, sin recurso)."""
+    interactions = _interactions(records)
+    with transaction.atomic():
+        UserInteraction.objects.bulk_create(interactions, ignore_conflicts=True)
+    return len(interactions), len(records) - len(interactions)
+
+
+def restore_month(month, directory=None, batch_size=5000):
+    """
+    Vuelve a insertar en la base de datos las interacciones archivadas de un mes ('AAAA-MM').
+    Los archivos importados se mueven a ARCHIVE_DIR/restored. Devuelve (restauradas, sin recurso).
+    """
+    directory = directory or get_archive_dir()
+    restored = skipped = 0
+    for path in archive_files(month, directory):
+        batch = []
+        for record in _read(path):
+            batch.append(record)
+            if len(batch) == batch_size:
+                batch_restored, batch_skipped = _restore_batch(batch)
+                restored += batch_restored
+                skipped += batch_skipped
+                batch = []
+        if batch:
+            batch_restored, batch_skipped = _restore_batch(batch)
+            restored += batch_restored
+            skipped += batch_skipped
+        # Las filas vuelven a estar en la tabla: si se archivan otra vez irán a un archivo nuevo.
+        (directory / RESTORED_DIR).mkdir(exist_ok=True)
+        os.replace(path, directory / RESTORED_DIR / path.name)
+    return restored, skipped
@@ -0,0 +1,110 @@
+# lti_recommender_project/recommender_app/artifacts.py
+
+"""
+Publicación y carga de artefactos construidos fuera de línea (índices, modelos).
+
+Cada construcción se escribe en un directorio versionado nuevo dentro de
+INDEX_DIR/<tipo>/ y después se publica reemplazando de forma atómica el archivo
+CURRENT, que contiene el nombre de la versión activa. Los procesos que sirven peticiones
+solo vigilan la fecha de modificación de CURRENT, así que nunca ven una versión a medio
+escribir y el cambio de versión es instantáneo.
+"""
+
+import logging
+import os
+import shutil
+import threading
+
+from django.utils import timezone
+
+from .conf import get_index_dir
+
+logger = logging.getLogger(__name__)
+
+POINTER_NAME = 'CURRENT'
+
+
+def artifact_root(kind):
+    return get_index_dir() / kind
+
+
+def current_version(kind):
+    """Nombre de la versión publicada o None si nunca se ha construido."""
+    try:
+        with open(artifact_root(kind) / POINTER_NAME, encoding='utf-8') as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_directory(kind):
+    version = current_version(kind)
+    return artifact_root(kind) / version if version else None
+
+
+def publish(kind, write_files, keep=3):
+    """
+    Escribe una versión nueva con `write_files(directorio)` y la activa.
+    Conserva las `keep` versiones más recientes: los procesos que aún tienen abiertos
+    (o mapeados en memoria) archivos de una versión anterior pueden seguir usándolos.
+    """
+    root = artifact_root(kind)
+    root.mkdir(parents=True, exist_ok=True)
+    version = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    tmp_directory = root / f'.{version}.tmp'
+    tmp_directory.mkdir()
+    write_files(tmp_directory)
+    os.rename(tmp_directory, root / version)
+
+    tmp_pointer = root / f'.{POINTER_NAME}.{version}.tmp'
+    with open(tmp_pointer, 'w', encoding='utf-8') as handle:
+        handle.write(version)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_pointer, root / POINTER_NAME)
+
+    versions = sorted(path.name for path in root.iterdir() if path.is_dir() and not path.name.startswith('.'))
+    for old_version in versions[:-keep]:
+        shutil.rmtree(root / old_version, ignore_errors=True)
+    logger.info(f"Artefacto '{kind}' publicado: versión {version}.")
+    return version
+
+
+class ArtifactLoader:
+    """
+    Carga perezosa por proceso de la versión publicada de un artefacto.
+    `load(directorio)` se llama de nuevo solo cuando cambia el archivo CURRENT.
+    """
+
+    def __init__(self, kind, load):
+        self.kind = kind
+        self._load = load
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._mtime = None
+
+    def get(self):
+        try:
+            mtime = os.stat(artifact_root(self.kind) / POINTER_NAME).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    version = current_version(self.kind)
+                    if version != self._version:
+                        self._value = self._load(artifact_root(self.kind) / version)
+                        self._version = version
+                    self._mtime = mtime
+        return self._value
+
+    @property
+    def version(self):
+        return self._version
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._version = None
+            self._mtime = None
@@ -0,0 +1,341 @@
+# lti_recommender_project/recommender_app/cache_backend.py
+
+"""
+Backend de caché de Django en dos niveles para varios procesos sin servicios externos.
+
+- L2: un archivo SQLite en modo WAL compartido por todos los procesos de la máquina
+  (LOCATION). Cada entrada guarda su instante de caducidad; las caducadas no se devuelven y
+  se borran al podar. Al superar MAX_ENTRIES (se comprueba cada CULL_CHECK_INTERVAL
+  escrituras) se poda: primero lo caducado y después la fracción 1/CULL_FREQUENCY que antes
+  caduca, y se devuelven al archivo las páginas libres (auto_vacuum incremental), así que el
+  archivo no crece sin límite. Las claves que empiezan por PROTECTED_PREFIXES (por defecto
+  el estado OIDC y los nonces de PyLTI1p3, "lti1p3-") solo se podan cuando ya no queda
+  ninguna otra: perderlas rompe los lanzamientos en curso ("State not found").
+- L1: un LRU en memoria de cada proceso (L1_MAX_ENTRIES) que guarda lo leído o escrito
+  durante como mucho L1_TIMEOUT segundos, serializado como en L2 (cada lectura devuelve una
+  copia, como LocMemCache). Las lecturas repetidas de las claves calientes
+  (generaciones, configuración) no llegan a SQLite. Un cambio hecho desde otro proceso
+  tarda como mucho L1_TIMEOUT en verse; las ausencias no se guardan en L1, así que una
+  clave recién escrita en otro proceso (el estado OIDC de un lanzamiento LTI) se ve al instante.
+
+add() e incr() se resuelven en SQLite dentro de una transacción de escritura y son atómicos
+entre procesos: sirven de candado (rec_cache, roster) y de contador compartido.
+compare_and_set_many() (fuera de la API de Django) escribe varias claves solo si ninguna ha
+cambiado desde que se leyó; con él admission.py guarda cubetas de tokens compartidas.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'recommender_app.cache_backend.TwoTierCache',
+            'LOCATION': BASE_DIR / 'recommender_data' / 'cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'L1_TIMEOUT': 2, 'L1_MAX_ENTRIES': 5000},
+        }
+    }
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+)
+# Caducidad de las entradas sin caducidad (timeout=None).
+FOREVER = float('inf')
+# Escrituras de este proceso entre comprobaciones de MAX_ENTRIES (COUNT(*) recorre la tabla).
+CULL_CHECK_INTERVAL = 100
+# Prefijos de las claves de DjangoCacheDataStorage (estado OIDC, nonces y datos del lanzamiento).
+PROTECTED_PREFIXES = ('lti1p3-',)
+
+
+def _dump(value):
+    # Los enteros se guardan tal cual para que incr() sume en SQL; el resto, serializado.
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(stored):
+    return stored if isinstance(stored, int) else pickle.loads(stored)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = Path(location)
+        self._l1_timeout = options.get('L1_TIMEOUT', 2)
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 5000)
+        self._l1 = OrderedDict()
+        self._l1_lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._writes = 0
+        # Patrones GLOB de las claves protegidas ya con el prefijo y la versión de make_key.
+        self._protected = tuple(self.make_key(f'{prefix}*') for prefix in options.get('PROTECTED_PREFIXES', PROTECTED_PREFIXES))
+
+    # --- SQLite -------------------------------------------------------------------------
+
+    def _connection(self):
+        """Conexión del hilo actual (se abre de nuevo tras un fork)."""
+        pid = os.getpid()
+        if pid != self._pid:
+            # Proceso hijo: L1 es una copia del padre que ya no se invalida.
+            self._pid = pid
+            with self._l1_lock:
+                self._l1.clear()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != pid:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")  # solo tiene efecto en un archivo nuevo
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection, self._local.pid = connection, pid
+        return connection
+
+    def _write(self, statements):
+        """Ejecuta `statements(connection)` en una transacción de escritura (BEGIN IMMEDIATE)."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def _expires(self, timeout):
+        # get_backend_timeout ya devuelve el instante absoluto de caducidad (o None).
+        expires = self.get_backend_timeout(timeout)
+        return FOREVER if expires is None else expires
+
+    def _maybe_cull(self, connection, now):
+        self._writes += 1
+        if self._max_entries <= 0 or self._writes % CULL_CHECK_INTERVAL:
+            return
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count <= self._max_entries:
+            return
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self._max_entries:
+            cull = count // self._cull_frequency if self._cull_frequency else count
+            # Las protegidas ordenan detrás de todas las demás, caduquen cuando caduquen.
+            protected_last = 'key GLOB ? OR ' * len(self._protected)
+            connection.execute(
+                f"DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY ({protected_last}0), expires LIMIT ?)",
+                (*self._protected, cull),
+            )
+        connection.execute("PRAGMA incremental_vacuum")
+
+    # --- L1 -----------------------------------------------------------------------------
+
+    def _l1_get(self, key, now):
+        with self._l1_lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry
+
+    def _l1_set(self, key, stored, expires, now):
+        if self._l1_timeout <= 0:
+            return
+        with self._l1_lock:
+            self._l1[key] = (min(expires, now + self._l1_timeout), stored)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, keys):
+        with self._l1_lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    # --- API de Django ------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        entry = self._l1_get(key, now)
+        if entry is not None:
+            return _load(entry[1])
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return default
+        self._l1_set(key, row[0], row[1], now)
+        return _load(row[0])
+
+    def get_many(self, keys, version=None):
+        now = time.time()
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        missing = []
+        for key, original in keys.items():
+            entry = self._l1_get(key, now)
+            if entry is None:
+                missing.append(key)
+            else:
+                found[original] = _load(entry[1])
+        # Por bloques para no pasar del límite de parámetros de SQLite.
+        for offset in range(0, len(missing), 500):
+            chunk = missing[offset:offset + 500]
+            rows = self._connection().execute(
+                f"SELECT key, value, expires FROM cache WHERE key IN ({','.join('?' * len(chunk))}) AND expires > ?",
+                (*chunk, now),
+            )
+            for key, stored, expires in rows:
+                self._l1_set(key, stored, expires, now)
+                found[keys[key]] = _load(stored)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set_many({key: value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self.make_and_validate_key(key, version=version): value for key, value in data.items()}, timeout)
+        return []
+
+    def _set_many(self, data, timeout):
+        now = time.time()
+        expires = self._expires(timeout)
+        rows = [(key, _dump(value), expires) for key, value in data.items()]
+
+        def statements(connection):
+            connection.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows)
+            self._maybe_cull(connection, now)
+
+        self._write(statements)
+        for key, stored, _ in rows:
+            self._l1_set(key, stored, expires, now)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        expires = self._expires(timeout)
+
+        stored = _dump(value)
+
+        def statements(connection):
+            # Inserta si no existe o si la entrada existente ha caducado.
+            cursor = connection.execute(
+                "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+                "WHERE cache.expires <= ?",
+                (key, stored, expires, now),
+            )
+            return cursor.rowcount > 0
+
+        added = self._write(statements)
+        if added:
+            self._l1_set(key, stored, expires, now)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        expires = self._expires(timeout)
+        touched = self._write(lambda connection: connection.execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND expires > ?", (expires, key, now)
+        ).rowcount > 0)
+        self._l1_discard([key])
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+
+        def statements(connection):
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            if not isinstance(row[0], int):
+                raise TypeError(f"El valor de '{key}' no es un entero.")
+            connection.execute("UPDATE cache SET value = value + ? WHERE key = ?", (delta, key))
+            return row[0] + delta
+
+        value = self._write(statements)
+        # Los contadores cambian desde varios procesos: no se guardan en L1.
+        self._l1_discard([key])
+        return value
+
+    def compare_and_set_many(self, items, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Compare-and-set atómico entre procesos. `items` es {clave: (valor esperado, valor nuevo)};
+        el esperado None significa que la clave no existe o ha caducado. Si todas las claves
+        tienen su valor esperado las escribe y devuelve True; si no, no escribe nada y devuelve False.
+        """
+        now = time.time()
+        expires = self._expires(timeout)
+        items = {self.make_and_validate_key(key, version=version): values for key, values in items.items()}
+        rows = [(key, _dump(new), expires) for key, (_, new) in items.items()]
+
+        def statements(connection):
+            for key, (expected, _) in items.items():
+                row = connection.execute(
+                    "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+                if (None if row is None else _load(row[0])) != expected:
+                    return False
+            connection.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows)
+            self._maybe_cull(connection, now)
+            return True
+
+        written = self._write(statements)
+        if written:
+            for key, stored, _ in rows:
+                self._l1_set(key, stored, expires, now)
+        else:
+            # Lo leído venía de L1 o lo ha cambiado otro proceso: la siguiente lectura va a SQLite.
+            self._l1_discard(items)
+        return written
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        if self._l1_get(key, now) is not None:
+            return True
+        return self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._l1_discard([key])
+        return self._write(lambda connection: connection.execute(
+            "DELETE FROM cache WHERE key = ?", (key,)
+        ).rowcount > 0)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self._l1_discard(keys)
+        self._write(lambda connection: connection.executemany(
+            "DELETE FROM cache WHERE key = ?", [(key,) for key in keys]
+        ))
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self._write(lambda connection: connection.execute("DELETE FROM cache"))
+
+    def close(self, **kwargs):
+        # Django llama a close() al terminar cada petición: la conexión del hilo se reutiliza.
+        pass
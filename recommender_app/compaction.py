@@ -0,0 +1,110 @@
+# lti_recommender_project/recommender_app/compaction.py
+
+"""
+Compactor del registro de eventos: vuelca los segmentos de event_log.py en UserInteraction.
+
+Cada lote de hasta `batch_size` líneas se valida, resuelve sus recursos con una consulta IN
+y se inserta con bulk_create en la misma transacción que guarda la nueva posición del
+segmento (EventLogOffset). Si el proceso muere a mitad, o se confirman las filas y la
+posición, o ninguna de las dos: al reanudar no se pierde ni se duplica ningún evento.
+
+Los receptores de interactions_recorded se avisan después de confirmar; si el proceso
+muere justo entre ambos pasos, las tablas derivadas se pueden reconstruir con el comando
+replay_events. Los segmentos sellados y vaciados se borran.
+
+Solo debe ejecutarse un compactor a la vez; el comando compact_event_log lo garantiza con
+un candado de archivo.
+"""
+
+import logging
+from datetime import datetime
+
+from django.utils import timezone
+
+from .models import EventLogOffset
+from .ingest import build_interactions, insert_interactions, validate_events
+from .signals import notify_interactions_recorded
+from . import event_log, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_timestamp(value):
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return timezone.now()
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def _commit_batch(segment, records, end_offset):
+    """Inserta un lote y guarda la posición del segmento en una transacción. Devuelve (insertadas, rechazadas)."""
+    events = [record for record in records if isinstance(record, dict)]
+    valid, errors = validate_events(events)
+    interactions, resource_errors = build_interactions(valid)
+    errors += resource_errors
+    for index, interaction in interactions:
+        interaction.timestamp = _parse_timestamp(events[index].get('timestamp'))
+
+    def save_offset():
+        EventLogOffset.objects.update_or_create(segment=segment, defaults={'offset': end_offset})
+
+    if interactions:
+        interactions, insert_errors = insert_interactions(interactions, in_transaction=save_offset)
+        errors += insert_errors
+    else:
+        save_offset()
+    rejected = len(records) - len(interactions)
+
+    if rejected:
+        metrics.incr('event_log.rejected', rejected)
+        logger.warning(f"Segmento {segment}: {rejected} eventos rechazados. Primeros errores: {errors[:3]}")
+    if interactions:
+        metrics.incr('event_log.compacted', len(interactions))
+        notify_interactions_recorded(interactions)
+    return len(interactions), rejected
+
+
+def compact_segment(path, sealed, batch_size=5000):
+    """Vuelca un segmento desde su última posición guardada. Devuelve (insertadas, rechazadas)."""
+    segment = path.stem
+    stored = EventLogOffset.objects.filter(segment=segment).values_list('offset', flat=True).first()
+    offset = stored or 0
+    inserted = rejected = 0
+    while True:
+        records, end_offset = [], offset
+        for end_offset, record in event_log.read_records(path, offset, max_records=batch_size):
+            records.append(record)
+        if not records:
+            break
+        batch_inserted, batch_rejected = _commit_batch(segment, records, end_offset)
+        inserted += batch_inserted
+        rejected += batch_rejected
+        offset = end_offset
+
+    if sealed:
+        size = path.stat().st_size
+        if offset < size:
+            logger.warning(f"Segmento {segment}: se descarta una última línea incompleta ({size - offset} bytes).")
+        # Primero se borra el archivo: si el proceso muere antes de borrar la posición,
+        # queda una fila huérfana inofensiva y ningún segmento se vuelve a leer.
+        path.unlink()
+        EventLogOffset.objects.filter(segment=segment).delete()
+    return inserted, rejected
+
+
+def compact(batch_size=5000, directory=None):
+    """Vuelca todos los segmentos (también los abiertos, hasta su última línea completa)."""
+    event_log.seal_abandoned(directory)
+    inserted = rejected = 0
+    for path, sealed in event_log.segments(directory):
+        try:
+            segment_inserted, segment_rejected = compact_segment(path, sealed, batch_size=batch_size)
+        except FileNotFoundError:
+            # Un segmento abierto se ha sellado (renombrado) mientras se leía: se verá en la siguiente pasada.
+            continue
+        inserted += segment_inserted
+        rejected += segment_rejected
+    return inserted, rejected
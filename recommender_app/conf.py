@@ -0,0 +1,131 @@
+# lti_recommender_project/recommender_app/conf.py
+
+from pathlib import Path
+
+from django.conf import settings
+
+# Valores por defecto de la configuración del recomendador.
+# Se pueden sobrescribir desde settings.RECOMMENDER_CONFIG.
+DEFAULTS = {
+    # Número de recomendaciones que se muestran en el lanzamiento LTI.
+    'RECOMMENDATION_COUNT': 5,
+    # Peso base de cada tipo de interacción para el filtrado colaborativo.
+    'INTERACTION_WEIGHTS': {
+        'viewed': 1.0,
+        'clicked': 1.0,
+        'downloaded': 2.0,
+        'scored': 2.0,
+        'completed': 3.0,
+    },
+    # Peso para tipos de interacción no listados arriba.
+    'DEFAULT_INTERACTION_WEIGHT': 1.0,
+    # Número de vecinos guardados por recurso en la tabla ítem-ítem.
+    'NEIGHBORS_TOP_K': 50,
+    # Máximo de recursos por usuario considerados al construir la similitud
+    # (acota el coste cuadrático de los usuarios muy activos).
+    'MAX_ITEMS_PER_USER': 200,
+    # Número de interacciones recientes del usuario usadas como semilla en el lanzamiento.
+    'USER_HISTORY_SIZE': 50,
+    # Tamaño de la ventana de recursos recientes por usuario para las co-ocurrencias incrementales.
+    'RECENT_ITEMS_WINDOW': 20,
+    # Máximo de filas de co-ocurrencia leídas por lanzamiento.
+    'COOCCURRENCE_CANDIDATES': 500,
+    # Vida media (horas) de las puntuaciones de tendencia por curso.
+    'TRENDING_HALF_LIFE_HOURS': 24,
+    # Longitud de la lista clasificada que recorre la API paginada antes de seguir por el catálogo.
+    'RECOMMENDATION_API_MAX_RANKED': 100,
+    # Filas por página del historial de interacciones (api/interactions/history/) si no se indica page_size.
+    'HISTORY_PAGE_SIZE': 50,
+    # Caché de recomendaciones por usuario y curso (segundos).
+    'RECOMMENDATION_CACHE_TTL': 300,
+    # Duración máxima del candado de cálculo y espera máxima de los demás procesos.
+    'RECOMMENDATION_CACHE_LOCK_TIMEOUT': 10,
+    'RECOMMENDATION_CACHE_WAIT': 5,
+    # Presupuesto de latencia del paso de recomendación en el lanzamiento (0 lo desactiva)
+    # e hilos dedicados a calcularlas.
+    'RECOMMENDATION_DEADLINE_MS': 800,
+    'RECOMMENDATION_WORKERS': 4,
+    # 'database' guarda cada interacción al recibirla; 'log' la añade al registro de eventos
+    # en disco y el comando compact_event_log la vuelca después (ver event_log.py).
+    'INTERACTION_INGEST_MODE': 'database',
+    # Directorio del registro de eventos (None equivale a INDEX_DIR / 'event_log'), tamaño y
+    # antigüedad máximos de cada segmento y cada cuánto se agrupan los fsync (0: en cada escritura).
+    'EVENT_LOG_DIR': None,
+    'EVENT_LOG_SEGMENT_BYTES': 16 * 1024 * 1024,
+    'EVENT_LOG_SEGMENT_SECONDS': 60,
+    'EVENT_LOG_FSYNC_INTERVAL_MS': 50,
+    # Caché (resource_id, lti_context_id) -> PK: entradas y vida del nivel en memoria, vida en
+    # la caché compartida y vida de las respuestas "no existe" (segundos).
+    'RESOURCE_LOOKUP_L1_SIZE': 10000,
+    'RESOURCE_LOOKUP_L1_TTL': 60,
+    'RESOURCE_LOOKUP_TTL': 3600,
+    'RESOURCE_LOOKUP_NEGATIVE_TTL': 30,
+    # Días que las interacciones en bruto permanecen en la base de datos antes de que
+    # archive_interactions las mueva a archivos mensuales comprimidos, y directorio de esos
+    # archivos (None equivale a INDEX_DIR / 'archive'). Ver archive.py.
+    'INTERACTION_RETENTION_DAYS': 180,
+    'INTERACTION_ARCHIVE_DIR': None,
+    # Exportación de interacciones: filas leídas por consulta y tamaño de cada bloque enviado.
+    'EXPORT_CHUNK_SIZE': 2000,
+    'EXPORT_BUFFER_BYTES': 64 * 1024,
+    # Máximo de eventos por petición al endpoint de interacciones en lote.
+    'BULK_INTERACTIONS_MAX': 500,
+    # Control de admisión de los endpoints de interacciones (0 desactiva cada límite):
+    # peticiones simultáneas por proceso y cubetas de tokens (eventos por segundo y ráfaga
+    # máxima) por usuario y por curso. Ver admission.py.
+    'INTERACTION_MAX_CONCURRENCY': 16,
+    # 'process': cubetas en memoria de cada proceso; 'cache': límites compartidos entre
+    # procesos a través de la caché de Django (requiere una caché compartida).
+    'RATE_LIMIT_BACKEND': 'process',
+    'RATE_LIMIT_USER_RATE': 10,
+    'RATE_LIMIT_USER_BURST': 200,
+    'RATE_LIMIT_CONTEXT_RATE': 200,
+    'RATE_LIMIT_CONTEXT_BURST': 2000,
+    # Tamaño máximo de un cuerpo con Content-Encoding: gzip una vez descomprimido.
+    'MAX_DECOMPRESSED_BODY_BYTES': 1024 * 1024,
+    # Lanzamiento diferido: la página se devuelve justo tras validar el lanzamiento y las
+    # recomendaciones se piden después con un token firmado válido LAUNCH_TOKEN_MAX_AGE segundos.
+    'DEFERRED_LAUNCH': False,
+    'LAUNCH_TOKEN_MAX_AGE': 300,
+    # Incluir en la página los datos LTI brutos (solo para depuración).
+    'LAUNCH_DEBUG_DATA': False,
+    # Precarga de recomendaciones de todo el curso con NRPS cuando lanza un profesor,
+    # frecuencia máxima por curso (segundos) y máximo de miembros leídos.
+    'ROSTER_PREFETCH': True,
+    'ROSTER_PREFETCH_INTERVAL': 3600,
+    'ROSTER_MAX_MEMBERS': 5000,
+    # Caché de la configuración LTI (ver lti_config.py): vida de la herramienta y sus claves en
+    # memoria, vida del JWKS de la plataforma, intervalo mínimo entre descargas por un kid
+    # desconocido y tiempo máximo de cada descarga (segundos).
+    'LTI_CONFIG_TTL': 300,
+    'LTI_JWKS_TTL': 3600,
+    'LTI_JWKS_MIN_REFRESH_INTERVAL': 10,
+    'LTI_JWKS_TIMEOUT': 5,
+    # max-age del JWKS de la herramienta y horas que una clave retirada por rotate_tool_key se
+    # sigue publicando antes de poder borrarse con --prune.
+    'JWKS_MAX_AGE': 300,
+    'TOOL_KEY_OVERLAP_HOURS': 48,
+    # Directorio de los índices y modelos construidos fuera de línea.
+    # None equivale a BASE_DIR / 'recommender_data'.
+    'INDEX_DIR': None,
+}
+
+
+def get_setting(name):
+    """
+    Devuelve un valor de settings.RECOMMENDER_CONFIG o, si no está definido, su valor por defecto.
+    """
+    user_config = getattr(settings, 'RECOMMENDER_CONFIG', {})
+    if name in user_config:
+        return user_config[name]
+    return DEFAULTS[name]
+
+
+def get_index_dir():
+    """
+    Directorio donde se guardan los índices y modelos precalculados.
+    """
+    index_dir = get_setting('INDEX_DIR')
+    if index_dir is None:
+        return Path(settings.BASE_DIR) / 'recommender_data'
+    return Path(index_dir)
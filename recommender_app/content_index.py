@@ -0,0 +1,213 @@
+# lti_recommender_project/recommender_app/content_index.py
+
+"""
+Índice de contenido TF-IDF sobre EducationalResource para el arranque en frío.
+
+El índice se publica como artefacto versionado en INDEX_DIR/content_index (ver artifacts.py):
+- counts.npz: matriz dispersa (recursos x términos) con las frecuencias brutas, necesaria
+  para las reconstrucciones incrementales.
+- tfidf.npz: matriz TF-IDF normalizada por filas (formato CSC) usada al consultar.
+- meta.json: vocabulario, PKs de cada fila y marca de agua de updated_at.
+
+El comando build_content_index solo re-vectoriza los recursos modificados desde la última
+construcción, así que no hay que procesar todo el catálogo después de cada scraping.
+"""
+
+import json
+import logging
+import re
+import unicodedata
+
+import numpy as np
+from scipy import sparse
+from django.utils.dateparse import parse_datetime
+
+from .artifacts import ArtifactLoader, current_directory, publish
+from .models import EducationalResource
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+
+# Palabras vacías frecuentes en español e inglés (el catálogo mezcla ambos idiomas).
+STOPWORDS = frozenset("""
+    de la que el en y a los se del las un por con no una su para es al lo como mas o pero sus le ha me si
+    sin sobre este ya entre cuando todo esta ser son dos tambien fue habia era muy anos hasta desde esta
+    the of and to in for is on that by this with are be as at from or an it its was which your you can
+    introduccion introduction curso course tema unit
+""".split())
+
+# Los campos cortos y descriptivos pesan más que la descripción.
+FIELD_WEIGHTS = (('title', 2), ('tags', 2), ('author', 1), ('description', 1))
+
+_FIELDS = ('pk', 'updated_at') + tuple(field for field, _ in FIELD_WEIGHTS)
+
+
+def tokenize(text):
+    """Minúsculas, sin acentos y sin palabras vacías."""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+    return [token for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def _document_terms(row):
+    terms = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(row[field]):
+            terms[token] = terms.get(token, 0) + weight
+    return terms
+
+
+ARTIFACT_KIND = 'content_index'
+
+
+class ContentIndex:
+    """
+    Matriz TF-IDF en memoria con las PKs de los recursos de cada fila.
+    """
+
+    def __init__(self, vocabulary, resource_pks, counts, watermark=None):
+        self.vocabulary = vocabulary                      # término -> columna
+        self.resource_pks = np.asarray(resource_pks, dtype=np.int64)
+        self.counts = counts.tocsr()
+        self.watermark = watermark
+        self.idf = None
+        self.matrix = None
+
+    def compute_tfidf(self):
+        """TF sublineal (1 + log tf), IDF suavizado y normalización L2 por fila."""
+        n_docs = self.counts.shape[0]
+        document_frequency = np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+        self.idf = np.log((1.0 + n_docs) / (1.0 + document_frequency)) + 1.0
+
+        tfidf = self.counts.astype(np.float32)
+        tfidf.data = 1.0 + np.log(tfidf.data)
+        tfidf = tfidf @ sparse.diags(self.idf.astype(np.float32))
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self.matrix = (sparse.diags(1.0 / norms) @ tfidf).astype(np.float32).tocsc()
+
+    def query_vector(self, text):
+        """Columnas y pesos TF-IDF normalizados del texto de consulta (términos desconocidos se ignoran)."""
+        terms = {}
+        for token in tokenize(text):
+            column = self.vocabulary.get(token)
+            if column is not None:
+                terms[column] = terms.get(column, 0) + 1
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        columns = np.fromiter(terms.keys(), dtype=np.int64)
+        weights = (1.0 + np.log(np.fromiter(terms.values(), dtype=np.float32))) * self.idf[columns]
+        return columns, (weights / np.linalg.norm(weights)).astype(np.float32)
+
+    def search(self, text, k):
+        """
+        Devuelve hasta k PKs de recursos ordenadas por similitud coseno con el texto.
+        Solo se tocan las columnas de los términos de la consulta.
+        """
+        columns, weights = self.query_vector(text)
+        if not len(columns) or not len(self.resource_pks):
+            return []
+        scores = np.asarray(self.matrix[:, columns] @ weights).ravel()
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(self.resource_pks[row]) for row in top if scores[row] > 0]
+
+    def save(self, directory):
+        meta = {
+            'vocabulary': sorted(self.vocabulary, key=self.vocabulary.get),
+            'resource_pks': self.resource_pks.tolist(),
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+        }
+        sparse.save_npz(directory / 'counts.npz', self.counts)
+        sparse.save_npz(directory / 'tfidf.npz', self.matrix)
+        with open(directory / 'meta.json', 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle)
+
+    @classmethod
+    def load(cls, directory, with_counts=False):
+        """Carga el índice guardado en `directory`."""
+        with open(directory / 'meta.json', encoding='utf-8') as handle:
+            meta = json.load(handle)
+        matrix = sparse.load_npz(directory / 'tfidf.npz').tocsc()
+        counts = sparse.load_npz(directory / 'counts.npz') if with_counts else sparse.csr_matrix(matrix.shape)
+        vocabulary = {term: column for column, term in enumerate(meta['vocabulary'])}
+        index = cls(vocabulary, meta['resource_pks'], counts, parse_datetime(meta['watermark']) if meta['watermark'] else None)
+        index.matrix = matrix
+        index.idf = _idf_from_matrix(matrix)
+        return index
+
+
+def _idf_from_matrix(matrix):
+    """Mismo IDF que compute_tfidf, deducido de los no nulos por columna de la matriz CSC."""
+    n_docs = matrix.shape[0]
+    document_frequency = np.diff(matrix.indptr)  # CSC: no nulos por columna
+    return np.log((1.0 + n_docs) / (1.0 + document_frequency)) + 1.0
+
+
+def build_content_index(full=False, batch_size=2000):
+    """
+    Construye o actualiza el índice en disco.
+    Sin `full`, solo se vectorizan los recursos con updated_at posterior a la última construcción
+    y se eliminan las filas de recursos borrados. Devuelve (filas totales, filas re-vectorizadas).
+    """
+    directory = None if full else current_directory(ARTIFACT_KIND)
+    if directory is not None:
+        index = ContentIndex.load(directory, with_counts=True)
+    else:
+        index = ContentIndex({}, [], sparse.csr_matrix((0, 0), dtype=np.float32))
+
+    resources = EducationalResource.objects.values(*_FIELDS).order_by()
+    if index.watermark is not None:
+        # >= para no perder recursos guardados en el mismo instante que la marca de agua.
+        resources = resources.filter(updated_at__gte=index.watermark)
+
+    new_pks, rows, cols, data = [], [], [], []
+    watermark = index.watermark
+    for row in resources.iterator(chunk_size=batch_size):
+        row_number = len(new_pks)
+        new_pks.append(row['pk'])
+        for term, count in _document_terms(row).items():
+            column = index.vocabulary.setdefault(term, len(index.vocabulary))
+            rows.append(row_number)
+            cols.append(column)
+            data.append(count)
+        if watermark is None or row['updated_at'] > watermark:
+            watermark = row['updated_at']
+
+    # Conserva las filas de recursos que siguen existiendo y no se han vuelto a vectorizar.
+    existing_pks = np.fromiter(EducationalResource.objects.values_list('pk', flat=True).iterator(chunk_size=10000), dtype=np.int64)
+    keep = np.isin(index.resource_pks, existing_pks) & ~np.isin(index.resource_pks, np.asarray(new_pks, dtype=np.int64))
+
+    n_terms = len(index.vocabulary)
+    old_counts = index.counts[np.flatnonzero(keep)].astype(np.float32)
+    old_counts.resize((old_counts.shape[0], n_terms))  # el vocabulario puede haber crecido
+    new_counts = sparse.csr_matrix((data, (rows, cols)), shape=(len(new_pks), n_terms), dtype=np.float32)
+
+    index.counts = sparse.vstack([old_counts, new_counts], format='csr')
+    index.resource_pks = np.concatenate([index.resource_pks[keep], np.asarray(new_pks, dtype=np.int64)])
+    index.watermark = watermark
+    index.compute_tfidf()
+    publish(ARTIFACT_KIND, index.save)
+    logger.info(f"Índice de contenido actualizado: {len(index.resource_pks)} recursos, {len(new_pks)} re-vectorizados.")
+    return len(index.resource_pks), len(new_pks)
+
+
+# Índice cargado por proceso; se recarga cuando se publica una versión nueva.
+_loaded = ArtifactLoader(ARTIFACT_KIND, ContentIndex.load)
+
+
+def recommend_for_text(text, limit):
+    """PKs de los recursos más parecidos al texto (p. ej. el título del curso)."""
+    index = _loaded.get()
+    if index is None or not text:
+        return []
+    return index.search(text, limit)
+
+
+def index_version():
+    """Versión del índice cargado en este proceso (None si no hay índice)."""
+    _loaded.get()
+    return _loaded.version
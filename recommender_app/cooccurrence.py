@@ -0,0 +1,188 @@
+# lti_recommender_project/recommender_app/cooccurrence.py
+
+"""
+Co-ocurrencias y popularidad actualizadas de forma incremental.
+
+Cada interacción nueva suma su peso a los pares (recurso, recurso reciente) del mismo
+usuario en el mismo curso y a la popularidad del recurso. La ventana de recursos recientes
+de cada usuario está acotada (RECENT_ITEMS_WINDOW) y vive en la caché de Django, así que
+cada evento cuesta O(tamaño de la ventana) y un número fijo de consultas, sin recalcular
+nada sobre toda la tabla UserInteraction. Las recomendaciones leen estas tablas en el
+lanzamiento, por lo que reflejan los clics de un estudiante a los pocos segundos.
+"""
+
+import heapq
+import logging
+import math
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .conf import get_setting
+from .item_similarity import interaction_weight
+from .models import ResourceCooccurrence, ResourcePopularity, UserInteraction
+
+logger = logging.getLogger(__name__)
+
+RECENT_ITEMS_TIMEOUT = 60 * 60 * 24
+
+
+def _recent_key(user_id, context_id):
+    return f"cooccurrence:recent:{user_id}:{context_id}"
+
+
+def recent_items(user_id, context_id, exclude_interactions=()):
+    """
+    PKs de los últimos recursos distintos del usuario en el curso (el más reciente primero).
+    Si la ventana no está en caché se reconstruye con una consulta indexada, sin contar las
+    interacciones de `exclude_interactions` (las que se están procesando).
+    """
+    window = get_setting('RECENT_ITEMS_WINDOW')
+    recent = cache.get(_recent_key(user_id, context_id))
+    if recent is not None:
+        return recent
+
+    history = UserInteraction.objects.filter(lti_user_id=user_id, lti_context_id=context_id)
+    if exclude_interactions:
+        history = history.exclude(pk__in=exclude_interactions)
+    recent = []
+    for resource_pk in history.order_by('-timestamp').values_list('resource_id', flat=True)[:window * 4]:
+        if resource_pk not in recent:
+            recent.append(resource_pk)
+            if len(recent) == window:
+                break
+    return recent
+
+
+def _push(recent, resource_pk):
+    """Ventana con `resource_pk` al principio, sin repetir y acotada a RECENT_ITEMS_WINDOW."""
+    recent = [resource_pk] + [other for other in recent if other != resource_pk]
+    return recent[:get_setting('RECENT_ITEMS_WINDOW')]
+
+
+def _increment_pairs(deltas):
+    """
+    Suma a cada par (origen, otro) su incremento de `deltas`: una consulta para leer los
+    existentes, una actualización con F() por cada incremento distinto y un bulk_create con
+    los que faltan.
+    """
+    if not deltas:
+        return
+    sources = {source for source, _ in deltas}
+    others = {other for _, other in deltas}
+    existing = {
+        (source, other): pk
+        for pk, source, other in ResourceCooccurrence.objects.filter(
+            resource_id__in=sources, other_id__in=others
+        ).values_list('pk', 'resource_id', 'other_id')
+    }
+    by_amount = defaultdict(list)
+    for pair, amount in deltas.items():
+        if pair in existing:
+            by_amount[amount].append(existing[pair])
+    for amount, pks in by_amount.items():
+        ResourceCooccurrence.objects.filter(pk__in=pks).update(weight=F('weight') + amount)
+    to_create = [
+        ResourceCooccurrence(resource_id=source, other_id=other, weight=amount)
+        for (source, other), amount in deltas.items() if (source, other) not in existing
+    ]
+    # ignore_conflicts: si otro proceso creó el par a la vez se pierde como mucho un incremento.
+    ResourceCooccurrence.objects.bulk_create(to_create, ignore_conflicts=True)
+
+
+def _increment_popularity(deltas):
+    """`deltas` es recurso -> (peso sumado, número de interacciones)."""
+    existing = set(ResourcePopularity.objects.filter(resource_id__in=deltas).values_list('resource_id', flat=True))
+    for resource_pk in existing:
+        amount, count = deltas[resource_pk]
+        ResourcePopularity.objects.filter(resource_id=resource_pk).update(
+            weight=F('weight') + amount, interactions=F('interactions') + count
+        )
+    ResourcePopularity.objects.bulk_create(
+        [
+            ResourcePopularity(resource_id=resource_pk, weight=amount, interactions=count)
+            for resource_pk, (amount, count) in deltas.items() if resource_pk not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def record_interaction(interaction):
+    """Actualiza co-ocurrencias y popularidad con una interacción recién guardada."""
+    record_interactions([interaction])
+
+
+def record_interactions(interactions, windows=None):
+    """
+    Actualiza co-ocurrencias y popularidad con interacciones recién guardadas (en orden).
+    Los incrementos de todo el lote se acumulan en memoria y se escriben juntos, y la
+    ventana de recientes de cada (usuario, curso) se lee y se guarda una sola vez.
+
+    Con `windows` (diccionario (usuario, curso) -> ventana) las ventanas se llevan en ese
+    diccionario en lugar de en la caché, como hace replay_events al reconstruir desde cero.
+    """
+    exclude = [interaction.pk for interaction in interactions if interaction.pk is not None]
+    replaying = windows is not None
+    windows = windows if replaying else {}
+    pair_deltas = defaultdict(float)
+    popularity_deltas = {}
+    for interaction in interactions:
+        key = (interaction.lti_user_id, interaction.lti_context_id)
+        if key not in windows:
+            windows[key] = [] if replaying else recent_items(*key, exclude_interactions=exclude)
+        amount = interaction_weight(interaction.interaction_type, interaction.value)
+        for other in windows[key]:
+            if other != interaction.resource_id:
+                pair_deltas[(interaction.resource_id, other)] += amount
+                pair_deltas[(other, interaction.resource_id)] += amount
+        weight, count = popularity_deltas.get(interaction.resource_id, (0.0, 0))
+        popularity_deltas[interaction.resource_id] = (weight + amount, count + 1)
+        windows[key] = _push(windows[key], interaction.resource_id)
+
+    with transaction.atomic():
+        _increment_pairs(pair_deltas)
+        _increment_popularity(popularity_deltas)
+    if not replaying:
+        store_windows(windows)
+
+
+def store_windows(windows):
+    """Guarda en la caché las ventanas de recientes de varios (usuario, curso)."""
+    cache.set_many({_recent_key(*key): recent for key, recent in windows.items()}, RECENT_ITEMS_TIMEOUT)
+
+
+def recommend_for_user(user_id, context_id, limit):
+    """
+    PKs recomendadas a partir de las co-ocurrencias de los recursos recientes del usuario.
+    La puntuación de cada candidato es la suma de sus pesos de co-ocurrencia dividida por la
+    raíz de su popularidad, para no recomendar siempre lo más visto.
+    """
+    return recommend_for_seeds(recent_items(user_id, context_id), limit)
+
+
+def recommend_for_seeds(seeds, limit):
+    """
+    Hasta `limit` PKs puntuadas con las co-ocurrencias de `seeds` (recursos recientes).
+    Solo lee las tablas. Lo usa también el banco de pruebas (replay.py).
+    """
+    if not seeds:
+        return []
+
+    max_rows = get_setting('COOCCURRENCE_CANDIDATES')
+    rows = ResourceCooccurrence.objects.filter(resource_id__in=seeds).exclude(
+        other_id__in=seeds
+    ).order_by('-weight').values_list('other_id', 'weight')[:max_rows]
+    raw_scores = {}
+    for other_pk, weight in rows:
+        raw_scores[other_pk] = raw_scores.get(other_pk, 0.0) + weight
+    if not raw_scores:
+        return []
+
+    popularity = dict(ResourcePopularity.objects.filter(resource_id__in=raw_scores).values_list('resource_id', 'weight'))
+    scores = {
+        resource_pk: score / math.sqrt(max(popularity.get(resource_pk, 1.0), 1.0))
+        for resource_pk, score in raw_scores.items()
+    }
+    return heapq.nlargest(limit, scores, key=scores.get)
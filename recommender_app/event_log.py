@@ -0,0 +1,230 @@
+# lti_recommender_project/recommender_app/event_log.py
+
+"""
+Registro de eventos de interacción en disco, solo de adición (INTERACTION_INGEST_MODE = 'log').
+
+SQLite admite un único escritor: con ráfagas de interacciones cada INSERT espera al
+anterior. En modo 'log' la API solo añade una línea JSON a un segmento y responde; el
+compactor (compaction.py, comando compact_event_log) vuelca después los segmentos en
+UserInteraction en lotes grandes.
+
+- Cada proceso escribe en su propio segmento, <milisegundos>-<pid>.open, con una sola
+  llamada write() por lote de eventos. Al superar EVENT_LOG_SEGMENT_BYTES o
+  EVENT_LOG_SEGMENT_SECONDS el segmento se sincroniza y se renombra a .jsonl (sellado).
+- fsync se agrupa: un hilo sincroniza el segmento cada EVENT_LOG_FSYNC_INTERVAL_MS.
+  Si el proceso muere, lo escrito ya está en el sistema operativo; ante un corte de
+  corriente se pierde como mucho ese intervalo. Con 0 se sincroniza en cada escritura.
+- Los segmentos .open de procesos que ya no existen se sellan al compactar; una última
+  línea incompleta (escritura interrumpida) se descarta.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from .conf import get_index_dir, get_setting
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.jsonl'
+
+
+def get_log_dir():
+    directory = get_setting('EVENT_LOG_DIR')
+    if directory is None:
+        return get_index_dir() / 'event_log'
+    return Path(directory)
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _pid_of(path):
+    try:
+        return int(path.name.split('.')[0].rsplit('-', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class EventLogWriter:
+    """Segmento abierto por este proceso y el hilo que agrupa los fsync."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._fd = None
+        self._path = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._dirty = False
+        self._pid = None
+        self._flusher = None
+
+    def append(self, records):
+        """Añade los registros (diccionarios serializables a JSON) al segmento actual."""
+        if not records:
+            return
+        data = ''.join(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n' for record in records)
+        data = data.encode('utf-8')
+        fsync_interval = get_setting('EVENT_LOG_FSYNC_INTERVAL_MS')
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo (fork): el segmento del padre no es nuestro.
+                self._reset()
+            if self._fd is None or self._should_rotate():
+                self._rotate()
+            view = memoryview(data)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+            self._size += len(data)
+            if fsync_interval:
+                self._dirty = True
+            else:
+                os.fsync(self._fd)
+        if fsync_interval and self._flusher is None:
+            self._start_flusher(fsync_interval / 1000.0)
+
+    def _reset(self):
+        self._fd = None
+        self._path = None
+        self._dirty = False
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def _should_rotate(self):
+        return (
+            self._size >= get_setting('EVENT_LOG_SEGMENT_BYTES')
+            or time.monotonic() - self._opened_at >= get_setting('EVENT_LOG_SEGMENT_SECONDS')
+        )
+
+    def _rotate(self):
+        self._seal()
+        directory = self.directory or get_log_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._path = directory / f"{int(time.time() * 1000):013d}-{os.getpid()}{OPEN_SUFFIX}"
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._opened_at = time.monotonic()
+        self._size = 0
+        _fsync_dir(directory)
+
+    def _seal(self):
+        """Sincroniza, cierra y renombra el segmento actual a .jsonl (o lo borra si está vacío)."""
+        if self._fd is None:
+            return
+        os.fsync(self._fd)
+        os.close(self._fd)
+        if self._size:
+            os.rename(self._path, self._path.with_suffix(SEALED_SUFFIX))
+        else:
+            os.unlink(self._path)
+        _fsync_dir(self._path.parent)
+        self._fd = None
+        self._path = None
+        self._dirty = False
+
+    def _start_flusher(self, interval):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, args=(interval,), name='event-log-fsync', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush(rotate_idle=True)
+            except Exception as e:
+                logger.error(f"Error al sincronizar el registro de eventos: {e}")
+
+    def flush(self, rotate_idle=False):
+        """Sincroniza lo pendiente; con rotate_idle sella el segmento si ya le toca rotar."""
+        with self._lock:
+            if self._fd is None or self._pid != os.getpid():
+                return
+            if rotate_idle and self._should_rotate():
+                self._seal()
+            elif self._dirty:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._seal()
+
+
+_writer = EventLogWriter()
+atexit.register(_writer.close)
+
+
+def append(records):
+    """Añade registros al registro de eventos de este proceso."""
+    _writer.append(records)
+
+
+def segments(directory=None):
+    """Segmentos en orden de creación: lista de (ruta, sellado)."""
+    directory = directory or get_log_dir()
+    if not directory.exists():
+        return []
+    paths = [path for path in directory.iterdir() if path.suffix in (OPEN_SUFFIX, SEALED_SUFFIX)]
+    return [(path, path.suffix == SEALED_SUFFIX) for path in sorted(paths, key=lambda path: path.stem)]
+
+
+def seal_abandoned(directory=None):
+    """Sella los segmentos .open cuyos procesos ya no existen. Devuelve cuántos."""
+    sealed = 0
+    for path, is_sealed in segments(directory):
+        pid = _pid_of(path)
+        if is_sealed or pid is None or pid == os.getpid() or _pid_alive(pid):
+            continue
+        os.rename(path, path.with_suffix(SEALED_SUFFIX))
+        logger.warning(f"Segmento abandonado por el proceso {pid} sellado: {path.name}")
+        sealed += 1
+    if sealed:
+        _fsync_dir(directory or get_log_dir())
+    return sealed
+
+
+def read_records(path, offset, max_records=None):
+    """
+    Lee registros de un segmento a partir de `offset`. Genera (posición tras la línea, registro);
+    el registro es None si la línea no es JSON válido. Se detiene en una línea sin salto final.
+    """
+    count = 0
+    with open(path, 'rb') as segment:
+        segment.seek(offset)
+        for line in segment:
+            if not line.endswith(b'\n'):
+                return
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield offset, record
+            count += 1
+            if max_records and count >= max_records:
+                return
@@ -0,0 +1,111 @@
+# lti_recommender_project/recommender_app/export.py
+
+"""
+Exportación de UserInteraction en CSV o JSON Lines para análisis.
+
+Todo son generadores: las filas se leen con QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+(con el recurso en la misma consulta, select_related), se formatean y, opcionalmente, se
+comprimen con gzip en streaming, agrupadas en bloques de unos EXPORT_BUFFER_BYTES. La
+memoria usada no depende del número de filas exportadas. Lo usan la vista
+export_interactions (StreamingHttpResponse) y el comando export_interactions.
+
+Solo se exportan las interacciones que siguen en la base de datos; las archivadas se
+recuperan antes con restore_interactions.
+"""
+
+import csv
+import json
+import zlib
+
+from .conf import get_setting
+from .models import UserInteraction
+
+COLUMNS = (
+    'id', 'timestamp', 'lti_user_id', 'lti_context_id', 'resource_id', 'resource_title',
+    'resource_type', 'interaction_type', 'value',
+)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def interactions_queryset(context_id=None, since=None, until=None):
+    """Interacciones de un curso (o de todos) con since <= timestamp < until, por PK."""
+    interactions = UserInteraction.objects.select_related('resource').only(
+        'id', 'timestamp', 'lti_user_id', 'lti_context_id', 'interaction_type', 'value',
+        'resource__resource_id', 'resource__title', 'resource__resource_type',
+    )
+    if context_id:
+        interactions = interactions.filter(lti_context_id=context_id)
+    if since is not None:
+        interactions = interactions.filter(timestamp__gte=since)
+    if until is not None:
+        interactions = interactions.filter(timestamp__lt=until)
+    return interactions.order_by('pk')
+
+
+def _rows(interactions):
+    for interaction in interactions.iterator(chunk_size=get_setting('EXPORT_CHUNK_SIZE')):
+        resource = interaction.resource
+        yield (
+            interaction.pk, interaction.timestamp.isoformat(), interaction.lti_user_id,
+            interaction.lti_context_id, resource.resource_id, resource.title,
+            resource.resource_type, interaction.interaction_type, interaction.value,
+        )
+
+
+class _Lines:
+    """Pseudo-archivo para csv.writer: devuelve la línea escrita en lugar de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Lines())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _buffered(lines):
+    """Agrupa las líneas en bloques de bytes de unos EXPORT_BUFFER_BYTES."""
+    limit = get_setting('EXPORT_BUFFER_BYTES')
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= limit:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(interactions, output='csv', compress=False):
+    """Bloques de bytes con las interacciones en el formato pedido ('csv' o 'jsonl')."""
+    lines = _csv_lines if output == 'csv' else _jsonl_lines
+    chunks = _buffered(lines(_rows(interactions)))
+    return _gzipped(chunks) if compress else chunks
+
+
+def filename(output, compress=False, context_id=None):
+    name = f"interactions-{context_id}" if context_id else 'interactions'
+    name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
+    return f"{name}.{FORMATS[output][1]}" + ('.gz' if compress else '')
@@ -0,0 +1,80 @@
+# lti_recommender_project/recommender_app/history.py
+
+"""
+Historial de interacciones de un usuario en un curso, de la más reciente a la más antigua.
+
+Se pagina por clave (timestamp, id) y no con OFFSET: cada página continúa estrictamente
+después de la última fila de la anterior, así que lee solo page_size + 1 filas del índice
+(lti_user_id, lti_context_id, -timestamp, -id) por muy atrás que esté, y las interacciones
+nuevas que llegan mientras se pagina no desplazan ni repiten filas.
+
+El modo compacto devuelve solo resource_id y interaction_type: lo justo para que el
+frontend marque las recomendaciones ya vistas.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UserInteraction
+
+FULL_FIELDS = {
+    'id': 'id',
+    'resource_id': 'resource__resource_id',
+    'title': 'resource__title',
+    'url': 'resource__url',
+    'interaction_type': 'interaction_type',
+    'value': 'value',
+    'timestamp': 'timestamp',
+}
+COMPACT_FIELDS = {
+    'resource_id': 'resource__resource_id',
+    'interaction_type': 'interaction_type',
+}
+
+
+def encode_cursor(timestamp, pk):
+    raw = json.dumps({'t': timestamp.isoformat(), 'i': pk}, separators=(',', ':')).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Devuelve (timestamp, id) de la última fila servida o lanza ValueError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        timestamp, pk = datetime.fromisoformat(data['t']), data['i']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError(cursor)
+    if not isinstance(pk, int) or timezone.is_naive(timestamp):
+        raise ValueError(cursor)
+    return timestamp, pk
+
+
+def history_page(user_id, context_id, page_size, after=None, compact=False):
+    """
+    Una página del historial. `after` es el (timestamp, id) de la última fila de la página
+    anterior. Devuelve (filas, cursor de la página siguiente o None).
+    """
+    fields = COMPACT_FIELDS if compact else FULL_FIELDS
+    interactions = UserInteraction.objects.filter(lti_user_id=user_id, lti_context_id=context_id)
+    if after is not None:
+        timestamp, pk = after
+        # El timestamp__lte redundante deja al planificador un rango sobre el índice.
+        interactions = interactions.filter(timestamp__lte=timestamp).filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+        )
+    # timestamp e id se leen siempre para construir el cursor aunque el modo compacto no los devuelva.
+    rows = list(
+        interactions.order_by('-timestamp', '-id')
+        .values(*dict.fromkeys(('timestamp', 'id', *fields.values())))
+        [:page_size + 1]
+    )
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+    return [{name: row[lookup] for name, lookup in fields.items()} for row in rows], next_cursor
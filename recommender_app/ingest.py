@@ -0,0 +1,167 @@
+# lti_recommender_project/recommender_app/ingest.py
+
+"""
+Registro de interacciones en lote.
+
+Los rastreadores del navegador generan decenas de eventos por página. En lugar de una
+petición, una búsqueda del recurso y un INSERT por evento, un lote se valida evento a
+evento, resuelve todos los recursos con una sola consulta IN y se inserta con bulk_create
+en una transacción (un único bloqueo de escritura en SQLite). Los errores se informan por
+evento y no impiden guardar el resto.
+
+resource_lookup guarda en cada proceso las PK resueltas durante unos segundos, así que un
+recurso borrado desde otro proceso puede resolverse todavía: la inserción falla entonces por
+la clave foránea. En ese caso se comprueba en la base de datos qué recursos existen, se
+olvidan los borrados y se guarda el resto del lote (ver insert_interactions).
+
+Con INTERACTION_INGEST_MODE = 'log' los eventos válidos no se insertan: se añaden al
+registro de eventos (event_log.py) y el compactor los vuelca después en la base de datos.
+"""
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .conf import get_setting
+from .models import EducationalResource, UserInteraction
+from .serializers import UserInteractionSerializer
+from .signals import notify_interactions_recorded
+from . import event_log, resource_lookup
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ('database', 'log')
+
+
+def log_mode():
+    """True si las interacciones se aceptan en el registro de eventos en lugar de en la base de datos."""
+    mode = get_setting('INTERACTION_INGEST_MODE')
+    if mode not in INGEST_MODES:
+        raise ValueError(f"INTERACTION_INGEST_MODE debe ser uno de {INGEST_MODES}, no {mode!r}.")
+    return mode == 'log'
+
+
+def events_from_payload(data):
+    """Lista de eventos de una petición: una lista, {"events": [...]} o un solo evento (None si no hay forma)."""
+    if isinstance(data, dict):
+        events = data.get('events', [data] if 'resource_id' in data else None)
+    else:
+        events = data
+    return events if isinstance(events, list) else None
+
+
+def validate_events(events):
+    """
+    Valida los campos de cada evento sin tocar la base de datos.
+    Devuelve (válidos, errores): válidos es una lista de (posición, validated_data).
+    """
+    errors = []
+    valid = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ["Se esperaba un objeto JSON."]}})
+            continue
+        serializer = UserInteractionSerializer(data=event)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    return valid, errors
+
+
+def _resolve_resources(events):
+    """(resource_id, lti_context_id) -> PK de EducationalResource, desde resource_lookup o con una sola consulta."""
+    return resource_lookup.lookup_many([(event['resource_id'], event.get('lti_context_id')) for event in events])
+
+
+def build_interactions(valid):
+    """
+    Crea (sin guardar) las interacciones de los eventos válidos resolviendo sus recursos.
+    Devuelve (lista de (posición, UserInteraction), errores de recursos inexistentes).
+    """
+    resources = _resolve_resources([data for _, data in valid]) if valid else {}
+    interactions = []
+    errors = []
+    for index, data in valid:
+        data = dict(data)
+        resource_id = data.pop('resource_id')
+        resource_pk = resources.get((resource_id, data.get('lti_context_id')))
+        if resource_pk is None:
+            errors.append({'index': index, 'errors': {'resource_id': [
+                f"El recurso con ID '{resource_id}' no existe para el contexto '{data.get('lti_context_id')}'."
+            ]}})
+            continue
+        interactions.append((index, UserInteraction(resource_id=resource_pk, **data)))
+    return interactions, errors
+
+
+def _bulk_create(interactions, in_transaction):
+    with transaction.atomic():
+        created = UserInteraction.objects.bulk_create(interactions)
+        if in_transaction is not None:
+            in_transaction()
+    return created
+
+
+def insert_interactions(interactions, in_transaction=None):
+    """
+    Inserta una lista de (posición, UserInteraction) con bulk_create en una transacción, junto
+    con `in_transaction()` si se da. Si falla porque algún recurso ya no existe, lo olvida en
+    resource_lookup y guarda las demás. Devuelve (interacciones creadas, errores).
+    """
+    rows = [interaction for _, interaction in interactions]
+    try:
+        return _bulk_create(rows, in_transaction), []
+    except IntegrityError:
+        resource_pks = {interaction.resource_id for interaction in rows}
+        existing = set(EducationalResource.objects.filter(pk__in=resource_pks).values_list('pk', flat=True))
+        if existing == resource_pks:
+            raise
+    resource_lookup.forget(resource_pks - existing)
+    errors = [
+        {'index': index, 'errors': {'resource_id': ["El recurso se ha borrado."]}}
+        for index, interaction in interactions if interaction.resource_id not in existing
+    ]
+    rows = [interaction for interaction in rows if interaction.resource_id in existing]
+    for interaction in rows:
+        # bulk_create ya les asignó una PK en la transacción deshecha.
+        interaction.pk = None
+    return _bulk_create(rows, in_transaction), errors
+
+
+def record_interactions(events):
+    """
+    Valida y guarda una lista de eventos (mismos campos que UserInteractionSerializer).
+    Devuelve (interacciones creadas, errores), donde cada error es {'index': posición, 'errors': {...}}.
+    """
+    valid, errors = validate_events(events)
+    interactions, resource_errors = build_interactions(valid)
+    errors += resource_errors
+
+    if interactions:
+        interactions, insert_errors = insert_interactions(interactions)
+        errors += insert_errors
+    if interactions:
+        # bulk_create no emite post_save: se avisa a los receptores con todo el lote.
+        notify_interactions_recorded(interactions)
+
+    errors.sort(key=lambda error: error['index'])
+    return interactions, errors
+
+
+def enqueue_interactions(events):
+    """
+    Valida los eventos y añade los válidos al registro de eventos con el instante actual.
+    La existencia del recurso la comprueba el compactor. Devuelve (aceptados, errores).
+    """
+    valid, errors = validate_events(events)
+    enqueue([data for _, data in valid])
+    return len(valid), errors
+
+
+def enqueue(validated):
+    """Añade al registro de eventos datos ya validados por UserInteractionSerializer."""
+    if validated:
+        timestamp = timezone.now().isoformat()
+        event_log.append([dict(data, timestamp=timestamp) for data in validated])
@@ -0,0 +1,130 @@
+# lti_recommender_project/recommender_app/item_similarity.py
+
+"""
+Filtrado colaborativo ítem-ítem.
+
+La similitud entre recursos se calcula fuera de línea (comando build_item_similarity)
+a partir de las interacciones de los usuarios y se guarda como una tabla compacta con
+los K vecinos más parecidos de cada recurso (ResourceNeighbors). En el lanzamiento LTI
+solo se leen las filas de vecinos de los recursos que el usuario ya ha visto y se
+combinan en memoria, así que el coste no depende del tamaño del catálogo.
+"""
+
+import heapq
+import logging
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+from .conf import get_setting
+from .models import ResourceNeighbors, UserInteraction
+
+logger = logging.getLogger(__name__)
+
+
+def interaction_weight(interaction_type, value):
+    """
+    Peso implícito de una interacción.
+    Combina el peso del tipo de interacción con su valor (tiempo, puntuación...),
+    amortiguado con un logaritmo para que valores muy grandes no dominen.
+    """
+    weights = get_setting('INTERACTION_WEIGHTS')
+    weight = weights.get(interaction_type, get_setting('DEFAULT_INTERACTION_WEIGHT'))
+    if value is not None and value > 0:
+        weight *= 1.0 + math.log1p(value)
+    return weight
+
+
+def build_item_neighbors(top_k=None, max_items_per_user=None, batch_size=1000):
+    """
+    Recalcula la tabla ResourceNeighbors a partir de todas las interacciones.
+
+    La similitud es el coseno entre los vectores de pesos usuario-recurso.
+    Cada (usuario, curso) cuenta como un perfil independiente.
+    Devuelve el número de recursos con vecinos guardados.
+    """
+    top_k = top_k or get_setting('NEIGHBORS_TOP_K')
+    max_items_per_user = max_items_per_user or get_setting('MAX_ITEMS_PER_USER')
+
+    # 1. Agrega los pesos por perfil recorriendo la tabla por bloques.
+    profiles = defaultdict(dict)
+    interactions = UserInteraction.objects.values_list(
+        'lti_user_id', 'lti_context_id', 'resource_id', 'interaction_type', 'value'
+    )
+    for user_id, context_id, resource_pk, interaction_type, value in interactions.iterator(chunk_size=5000):
+        items = profiles[(user_id, context_id)]
+        items[resource_pk] = items.get(resource_pk, 0.0) + interaction_weight(interaction_type, value)
+
+    # 2. Acumula normas y productos escalares entre pares de recursos co-consumidos.
+    norms = defaultdict(float)
+    dots = defaultdict(lambda: defaultdict(float))
+    for items in profiles.values():
+        if len(items) > max_items_per_user:
+            items = dict(heapq.nlargest(max_items_per_user, items.items(), key=lambda item: item[1]))
+        ranked = list(items.items())
+        for index, (resource_a, weight_a) in enumerate(ranked):
+            norms[resource_a] += weight_a * weight_a
+            for resource_b, weight_b in ranked[index + 1:]:
+                product = weight_a * weight_b
+                dots[resource_a][resource_b] += product
+                dots[resource_b][resource_a] += product
+    del profiles
+
+    # 3. Normaliza y se queda con los K vecinos más similares de cada recurso.
+    rows = []
+    for resource_pk, neighbors in dots.items():
+        norm_a = math.sqrt(norms[resource_pk])
+        similarities = (
+            (neighbor_pk, product / (norm_a * math.sqrt(norms[neighbor_pk])))
+            for neighbor_pk, product in neighbors.items()
+        )
+        best = heapq.nlargest(top_k, similarities, key=lambda item: item[1])
+        rows.append(ResourceNeighbors(
+            resource_id=resource_pk,
+            neighbor_ids=[neighbor_pk for neighbor_pk, _ in best],
+            scores=[round(score, 6) for _, score in best],
+        ))
+
+    with transaction.atomic():
+        ResourceNeighbors.objects.all().delete()
+        ResourceNeighbors.objects.bulk_create(rows, batch_size=batch_size)
+
+    logger.info(f"Tabla ítem-ítem reconstruida: {len(rows)} recursos con vecinos.")
+    return len(rows)
+
+
+def recommend_for_user(user_id, context_id, limit):
+    """
+    Devuelve hasta `limit` PKs de recursos recomendados para el usuario en el curso,
+    ordenados por puntuación descendente. Lista vacía si el usuario no tiene historial.
+    """
+    history = UserInteraction.objects.filter(
+        lti_user_id=user_id, lti_context_id=context_id
+    ).order_by('-timestamp').values_list('resource_id', 'interaction_type', 'value')[:get_setting('USER_HISTORY_SIZE')]
+
+    seeds = {}
+    for resource_pk, interaction_type, value in history:
+        seeds[resource_pk] = seeds.get(resource_pk, 0.0) + interaction_weight(interaction_type, value)
+    return recommend_for_seeds(seeds, limit)
+
+
+def recommend_for_seeds(seeds, limit):
+    """
+    Hasta `limit` PKs puntuadas con los vecinos de `seeds` (PK -> peso del historial).
+    Las semillas no se recomiendan. Lo usa también el banco de pruebas (replay.py).
+    """
+    if not seeds:
+        return []
+
+    # Una sola consulta por clave primaria para los vecinos de todas las semillas.
+    scores = {}
+    neighbor_rows = ResourceNeighbors.objects.filter(resource_id__in=seeds).values_list('resource_id', 'neighbor_ids', 'scores')
+    for seed_pk, neighbor_ids, similarities in neighbor_rows:
+        seed_weight = seeds[seed_pk]
+        for neighbor_pk, similarity in zip(neighbor_ids, similarities):
+            if neighbor_pk in seeds:
+                continue
+            scores[neighbor_pk] = scores.get(neighbor_pk, 0.0) + seed_weight * similarity
+
+    return heapq.nlargest(limit, scores, key=scores.get)
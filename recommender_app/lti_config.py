@@ -0,0 +1,308 @@
+# lti_recommender_project/recommender_app/lti_config.py
+
+"""
+Caché de la configuración LTI y de las claves del camino de inicio de sesión y lanzamiento.
+
+DjangoDbToolConf lee la herramienta (emisor, client_id, claves) de la base de datos y
+MessageLaunch descarga el JWKS de la plataforma (Moodle) para verificar cada id_token.
+Con este módulo, en régimen estable un lanzamiento no hace ninguna consulta ni ninguna
+petición HTTP de configuración:
+
+- CachedDbToolConf guarda en memoria del proceso, durante LTI_CONFIG_TTL segundos, cada
+  herramienta con su clave ya interpretada: la clave privada cargada (no se vuelve a leer el
+  PEM en cada firma), el kid de la pública y los deployment_ids. Guardar o borrar un LtiTool o
+  un LtiToolKey (por ejemplo desde el admin) sube una generación en la caché de Django y la
+  configuración se vuelve a leer en todos los procesos (ver signals.py).
+- platform_keys guarda las claves públicas de cada JWKS de plataforma por kid, ya convertidas
+  en objetos de clave. Solo se vuelve a descargar el JWKS cuando caduca (LTI_JWKS_TTL) o llega
+  un kid desconocido (la plataforma ha rotado sus claves), y como mucho una vez cada
+  LTI_JWKS_MIN_REFRESH_INTERVAL segundos para que kids inventados no provoquen descargas.
+- jwks_document() es el JWKS de la herramienta ya serializado, con su ETag, que sirve la vista
+  jwks sin tocar la base de datos. Incluye las claves retiradas por rotate_tool_key hasta que
+  se borran, así que durante una rotación se publican la antigua y la nueva.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import jwt
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from pylti1p3.contrib.django import DjangoDbToolConf, DjangoMessageLaunch
+from pylti1p3.contrib.django.lti1p3_tool_config.models import LtiToolKey
+from pylti1p3.deployment import Deployment
+from pylti1p3.exception import LtiException
+from pylti1p3.registration import Registration
+
+from .conf import get_setting
+from .models import RetiredToolKey
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'lti_config:generation'
+
+
+def bump_generation():
+    """Marca como obsoleta la configuración LTI cacheada en todos los procesos."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+class CachedRegistration(Registration):
+    """Registration con el kid de la clave pública ya calculado."""
+
+    _kid = None
+
+    def set_kid(self, kid):
+        self._kid = kid
+        return self
+
+    def get_kid(self):
+        return self._kid
+
+
+class CachedDbToolConf(DjangoDbToolConf):
+    """DjangoDbToolConf con caché en memoria e invalidación por generación."""
+
+    def __init__(self):
+        super().__init__()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key, load):
+        generation = cache.get(GENERATION_KEY, 0)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and now - entry[1] < get_setting('LTI_CONFIG_TTL'):
+                metrics.incr('lti_config.hit')
+                return entry[2]
+        metrics.incr('lti_config.miss')
+        value = load()
+        with self._lock:
+            self._entries[key] = (generation, now, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load_tool(self, iss, client_id):
+        tools = self._tools_cls.objects.select_related('tool_key').filter(issuer=iss, is_active=True)
+        if client_id is None:
+            lti_tool = tools.order_by('use_by_default').first()
+        else:
+            lti_tool = tools.filter(client_id=client_id).first()
+        if lti_tool is None:
+            raise LtiException(f"iss {iss} [client_id={client_id}] not found in settings")
+
+        tool_key = lti_tool.tool_key
+        public_key = tool_key.public_key or None
+        return {
+            'tool': lti_tool,
+            'key_set': json.loads(lti_tool.key_set) if lti_tool.key_set else None,
+            'deployment_ids': frozenset(json.loads(lti_tool.deployment_ids) if lti_tool.deployment_ids else ()),
+            'private_key': serialization.load_pem_private_key(tool_key.private_key.encode('utf-8'), password=None),
+            'public_key': public_key,
+            'kid': Registration.get_jwk(public_key).get('kid') if public_key else None,
+        }
+
+    def _tool(self, iss, client_id):
+        return self._entry(('tool', iss, client_id), lambda: self._load_tool(iss, client_id))
+
+    def get_lti_tool(self, iss, client_id):
+        return self._tool(iss, client_id)['tool']
+
+    def find_registration_by_params(self, iss, client_id, *args, **kwargs):
+        # Cada lanzamiento recibe su propio Registration: MessageLaunch le asigna el JWKS descargado.
+        entry = self._tool(iss, client_id)
+        lti_tool = entry['tool']
+        registration = CachedRegistration()
+        registration.set_auth_login_url(lti_tool.auth_login_url).set_auth_token_url(
+            lti_tool.auth_token_url
+        ).set_auth_audience(lti_tool.auth_audience or None).set_client_id(
+            lti_tool.client_id
+        ).set_key_set(entry['key_set']).set_key_set_url(
+            lti_tool.key_set_url or None
+        ).set_issuer(lti_tool.issuer).set_tool_private_key(
+            entry['private_key']
+        ).set_tool_public_key(entry['public_key'])
+        return registration.set_kid(entry['kid'])
+
+    def find_deployment_by_params(self, iss, deployment_id, client_id, *args, **kwargs):
+        if deployment_id not in self._tool(iss, client_id)['deployment_ids']:
+            return None
+        return Deployment().set_deployment_id(deployment_id)
+
+    def get_jwks(self, iss=None, client_id=None, **kwargs):
+        return self._entry(('jwks', iss, client_id), lambda: super(CachedDbToolConf, self).get_jwks(iss, client_id, **kwargs))
+
+
+class PlatformKeySet:
+    """Claves públicas de los JWKS de las plataformas, por URL y kid."""
+
+    def __init__(self):
+        self._key_sets = {}  # url -> (instante de descarga, {kid: (alg, clave)})
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _lookup(self, url, kid, alg, now):
+        """Devuelve (clave o None, True si hay que descargar el JWKS)."""
+        with self._lock:
+            entry = self._key_sets.get(url)
+        if entry is None:
+            return None, True
+        fetched_at, keys = entry
+        age = now - fetched_at
+        key = keys.get(kid)
+        if key is not None and key[0] == alg and age < get_setting('LTI_JWKS_TTL'):
+            return key[1], False
+        if key is None and age < get_setting('LTI_JWKS_MIN_REFRESH_INTERVAL'):
+            return None, False
+        return None, True
+
+    def _fetch(self, url, session):
+        metrics.incr('lti_config.jwks_fetch')
+        try:
+            response = session.get(url, timeout=get_setting('LTI_JWKS_TIMEOUT'))
+            response.raise_for_status()
+            key_set = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise LtiException(f"Error during fetch URL {url}: {e}") from e
+
+        keys = {}
+        for key in key_set.get('keys', []):
+            if not key.get('kid'):
+                continue
+            try:
+                keys[key['kid']] = (key.get('alg', 'RS256'), jwt.PyJWK(key, key.get('alg', 'RS256')).key)
+            except (jwt.exceptions.PyJWKError, jwt.exceptions.InvalidKeyError) as e:
+                logger.warning(f"Clave {key['kid']} de {url} no válida: {e}")
+        with self._lock:
+            self._key_sets[url] = (time.monotonic(), keys)
+
+    def public_key(self, url, kid, alg, session):
+        """Clave pública (objeto ya interpretado) del kid en el JWKS de `url`."""
+        key, refresh = self._lookup(url, kid, alg, time.monotonic())
+        if refresh:
+            # Un solo hilo descarga; los demás usan el resultado.
+            with self._fetch_lock:
+                key, refresh = self._lookup(url, kid, alg, time.monotonic())
+                if refresh:
+                    self._fetch(url, session)
+                    key, _ = self._lookup(url, kid, alg, time.monotonic())
+        if key is None:
+            raise LtiException("Unable to find public key")
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._key_sets.clear()
+
+
+# Instancia compartida por el proceso.
+platform_keys = PlatformKeySet()
+
+
+class CachedMessageLaunch(DjangoMessageLaunch):
+    """DjangoMessageLaunch que verifica el id_token con las claves de platform_keys."""
+
+    def get_public_key(self):
+        assert self._registration is not None, "Registration not yet set"
+        key_set_url = self._registration.get_key_set_url()
+        # Un JWKS fijo en la configuración de la herramienta no necesita caché.
+        if self._registration.get_key_set() or not key_set_url:
+            return super().get_public_key()
+        if not key_set_url.startswith(('http://', 'https://')):
+            raise LtiException("Invalid URL: " + key_set_url)
+
+        header = self._jwt.get('header', {})
+        kid, alg = header.get('kid'), header.get('alg')
+        if not kid:
+            raise LtiException("JWT KID not found")
+        if not alg:
+            raise LtiException("JWT ALG not found")
+        return platform_keys.public_key(key_set_url, kid, alg, self._requests_session), alg
+
+
+_jwks_document = None  # (generación, instante, cuerpo, ETag)
+_jwks_lock = threading.Lock()
+
+
+def jwks_document():
+    """
+    (cuerpo JSON en bytes, ETag) del JWKS de la herramienta. Se serializa una vez por
+    generación de la configuración (o cada LTI_CONFIG_TTL segundos, por si la generación se
+    subió en otro proceso sin caché compartida) y se sirve desde memoria.
+    """
+    global _jwks_document
+    generation = cache.get(GENERATION_KEY, 0)
+    now = time.monotonic()
+    document = _jwks_document
+    if document is not None and document[0] == generation and now - document[1] < get_setting('LTI_CONFIG_TTL'):
+        return document[2], document[3]
+
+    with _jwks_lock:
+        metrics.incr('lti_config.jwks_build')
+        # Todas las claves con parte pública: las de las herramientas y las retiradas aún publicadas.
+        keys = sorted(DjangoDbToolConf().get_jwks()['keys'], key=lambda key: key.get('kid', ''))
+        body = json.dumps({'keys': keys}, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        _jwks_document = (generation, now, body, etag)
+    return body, etag
+
+
+def _generate_key(key_size):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode('ascii'), public_pem.decode('ascii')
+
+
+def rotate_tool_key(tools, key_size=2048):
+    """
+    Crea una clave nueva y hace que `tools` firmen con ella. Las claves anteriores que ya no
+    usa ninguna herramienta quedan retiradas (se siguen publicando). Devuelve la clave nueva.
+    """
+    private_pem, public_pem = _generate_key(key_size)
+    now = timezone.now()
+    with transaction.atomic():
+        new_key = LtiToolKey.objects.create(
+            name=f"recommender-{now:%Y%m%d%H%M%S%f}", private_key=private_pem, public_key=public_pem,
+        )
+        old_keys = set()
+        for tool in tools:
+            old_keys.add(tool.tool_key_id)
+            tool.tool_key = new_key
+            tool.save(update_fields=['tool_key'])
+        unused = LtiToolKey.objects.filter(pk__in=old_keys).exclude(lti_tools__isnull=False)
+        for key in unused:
+            RetiredToolKey.objects.get_or_create(key=key, defaults={'retired_at': now})
+    bump_generation()
+    return new_key
+
+
+def prune_retired_keys(overlap_hours):
+    """Borra las claves retiradas hace más de `overlap_hours` horas. Devuelve sus nombres."""
+    cutoff = timezone.now() - timedelta(hours=overlap_hours)
+    expired = LtiToolKey.objects.filter(retirement__retired_at__lt=cutoff, lti_tools__isnull=True)
+    names = list(expired.values_list('name', flat=True))
+    if names:
+        expired.delete()
+        bump_generation()
+    return names
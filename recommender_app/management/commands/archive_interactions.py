@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las interacciones más antiguas que INTERACTION_RETENTION_DAYS a archivos mensuales "
+        "comprimidos (ver restore_interactions). Los resúmenes diarios se conservan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Días de interacciones que se quedan en la base de datos.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Interacciones borradas por transacción.")
+
+    def handle(self, *args, **options):
+        cutoff = archive.retention_cutoff(options['days'])
+        archived = archive.archive_before(cutoff, batch_size=options['batch_size'])
+        for path, count in archived:
+            self.stdout.write(f"{path.name}: {count} interacciones")
+        total = sum(count for _, count in archived)
+        self.stdout.write(self.style.SUCCESS(f"Interacciones anteriores a {cutoff:%Y-%m-%d} archivadas: {total}."))
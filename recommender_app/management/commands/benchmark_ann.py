@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from recommender_app.ann_index import LSHIndex, exact_search
+
+
+def synthetic_catalog(n_items, dim, n_topics, seed):
+    """
+    Catálogo sintético con estructura de temas: cada recurso es el centro de su tema más ruido,
+    de modo que los vecinos reales son pocos y están agrupados (como en OER Commons).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    topics = rng.integers(0, n_topics, size=n_items)
+    vectors = centers[topics] + 0.6 * rng.standard_normal((n_items, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples, percentile):
+    return float(np.percentile(samples, percentile) * 1000.0)
+
+
+class Command(BaseCommand):
+    help = "Compara recall@k y latencia del índice LSH frente a la búsqueda exacta en un catálogo sintético."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200000, help="Tamaño del catálogo sintético.")
+        parser.add_argument('--dim', type=int, default=128)
+        parser.add_argument('--topics', type=int, default=2000)
+        parser.add_argument('--queries', type=int, default=300)
+        parser.add_argument('-k', type=int, default=10)
+        parser.add_argument('--configs', default='8x12x0,16x12x1,24x14x2,32x16x3',
+                            help="Configuraciones TABLASxBITSxPROBES separadas por comas.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        k = options['k']
+        vectors = synthetic_catalog(options['items'], options['dim'], options['topics'], options['seed'])
+        ids = np.arange(len(vectors), dtype=np.int64)
+        rng = np.random.default_rng(options['seed'] + 1)
+        query_rows = rng.choice(len(vectors), size=options['queries'], replace=False)
+
+        exact_latencies, truth = [], []
+        for row in query_rows:
+            start = time.perf_counter()
+            truth.append(set(exact_search(vectors, vectors[row], k, exclude_row=row).tolist()))
+            exact_latencies.append(time.perf_counter() - start)
+        self.stdout.write(
+            f"exacta: catálogo={len(vectors)} dim={options['dim']} "
+            f"p50={percentile_ms(exact_latencies, 50):.3f}ms p95={percentile_ms(exact_latencies, 95):.3f}ms"
+        )
+
+        for config in options['configs'].split(','):
+            n_tables, n_bits, probes = (int(part) for part in config.split('x'))
+            start = time.perf_counter()
+            index = LSHIndex.build(vectors, ids, n_tables=n_tables, n_bits=n_bits, seed=options['seed'])
+            build_seconds = time.perf_counter() - start
+
+            latencies, hits, candidates = [], 0, 0
+            for row, expected in zip(query_rows, truth):
+                start = time.perf_counter()
+                found, _ = index.query(vectors[row], k, probes=probes, exclude_row=row)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected.intersection(found.tolist()))
+                candidates += len(index.candidates(vectors[row], probes=probes))
+            self.stdout.write(
+                f"lsh {n_tables} tablas x {n_bits} bits, probes={probes}: "
+                f"recall@{k}={hits / (k * len(truth)):.3f} "
+                f"p50={percentile_ms(latencies, 50):.3f}ms p95={percentile_ms(latencies, 95):.3f}ms "
+                f"candidatos={candidates / len(truth):.0f} construcción={build_seconds:.1f}s"
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app.ann_index import DEFAULT_DIM, build_ann_index
+
+
+class Command(BaseCommand):
+    help = "Construye el índice LSH de vecinos aproximados usado para 'más como este'."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help="Dimensión de los vectores con hashing.")
+        parser.add_argument('--tables', type=int, default=24, help="Número de tablas LSH.")
+        parser.add_argument('--bits', type=int, default=14, help="Bits (hiperplanos) por tabla.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        total = build_ann_index(dim=options['dim'], n_tables=options['tables'], n_bits=options['bits'], seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(f"Índice ANN construido con {total} recursos."))
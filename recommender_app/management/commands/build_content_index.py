@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app.content_index import build_content_index
+
+
+class Command(BaseCommand):
+    help = "Actualiza el índice TF-IDF de recursos educativos (solo los modificados desde la última ejecución)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Re-vectoriza todo el catálogo y compacta el vocabulario.")
+
+    def handle(self, *args, **options):
+        total, updated = build_content_index(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Índice de contenido: {total} recursos ({updated} re-vectorizados)."))
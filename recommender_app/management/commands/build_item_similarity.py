@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app.item_similarity import build_item_neighbors
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla de vecinos ítem-ítem a partir de las interacciones de los usuarios."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help="Número de vecinos guardados por recurso.")
+        parser.add_argument('--max-items-per-user', type=int, default=None, help="Máximo de recursos considerados por usuario.")
+
+    def handle(self, *args, **options):
+        total = build_item_neighbors(top_k=options['top_k'], max_items_per_user=options['max_items_per_user'])
+        self.stdout.write(self.style.SUCCESS(f"Vecinos calculados para {total} recursos."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Precalcula las recomendaciones de cada (usuario, curso) activo y de cada curso (ejecutar cada hora o cada noche)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--active-days', type=int, default=30, help="Usuarios con interacciones en los últimos N días.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Filas por bulk_create.")
+
+    def handle(self, *args, **options):
+        users, contexts = build_snapshots(active_days=options['active_days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Instantáneas generadas: {users} de usuario y {contexts} de curso."))
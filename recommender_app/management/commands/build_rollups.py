@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommender_app import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes diarios de interacciones desde una fecha (por defecto, desde la "
+        "interacción más antigua que sigue en la base de datos; los días archivados se conservan)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Primer día a recalcular (AAAA-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since debe tener el formato AAAA-MM-DD.")
+        created = rollups.rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes diarios recalculados: {created} filas."))
@@ -0,0 +1,41 @@
+import fcntl
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommender_app import compaction, event_log
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelca el registro de eventos de interacción en la base de datos (INTERACTION_INGEST_MODE = 'log'). "
+        "Con --loop se queda en ejecución como proceso compactor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Eventos por transacción.")
+        parser.add_argument('--loop', action='store_true', help="Repite la compactación indefinidamente.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Segundos de espera entre pasadas con --loop.")
+
+    def handle(self, *args, **options):
+        directory = event_log.get_log_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        # Un solo compactor a la vez: dos procesos leyendo el mismo segmento duplicarían eventos.
+        lock_file = open(directory / 'compactor.lock', 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise CommandError("Ya hay otro compactor en ejecución.")
+
+        try:
+            while True:
+                inserted, rejected = compaction.compact(batch_size=options['batch_size'], directory=directory)
+                if inserted or rejected or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f"Eventos volcados: {inserted} (rechazados: {rejected})."))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lock_file.close()
@@ -0,0 +1,49 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from recommender_app import export
+
+
+def _parse_datetime(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Fecha no válida: {value} (formato ISO 8601, p. ej. 2026-01-31 o 2026-01-31T12:00).")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta las interacciones en CSV o JSON Lines (opcionalmente con gzip) leyéndolas por bloques, "
+        "con memoria constante. Sin --output escribe en la salida estándar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--context', help="ID del contexto LTI (curso). Por defecto, todos.")
+        parser.add_argument('--since', help="Desde este instante, incluido (ISO 8601).")
+        parser.add_argument('--until', help="Hasta este instante, excluido (ISO 8601).")
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv', help="Formato de salida.")
+        parser.add_argument('--gzip', action='store_true', help="Comprime la salida con gzip.")
+        parser.add_argument('--output', '-o', help="Archivo de destino.")
+
+    def handle(self, *args, **options):
+        since = _parse_datetime(options['since']) if options['since'] else None
+        until = _parse_datetime(options['until']) if options['until'] else None
+        interactions = export.interactions_queryset(options['context'], since, until)
+        chunks = export.stream(interactions, options['format'], options['gzip'])
+
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as destination:
+            for chunk in chunks:
+                destination.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exportación escrita en {options['output']} ({written} bytes)."))
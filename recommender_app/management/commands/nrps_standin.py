@@ -0,0 +1,94 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+STANDIN_TOKEN = 'nrps-standin-token'
+LEARNER = 'http://purl.imsglobal.org/vocab/lis/v2/membership#Learner'
+INSTRUCTOR = 'http://purl.imsglobal.org/vocab/lis/v2/membership#Instructor'
+
+
+def standin_members(count):
+    """Un profesor y `count` estudiantes activos."""
+    members = [{'user_id': 'standin-instructor', 'status': 'Active', 'roles': [INSTRUCTOR]}]
+    members += [
+        {'user_id': f'standin-student-{number}', 'status': 'Active', 'roles': [LEARNER]}
+        for number in range(count)
+    ]
+    return members
+
+
+def make_server(port, context_id, members, page_size, log=None):
+    """
+    Servidor HTTP del NRPS de prueba (sin arrancar). `members` es la lista que devuelve y se
+    puede cambiar entre peticiones. Con port 0 el sistema elige uno libre (server.server_port).
+    """
+    context = {'id': context_id, 'title': 'Curso de prueba NRPS'}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/token':
+                return self._send(404, {'error': 'not_found'})
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.server.token_requests += 1
+            self._send(200, {'access_token': STANDIN_TOKEN, 'token_type': 'Bearer', 'expires_in': 3600})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/members':
+                return self._send(404, {'error': 'not_found'})
+            if self.headers.get('Authorization') != f'Bearer {STANDIN_TOKEN}':
+                return self._send(401, {'error': 'invalid_token'})
+            page = int(parse_qs(url.query).get('page', ['0'])[0])
+            start = page * page_size
+            headers = {}
+            if start + page_size < len(members):
+                headers['Link'] = f'<http://127.0.0.1:{self.server.server_port}/members?page={page + 1}>; rel="next"'
+            self._send(200, {'id': self.path, 'context': context, 'members': members[start:start + page_size]}, headers)
+
+        def log_message(self, format, *args):
+            if log is not None:
+                log(format % args)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.token_requests = 0
+    return server
+
+
+class Command(BaseCommand):
+    help = (
+        "Sirve un NRPS de prueba en local: POST /token devuelve un token y GET /members la lista "
+        "de miembros paginada con cabeceras Link. Solo para desarrollo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--context-id', default='standin-course')
+        parser.add_argument('--members', type=int, default=120, help="Número de estudiantes.")
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        port = options['port']
+        server = make_server(
+            port, options['context_id'], standin_members(options['members']), options['page_size'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"NRPS de prueba en http://127.0.0.1:{port}/members (tokens en http://127.0.0.1:{port}/token)."
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from pylti1p3.contrib.django import DjangoDbToolConf
+from pylti1p3.exception import LtiException
+from pylti1p3.names_roles import NamesRolesProvisioningService
+from pylti1p3.service_connector import ServiceConnector
+
+from recommender_app import roster
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga con NRPS la lista de miembros de un curso y precarga en la caché las "
+        "recomendaciones de sus estudiantes (útil también contra un NRPS local, ver nrps_standin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('context_id', help="lti_context_id del curso.")
+        parser.add_argument('--memberships-url', required=True, help="context_memberships_url del claim NRPS.")
+        parser.add_argument('--issuer', required=True, help="Issuer de la plataforma registrada.")
+        parser.add_argument('--client-id', required=True, help="client_id de la herramienta en la plataforma.")
+        parser.add_argument('--auth-token-url', default=None, help="Sustituye la URL de tokens del registro.")
+        parser.add_argument('--course-title', default=None, help="Título del curso para las recomendaciones por contenido.")
+
+    def handle(self, *args, **options):
+        try:
+            registration = DjangoDbToolConf().find_registration_by_params(options['issuer'], options['client_id'])
+        except LtiException as e:
+            raise CommandError(str(e))
+        if options['auth_token_url']:
+            registration.set_auth_token_url(options['auth_token_url'])
+
+        nrps = NamesRolesProvisioningService(
+            ServiceConnector(registration), {'context_memberships_url': options['memberships_url']}
+        )
+        learners, warmed = roster.prefetch_course(nrps, options['context_id'], options['course_title'])
+        self.stdout.write(self.style.SUCCESS(f"Recomendaciones precargadas para {warmed} de {learners} estudiantes."))
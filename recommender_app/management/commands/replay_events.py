@@ -0,0 +1,70 @@
+import heapq
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recommender_app import archive, cooccurrence, trending
+from recommender_app.models import ResourceCooccurrence, ResourcePopularity, TrendingScore, UserInteraction
+
+
+def _order(interaction):
+    return interaction.timestamp, interaction.pk
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las tablas derivadas (co-ocurrencias, popularidad y tendencias) reproduciendo "
+        "todas las interacciones en orden de timestamp, incluidas las archivadas por archive_interactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Interacciones por lote.")
+        parser.add_argument(
+            '--skip-archive', action='store_true',
+            help="Reproduce solo las interacciones de la base de datos (el historial archivado se pierde de las tablas derivadas).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        windows = {}
+        total = 0
+        interactions = UserInteraction.objects.order_by('timestamp', 'pk').only(
+            'pk', 'lti_user_id', 'lti_context_id', 'resource_id', 'interaction_type', 'value', 'timestamp'
+        ).iterator(chunk_size=batch_size)
+
+        archive_files = archive.archive_files()
+        if archive_files and options['skip_archive']:
+            self.stderr.write(self.style.WARNING(
+                f"Se omiten {len(archive_files)} archivos de {archive.get_archive_dir()}: "
+                "las tablas derivadas no incluirán esas interacciones."
+            ))
+        elif archive_files:
+            self.stdout.write(f"Se reproducen también {len(archive_files)} archivos de {archive.get_archive_dir()}.")
+            interactions = heapq.merge(archive.archived_interactions(), interactions, key=_order)
+
+        # Una sola transacción: si falla, las tablas anteriores quedan intactas.
+        with transaction.atomic():
+            ResourceCooccurrence.objects.all().delete()
+            ResourcePopularity.objects.all().delete()
+            TrendingScore.objects.all().delete()
+            batch = []
+            previous = None
+            for interaction in interactions:
+                # Una pasada de archivado interrumpida deja filas en el archivo y en la tabla.
+                if _order(interaction) == previous:
+                    continue
+                previous = _order(interaction)
+                batch.append(interaction)
+                if len(batch) == batch_size:
+                    self._replay(batch, windows)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self._replay(batch, windows)
+                total += len(batch)
+        cooccurrence.store_windows(windows)
+        self.stdout.write(self.style.SUCCESS(f"Tablas derivadas reconstruidas con {total} interacciones."))
+
+    def _replay(self, batch, windows):
+        cooccurrence.record_interactions(batch, windows=windows)
+        trending.record_interactions(batch)
@@ -0,0 +1,29 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommender_app import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a cargar en la base de datos las interacciones archivadas de uno o varios meses. "
+        "Siguen siendo antiguas: la próxima ejecución de archive_interactions las archivará de nuevo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('months', nargs='+', help="Meses a restaurar (AAAA-MM).")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Interacciones insertadas por transacción.")
+
+    def handle(self, *args, **options):
+        for month in options['months']:
+            if not re.fullmatch(r'\d{4}-\d{2}', month):
+                raise CommandError(f"Mes no válido: {month} (formato AAAA-MM).")
+            if not archive.archive_files(month):
+                raise CommandError(f"No hay archivos para el mes {month}.")
+
+        for month in options['months']:
+            restored, skipped = archive.restore_month(month, batch_size=options['batch_size'])
+            if skipped:
+                self.stdout.write(self.style.WARNING(f"{month}: {skipped} interacciones de recursos que ya no existen."))
+            self.stdout.write(self.style.SUCCESS(f"{month}: {restored} interacciones restauradas."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from pylti1p3.contrib.django.lti1p3_tool_config.models import LtiTool
+
+from recommender_app import lti_config
+from recommender_app.conf import get_setting
+
+
+class Command(BaseCommand):
+    help = (
+        "Rota la clave con la que firma la herramienta LTI: crea una clave nueva, la asigna a las "
+        "herramientas y mantiene la anterior publicada en el JWKS durante el solapamiento. "
+        "Con --prune borra las claves retiradas hace más de --overlap-hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issuer', help="Solo las herramientas de este emisor (por defecto, todas las activas).")
+        parser.add_argument('--client-id', help="Solo la herramienta con este client_id.")
+        parser.add_argument('--key-size', type=int, default=2048, help="Tamaño de la clave RSA en bits.")
+        parser.add_argument('--prune', action='store_true', help="Borra las claves retiradas en lugar de rotar.")
+        parser.add_argument('--overlap-hours', type=float, default=None, help="Horas que se publica una clave retirada.")
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            overlap = options['overlap_hours']
+            names = lti_config.prune_retired_keys(get_setting('TOOL_KEY_OVERLAP_HOURS') if overlap is None else overlap)
+            self.stdout.write(self.style.SUCCESS(f"Claves retiradas borradas: {', '.join(names) or 'ninguna'}."))
+            return
+
+        tools = LtiTool.objects.filter(is_active=True)
+        if options['issuer']:
+            tools = tools.filter(issuer=options['issuer'])
+        if options['client_id']:
+            tools = tools.filter(client_id=options['client_id'])
+        tools = list(tools)
+        if not tools:
+            raise CommandError("No hay herramientas LTI activas que coincidan.")
+
+        new_key = lti_config.rotate_tool_key(tools, key_size=options['key_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Clave {new_key.name} asignada a {len(tools)} herramienta(s). Las anteriores se publican hasta "
+            f"ejecutar --prune (tras {get_setting('TOOL_KEY_OVERLAP_HOURS')} h)."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recommender_app.mf_model import train_mf_model
+
+
+class Command(BaseCommand):
+    help = "Entrena el modelo de factorización matricial (ALS implícito) y lo publica para los workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=32, help="Número de factores latentes.")
+        parser.add_argument('--iterations', type=int, default=10, help="Iteraciones de ALS.")
+        parser.add_argument('--regularization', type=float, default=0.1)
+        parser.add_argument('--alpha', type=float, default=20.0, help="Escala de confianza de las interacciones.")
+
+    def handle(self, *args, **options):
+        users, items = train_mf_model(
+            n_factors=options['factors'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            alpha=options['alpha'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Modelo entrenado con {users} usuarios y {items} recursos."))
@@ -0,0 +1,28 @@
+# lti_recommender_project/recommender_app/metrics.py
+
+"""
+Contadores simples en memoria del proceso (aciertos de caché, degradaciones, rechazos...).
+Se consultan en el endpoint /api/metrics/. Cada worker lleva sus propios contadores.
+"""
+
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot(prefix=''):
+    """Copia de los contadores cuyo nombre empieza por `prefix`."""
+    with _lock:
+        return {name: value for name, value in sorted(_counters.items()) if name.startswith(prefix)}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
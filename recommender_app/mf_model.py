@@ -0,0 +1,201 @@
+# lti_recommender_project/recommender_app/mf_model.py
+
+"""
+Factorización matricial para feedback implícito (ALS, Hu, Koren y Volinsky 2008).
+
+El modelo se entrena fuera de línea (comando train_mf) sobre la matriz
+lti_user_id x recurso construida con los pesos de interaction_weight(). Los factores se
+publican como archivos .npy en un artefacto versionado (INDEX_DIR/mf_model) y cada
+proceso WSGI/ASGI los abre con mmap en solo lectura: el sistema operativo comparte una
+única copia física entre todos los workers. Al publicar un entrenamiento nuevo el archivo
+CURRENT cambia de forma atómica y cada proceso pasa a la versión nueva en su siguiente
+consulta.
+
+Archivos de cada versión:
+- user_ids.npy: IDs LTI de los usuarios, ordenados (búsqueda con searchsorted).
+- user_factors.npy / item_factors.npy: factores latentes (float32).
+- item_ids.npy: PK del recurso de cada fila de item_factors.
+- seen_indptr.npy / seen_items.npy: recursos ya consultados por cada usuario (formato CSR).
+"""
+
+import logging
+
+import numpy as np
+
+from .artifacts import ArtifactLoader, publish
+from .item_similarity import interaction_weight
+from .models import UserInteraction
+from . import sampling
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_KIND = 'mf_model'
+
+_ARRAYS = ('user_ids', 'user_factors', 'item_ids', 'item_factors', 'seen_indptr', 'seen_items')
+
+
+def _to_csr(rows, columns, values, n_rows):
+    """Agrupa tripletas (fila, columna, valor) en arreglos CSR con NumPy."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order], values[order]
+
+
+def _least_squares(fixed, indptr, indices, confidence, regularization):
+    """
+    Un medio paso de ALS: resuelve los factores de cada fila dados los factores fijos del otro lado.
+    (YᵀY + Yᵀ(Cu − I)Y + λI) x_u = Yᵀ Cu p_u, con p_u = 1 en los recursos consultados.
+    """
+    n_factors = fixed.shape[1]
+    gram = fixed.T @ fixed
+    regularization_matrix = regularization * np.eye(n_factors)
+    solved = np.zeros((len(indptr) - 1, n_factors), dtype=np.float64)
+    for row in range(len(indptr) - 1):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        factors = fixed[indices[start:end]]
+        row_confidence = confidence[start:end]
+        system = gram + (factors.T * (row_confidence - 1.0)) @ factors + regularization_matrix
+        solved[row] = np.linalg.solve(system, factors.T @ row_confidence)
+    return solved
+
+
+class ImplicitMFModel:
+    """
+    Factores de usuario y recurso de un entrenamiento; en producción son arreglos mmap de solo lectura.
+    """
+
+    def __init__(self, user_ids, user_factors, item_ids, item_factors, seen_indptr, seen_items):
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.item_ids = item_ids
+        self.item_factors = item_factors
+        self.seen_indptr = seen_indptr
+        self.seen_items = seen_items
+
+    @classmethod
+    def train(cls, user_keys, item_keys, weights, n_factors=32, iterations=10, regularization=0.1, alpha=20.0, seed=0):
+        """
+        Entrena el modelo a partir de listas paralelas (usuario, recurso, peso).
+        Los pesos repetidos de un mismo par se suman.
+        """
+        user_ids, user_rows = np.unique(np.asarray(user_keys, dtype=str), return_inverse=True)
+        item_ids, item_rows = np.unique(np.asarray(item_keys, dtype=np.int64), return_inverse=True)
+        pairs, pair_rows = np.unique(user_rows.astype(np.int64) * len(item_ids) + item_rows, return_inverse=True)
+        strength = np.bincount(pair_rows, weights=np.asarray(weights, dtype=np.float64))
+        users, items = pairs // len(item_ids), pairs % len(item_ids)
+        confidence = 1.0 + alpha * strength
+
+        user_indptr, user_items, user_confidence = _to_csr(users, items, confidence, len(user_ids))
+        item_indptr, item_users, item_confidence = _to_csr(items, users, confidence, len(item_ids))
+
+        rng = np.random.default_rng(seed)
+        user_factors = rng.normal(scale=0.01, size=(len(user_ids), n_factors))
+        item_factors = rng.normal(scale=0.01, size=(len(item_ids), n_factors))
+        for _ in range(iterations):
+            user_factors = _least_squares(item_factors, user_indptr, user_items, user_confidence, regularization)
+            item_factors = _least_squares(user_factors, item_indptr, item_users, item_confidence, regularization)
+
+        return cls(
+            user_ids=user_ids,
+            user_factors=user_factors.astype(np.float32),
+            item_ids=item_ids,
+            item_factors=item_factors.astype(np.float32),
+            seen_indptr=user_indptr,
+            seen_items=user_items.astype(np.int32),
+        )
+
+    def user_row(self, user_id):
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+    def item_rows(self, resource_pks):
+        """Filas de item_factors de las PKs dadas que están en el modelo (item_ids está ordenado)."""
+        resource_pks = np.asarray(resource_pks, dtype=np.int64)
+        if not len(self.item_ids):
+            return np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self.item_ids, resource_pks)
+        positions[positions == len(self.item_ids)] = 0
+        return positions[self.item_ids[positions] == resource_pks]
+
+    def recommend(self, user_id, k, candidate_rows=None):
+        """
+        PKs de los k recursos con mayor puntuación para el usuario (sin los ya consultados).
+        Con `candidate_rows` (ver item_rows) solo se puntúan esas filas, p. ej. las del curso.
+        Un producto matriz-vector y un argpartition; lista vacía si el usuario no está en el modelo.
+        """
+        row = self.user_row(user_id)
+        if row is None or not len(self.item_ids):
+            return []
+        seen = self.seen_items[self.seen_indptr[row]:self.seen_indptr[row + 1]]
+        if candidate_rows is None:
+            candidate_rows = np.arange(len(self.item_ids))
+            scores = self.item_factors @ self.user_factors[row]
+            scores[seen] = -np.inf
+        else:
+            if not len(candidate_rows):
+                return []
+            scores = self.item_factors[candidate_rows] @ self.user_factors[row]
+            scores[np.isin(candidate_rows, seen)] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(self.item_ids[candidate_rows[item]]) for item in top if np.isfinite(scores[item])]
+
+    def save(self, directory):
+        for name in _ARRAYS:
+            np.save(directory / f'{name}.npy', getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        return cls(**{name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode) for name in _ARRAYS})
+
+
+def train_mf_model(n_factors=32, iterations=10, regularization=0.1, alpha=20.0):
+    """Entrena con todas las interacciones y publica el modelo. Devuelve (usuarios, recursos)."""
+    user_keys, item_keys, weights = [], [], []
+    interactions = UserInteraction.objects.values_list('lti_user_id', 'resource_id', 'interaction_type', 'value')
+    for user_id, resource_pk, interaction_type, value in interactions.iterator(chunk_size=5000):
+        user_keys.append(user_id)
+        item_keys.append(resource_pk)
+        weights.append(interaction_weight(interaction_type, value))
+    if not user_keys:
+        logger.info("No hay interacciones: no se entrena el modelo de factorización.")
+        return 0, 0
+
+    model = ImplicitMFModel.train(
+        user_keys, item_keys, weights,
+        n_factors=n_factors, iterations=iterations, regularization=regularization, alpha=alpha,
+    )
+    publish(ARTIFACT_KIND, model.save)
+    logger.info(f"Modelo de factorización publicado: {len(model.user_ids)} usuarios, {len(model.item_ids)} recursos.")
+    return len(model.user_ids), len(model.item_ids)
+
+
+# Modelo abierto con mmap por proceso; se cambia de versión cuando se publica otro entrenamiento.
+_loaded = ArtifactLoader(ARTIFACT_KIND, ImplicitMFModel.load)
+
+
+def model_version():
+    """Versión del modelo cargado en este proceso (None si no hay modelo)."""
+    _loaded.get()
+    return _loaded.version
+
+
+def recommend_for_user(user_id, context_id, limit):
+    """
+    PKs recomendadas por el modelo de factorización. El modelo es global, pero solo se
+    puntúan los recursos del curso y los genéricos (PKs en memoria de sampling.py).
+    """
+    model = _loaded.get()
+    if model is None:
+        return []
+    candidate_pks = np.concatenate([
+        np.frombuffer(sampling.sampler.pks(context_id), dtype=np.int64),
+        np.frombuffer(sampling.sampler.pks(sampling.GENERIC_CONTEXT), dtype=np.int64),
+    ])
+    return model.recommend(user_id, limit, candidate_rows=model.item_rows(candidate_pks))
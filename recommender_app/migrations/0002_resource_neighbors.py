@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceNeighbors',
+            fields=[
+                ('resource', models.OneToOneField(help_text='Recurso de origen.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='neighbors', serialize=False, to='recommender_app.educationalresource')),
+                ('neighbor_ids', models.JSONField(default=list, help_text='PKs de los recursos vecinos, de mayor a menor similitud.')),
+                ('scores', models.JSONField(default=list, help_text='Similitud coseno de cada vecino (mismo orden que neighbor_ids).')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Vecinos de Recurso',
+                'verbose_name_plural': 'Vecinos de Recursos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['lti_user_id', 'lti_context_id', 'timestamp'], name='recommender_lti_use_9db018_idx'),
+        ),
+    ]
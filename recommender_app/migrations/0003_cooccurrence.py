@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0002_resource_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourcePopularity',
+            fields=[
+                ('resource', models.OneToOneField(help_text='Recurso.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recommender_app.educationalresource')),
+                ('weight', models.FloatField(default=0.0, help_text='Suma de los pesos de las interacciones con el recurso.')),
+                ('interactions', models.PositiveIntegerField(default=0, help_text='Número de interacciones registradas.')),
+            ],
+            options={
+                'verbose_name': 'Popularidad de Recurso',
+                'verbose_name_plural': 'Popularidad de Recursos',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResourceCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=0.0, help_text='Suma de los pesos de las interacciones que forman el par.')),
+                ('other', models.ForeignKey(help_text='Recurso consultado junto al de origen.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recommender_app.educationalresource')),
+                ('resource', models.ForeignKey(help_text='Recurso de origen.', on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrences', to='recommender_app.educationalresource')),
+            ],
+            options={
+                'verbose_name': 'Co-ocurrencia de Recursos',
+                'verbose_name_plural': 'Co-ocurrencias de Recursos',
+                'indexes': [models.Index(fields=['resource', '-weight'], name='recommender_resourc_a8a5a0_idx')],
+                'unique_together': {('resource', 'other')},
+            },
+        ),
+    ]
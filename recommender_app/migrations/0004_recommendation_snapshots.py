@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0003_cooccurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSnapshot',
+            fields=[
+                ('key', models.CharField(help_text="Clave '<contexto>|<usuario>'.", max_length=520, primary_key=True, serialize=False)),
+                ('lti_context_id', models.CharField(help_text='ID del contexto LTI (curso).', max_length=255)),
+                ('lti_user_id', models.CharField(blank=True, default='', help_text='ID del usuario LTI (vacío para la lista del curso).', max_length=255)),
+                ('recommendations', models.JSONField(default=list, help_text='Recomendaciones listas para la plantilla.')),
+                ('built_at', models.DateTimeField(help_text='Momento en que se calculó la lista.')),
+            ],
+            options={
+                'verbose_name': 'Instantánea de Recomendaciones',
+                'verbose_name_plural': 'Instantáneas de Recomendaciones',
+                'indexes': [models.Index(fields=['built_at'], name='recommender_built_a_304cb3_idx')],
+            },
+        ),
+    ]
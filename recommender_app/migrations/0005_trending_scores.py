@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0004_recommendation_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lti_context_id', models.CharField(help_text='ID del contexto LTI (curso).', max_length=255)),
+                ('score', models.FloatField(default=0.0, help_text='Puntuación decaída hasta updated_at.')),
+                ('updated_at', models.DateTimeField(help_text='Instante al que corresponde la puntuación guardada.')),
+                ('resource', models.ForeignKey(help_text='Recurso.', on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='recommender_app.educationalresource')),
+            ],
+            options={
+                'verbose_name': 'Tendencia de Recurso',
+                'verbose_name_plural': 'Tendencias de Recursos',
+                'indexes': [models.Index(fields=['lti_context_id', '-score'], name='recommender_lti_con_6b98c8_idx')],
+                'unique_together': {('lti_context_id', 'resource')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0005_trending_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventLogOffset',
+            fields=[
+                ('segment', models.CharField(help_text='Nombre del segmento sin extensión.', max_length=100, primary_key=True, serialize=False)),
+                ('offset', models.BigIntegerField(default=0, help_text='Bytes ya volcados.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Posición del Registro de Eventos',
+                'verbose_name_plural': 'Posiciones del Registro de Eventos',
+            },
+        ),
+        migrations.AlterField(
+            model_name='userinteraction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Marca de tiempo de la interacción.'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0006_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Día (zona horaria del proyecto).')),
+                ('lti_context_id', models.CharField(help_text='ID del contexto LTI (curso).', max_length=255)),
+                ('interaction_type', models.CharField(help_text='Tipo de interacción.', max_length=50)),
+                ('count', models.PositiveIntegerField(default=0, help_text='Número de interacciones.')),
+                ('value_sum', models.FloatField(default=0.0, help_text='Suma de los valores de las interacciones que tienen valor.')),
+                ('value_count', models.PositiveIntegerField(default=0, help_text='Número de interacciones con valor (para calcular medias).')),
+                ('resource', models.ForeignKey(help_text='Recurso.', on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='recommender_app.educationalresource')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Interacciones',
+                'verbose_name_plural': 'Resúmenes Diarios de Interacciones',
+                'indexes': [models.Index(fields=['lti_context_id', 'day'], name='recommender_lti_con_8ba955_idx')],
+                'unique_together': {('day', 'lti_context_id', 'resource', 'interaction_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0007_interaction_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userinteraction',
+            name='recommender_lti_use_9db018_idx',
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['lti_user_id', 'lti_context_id', '-timestamp', '-id'], name='recommender_lti_use_40e8d5_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lti1p3_tool_config', '0001_initial'),
+        ('recommender_app', '0008_interaction_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetiredToolKey',
+            fields=[
+                ('key', models.OneToOneField(help_text='Clave retirada.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='retirement', serialize=False, to='lti1p3_tool_config.ltitoolkey')),
+                ('retired_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Momento en que dejó de usarse para firmar.')),
+            ],
+            options={
+                'verbose_name': 'Clave de Herramienta Retirada',
+                'verbose_name_plural': 'Claves de Herramienta Retiradas',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+def to_log_scores(apps, schema_editor):
+    """Pasa las puntuaciones decaídas hasta updated_at a la escala logarítmica de trending.py."""
+    from recommender_app.trending import log_amount
+
+    TrendingScore = apps.get_model('recommender_app', 'TrendingScore')
+    TrendingScore.objects.filter(score__lte=0).delete()
+    for row in TrendingScore.objects.only('pk', 'score', 'updated_at').iterator(chunk_size=2000):
+        TrendingScore.objects.filter(pk=row.pk).update(score=log_amount(row.score, row.updated_at))
+
+
+def from_log_scores(apps, schema_editor):
+    from recommender_app.trending import current_score
+
+    TrendingScore = apps.get_model('recommender_app', 'TrendingScore')
+    for row in TrendingScore.objects.only('pk', 'score', 'updated_at').iterator(chunk_size=2000):
+        TrendingScore.objects.filter(pk=row.pk).update(score=current_score(row.score, row.updated_at))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0009_retired_tool_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trendingscore',
+            name='score',
+            field=models.FloatField(default=0.0, help_text='Logaritmo de la puntuación referida a trending.EPOCH.'),
+        ),
+        migrations.AlterField(
+            model_name='trendingscore',
+            name='updated_at',
+            field=models.DateTimeField(help_text='Instante de la última interacción sumada.'),
+        ),
+        migrations.RunPython(to_log_scores, from_log_scores),
+    ]
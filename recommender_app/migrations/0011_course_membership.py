@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0010_trending_log_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lti_context_id', models.CharField(help_text='ID del contexto LTI (curso).', max_length=255)),
+                ('lti_user_id', models.CharField(help_text='ID del usuario LTI.', max_length=255)),
+                ('synced_at', models.DateTimeField(help_text='Última sincronización en la que aparecía en la lista.')),
+            ],
+            options={
+                'verbose_name': 'Miembro de Curso',
+                'verbose_name_plural': 'Miembros de Cursos',
+                'unique_together': {('lti_context_id', 'lti_user_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender_app', '0011_course_membership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseTitle',
+            fields=[
+                ('lti_context_id', models.CharField(help_text='ID del contexto LTI (curso).', max_length=255, primary_key=True, serialize=False)),
+                ('title', models.CharField(help_text='Título del curso en la plataforma.', max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Título de Curso',
+                'verbose_name_plural': 'Títulos de Cursos',
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from pylti1p3.contrib.django.lti1p3_tool_config.models import LtiToolKey
 
 class EducationalResource(models.Model):
     """
@@ -79,7 +81,9 @@ class UserInteraction(models.Model):
     # Campo para almacenar datos adicionales sobre la interacción (ej. tiempo de vista, puntuación)
     value = models.FloatField(blank=True, null=True, help_text="Valor asociado a la interacción (ej. tiempo en segundos, puntuación de un quiz).")
     
-    timestamp = models.DateTimeField(auto_now_add=True, help_text="Marca de tiempo de la interacción.")
+    # Por defecto el instante de creación; las interacciones que llegan por el registro de
+    # eventos (event_log.py) conservan el instante en que se aceptaron.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, help_text="Marca de tiempo de la interacción.")
 
     def __str__(self):
         return f"{self.lti_user_id} - {self.interaction_type} - {self.resource.title}"
@@ -91,4 +95,208 @@ class UserInteraction(models.Model):
         indexes = [
             models.Index(fields=['lti_user_id', 'resource']),
             models.Index(fields=['lti_context_id']),
+            # Historial de un usuario en un curso, del más reciente al más antiguo: semillas del
+            # filtrado colaborativo y paginación por (timestamp, id) de la API de historial.
+            models.Index(fields=['lti_user_id', 'lti_context_id', '-timestamp', '-id']),
         ]
+
+
+class ResourceNeighbors(models.Model):
+    """
+    Vecinos más similares (top-K) de un recurso según el filtrado colaborativo ítem-ítem.
+    Se reconstruye con el comando build_item_similarity.
+    """
+    resource = models.OneToOneField(EducationalResource, on_delete=models.CASCADE, primary_key=True, related_name='neighbors', help_text="Recurso de origen.")
+
+    # Listas paralelas ordenadas por similitud descendente: una sola fila por recurso.
+    neighbor_ids = models.JSONField(default=list, help_text="PKs de los recursos vecinos, de mayor a menor similitud.")
+    scores = models.JSONField(default=list, help_text="Similitud coseno de cada vecino (mismo orden que neighbor_ids).")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Vecinos de {self.resource_id} ({len(self.neighbor_ids)})"
+
+    class Meta:
+        verbose_name = "Vecinos de Recurso"
+        verbose_name_plural = "Vecinos de Recursos"
+
+
+class ResourceCooccurrence(models.Model):
+    """
+    Peso acumulado de co-ocurrencia entre dos recursos consultados por el mismo usuario en un curso.
+    Se actualiza de forma incremental con cada interacción (ver cooccurrence.py).
+    Cada par se guarda en ambas direcciones para poder leer los vecinos de un recurso con un índice.
+    """
+    resource = models.ForeignKey(EducationalResource, on_delete=models.CASCADE, related_name='cooccurrences', help_text="Recurso de origen.")
+    other = models.ForeignKey(EducationalResource, on_delete=models.CASCADE, related_name='+', help_text="Recurso consultado junto al de origen.")
+    weight = models.FloatField(default=0.0, help_text="Suma de los pesos de las interacciones que forman el par.")
+
+    def __str__(self):
+        return f"{self.resource_id} ~ {self.other_id} ({self.weight:.2f})"
+
+    class Meta:
+        verbose_name = "Co-ocurrencia de Recursos"
+        verbose_name_plural = "Co-ocurrencias de Recursos"
+        unique_together = ('resource', 'other')
+        indexes = [
+            models.Index(fields=['resource', '-weight']),
+        ]
+
+
+class ResourcePopularity(models.Model):
+    """
+    Popularidad acumulada de un recurso (suma de pesos de todas sus interacciones).
+    """
+    resource = models.OneToOneField(EducationalResource, on_delete=models.CASCADE, primary_key=True, related_name='popularity', help_text="Recurso.")
+    weight = models.FloatField(default=0.0, help_text="Suma de los pesos de las interacciones con el recurso.")
+    interactions = models.PositiveIntegerField(default=0, help_text="Número de interacciones registradas.")
+
+    def __str__(self):
+        return f"{self.resource_id} ({self.weight:.2f})"
+
+    class Meta:
+        verbose_name = "Popularidad de Recurso"
+        verbose_name_plural = "Popularidad de Recursos"
+
+
+class RecommendationSnapshot(models.Model):
+    """
+    Lista de recomendaciones precalculada por el comando build_recommendations.
+    Hay una fila por (usuario, curso) activo y una por curso (lti_user_id vacío) para los usuarios nuevos.
+    """
+    # Clave "<lti_context_id>|<lti_user_id>" para servir cada lanzamiento con una sola búsqueda por PK.
+    key = models.CharField(max_length=520, primary_key=True, help_text="Clave '<contexto>|<usuario>'.")
+    lti_context_id = models.CharField(max_length=255, help_text="ID del contexto LTI (curso).")
+    lti_user_id = models.CharField(max_length=255, blank=True, default='', help_text="ID del usuario LTI (vacío para la lista del curso).")
+
+    recommendations = models.JSONField(default=list, help_text="Recomendaciones listas para la plantilla.")
+    built_at = models.DateTimeField(help_text="Momento en que se calculó la lista.")
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = "Instantánea de Recomendaciones"
+        verbose_name_plural = "Instantáneas de Recomendaciones"
+        indexes = [
+            models.Index(fields=['built_at']),
+        ]
+
+
+class CourseTitle(models.Model):
+    """
+    Título de cada curso según su último lanzamiento LTI. build_recommendations lo usa para el
+    arranque en frío (recursos parecidos al título), que solo se conoce durante el lanzamiento.
+    """
+    lti_context_id = models.CharField(max_length=255, primary_key=True, help_text="ID del contexto LTI (curso).")
+    title = models.CharField(max_length=255, help_text="Título del curso en la plataforma.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.lti_context_id} - {self.title}"
+
+    class Meta:
+        verbose_name = "Título de Curso"
+        verbose_name_plural = "Títulos de Cursos"
+
+
+class TrendingScore(models.Model):
+    """
+    Puntuación de tendencia de un recurso en un curso: suma de pesos de interacciones con
+    decaimiento exponencial. Se guarda en escala logarítmica referida a un instante fijo
+    (ver trending.py), de modo que ordenar por score es ordenar por la puntuación actual.
+    """
+    lti_context_id = models.CharField(max_length=255, help_text="ID del contexto LTI (curso).")
+    resource = models.ForeignKey(EducationalResource, on_delete=models.CASCADE, related_name='trending_scores', help_text="Recurso.")
+    score = models.FloatField(default=0.0, help_text="Logaritmo de la puntuación referida a trending.EPOCH.")
+    updated_at = models.DateTimeField(help_text="Instante de la última interacción sumada.")
+
+    def __str__(self):
+        return f"{self.lti_context_id} - {self.resource_id} ({self.score:.2f})"
+
+    class Meta:
+        verbose_name = "Tendencia de Recurso"
+        verbose_name_plural = "Tendencias de Recursos"
+        unique_together = ('lti_context_id', 'resource')
+        indexes = [
+            models.Index(fields=['lti_context_id', '-score']),
+        ]
+
+
+class CourseMembership(models.Model):
+    """
+    Estudiante activo de un curso según la última lista de miembros descargada con NRPS
+    (roster.py). Cada sincronización da de alta a los nuevos y de baja a los que ya no están.
+    """
+    lti_context_id = models.CharField(max_length=255, help_text="ID del contexto LTI (curso).")
+    lti_user_id = models.CharField(max_length=255, help_text="ID del usuario LTI.")
+    synced_at = models.DateTimeField(help_text="Última sincronización en la que aparecía en la lista.")
+
+    def __str__(self):
+        return f"{self.lti_context_id} - {self.lti_user_id}"
+
+    class Meta:
+        verbose_name = "Miembro de Curso"
+        verbose_name_plural = "Miembros de Cursos"
+        unique_together = ('lti_context_id', 'lti_user_id')
+
+
+class EventLogOffset(models.Model):
+    """
+    Posición (en bytes) hasta la que el compactor ha volcado un segmento del registro de
+    eventos en UserInteraction. Se actualiza en la misma transacción que el volcado.
+    """
+    segment = models.CharField(max_length=100, primary_key=True, help_text="Nombre del segmento sin extensión.")
+    offset = models.BigIntegerField(default=0, help_text="Bytes ya volcados.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.segment} @ {self.offset}"
+
+    class Meta:
+        verbose_name = "Posición del Registro de Eventos"
+        verbose_name_plural = "Posiciones del Registro de Eventos"
+
+
+class InteractionDailyRollup(models.Model):
+    """
+    Número de interacciones y suma de sus valores por día, curso, recurso y tipo.
+    Se actualiza de forma incremental con cada interacción (ver rollups.py) y se conserva
+    cuando las interacciones en bruto se archivan.
+    """
+    day = models.DateField(help_text="Día (zona horaria del proyecto).")
+    lti_context_id = models.CharField(max_length=255, help_text="ID del contexto LTI (curso).")
+    resource = models.ForeignKey(EducationalResource, on_delete=models.CASCADE, related_name='daily_rollups', help_text="Recurso.")
+    interaction_type = models.CharField(max_length=50, help_text="Tipo de interacción.")
+    count = models.PositiveIntegerField(default=0, help_text="Número de interacciones.")
+    value_sum = models.FloatField(default=0.0, help_text="Suma de los valores de las interacciones que tienen valor.")
+    value_count = models.PositiveIntegerField(default=0, help_text="Número de interacciones con valor (para calcular medias).")
+
+    def __str__(self):
+        return f"{self.day} - {self.lti_context_id} - {self.resource_id} - {self.interaction_type} ({self.count})"
+
+    class Meta:
+        verbose_name = "Resumen Diario de Interacciones"
+        verbose_name_plural = "Resúmenes Diarios de Interacciones"
+        unique_together = ('day', 'lti_context_id', 'resource', 'interaction_type')
+        indexes = [
+            models.Index(fields=['lti_context_id', 'day']),
+        ]
+
+
+class RetiredToolKey(models.Model):
+    """
+    Clave de la herramienta sustituida por rotate_tool_key. Se sigue publicando en el JWKS
+    durante el periodo de solapamiento para que la plataforma pueda verificar lo ya firmado
+    con ella, y después se borra con rotate_tool_key --prune.
+    """
+    key = models.OneToOneField(LtiToolKey, on_delete=models.CASCADE, primary_key=True, related_name='retirement', help_text="Clave retirada.")
+    retired_at = models.DateTimeField(default=timezone.now, help_text="Momento en que dejó de usarse para firmar.")
+
+    def __str__(self):
+        return f"{self.key.name} (retirada {self.retired_at:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        verbose_name = "Clave de Herramienta Retirada"
+        verbose_name_plural = "Claves de Herramienta Retiradas"
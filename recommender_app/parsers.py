@@ -0,0 +1,133 @@
+# lti_recommender_project/recommender_app/parsers.py
+
+"""
+Parsers de DRF para los endpoints de interacciones.
+
+Los eventos llegan desde navegadores dentro de iframes de Moodle, a menudo en redes lentas:
+
+- Cualquier cuerpo puede venir comprimido con "Content-Encoding: gzip". Se descomprime en
+  streaming con un límite (MAX_DECOMPRESSED_BODY_BYTES) contra bombas de compresión.
+- application/msgpack (o application/x-msgpack): MessagePack con códigos cortos de campo
+  (ver SHORT_FIELDS) y tipos de interacción como enteros (INTERACTION_TYPE_CODES). Un lote
+  puede llevar los campos comunes una sola vez: {"u": ..., "c": ..., "e": [{"r": ..., "t": 0}, ...]}.
+- text/plain con JSON dentro: lo que envía navigator.sendBeacon() con una cadena, que no
+  permite elegir Content-Type sin provocar una petición previa CORS.
+
+Tras el parser los datos tienen los nombres de campo de UserInteractionSerializer, así que
+las vistas no distinguen el formato de origen.
+"""
+
+import codecs
+import gzip
+import io
+import json
+import zlib
+
+import msgpack
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .conf import get_setting
+
+# Código corto -> campo de UserInteractionSerializer.
+SHORT_FIELDS = {
+    'u': 'lti_user_id',
+    'c': 'lti_context_id',
+    'r': 'resource_id',
+    't': 'interaction_type',
+    'v': 'value',
+}
+# Tipos de interacción enviados como enteros (la posición en esta tupla).
+INTERACTION_TYPE_CODES = ('viewed', 'clicked', 'downloaded', 'scored', 'completed')
+
+
+def _request_stream(stream, parser_context):
+    """Devuelve el cuerpo (descomprimido si llega con Content-Encoding: gzip) como flujo de bytes."""
+    request = (parser_context or {}).get('request')
+    encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower() if request is not None else ''
+    if encoding in ('', 'identity'):
+        return stream
+    if encoding not in ('gzip', 'x-gzip'):
+        raise ParseError(f"Content-Encoding no admitido: {encoding}")
+
+    limit = get_setting('MAX_DECOMPRESSED_BODY_BYTES')
+    try:
+        with gzip.GzipFile(fileobj=stream) as decompressed:
+            data = decompressed.read(limit + 1)
+    except (OSError, EOFError, zlib.error) as exc:
+        raise ParseError(f"Cuerpo gzip no válido - {exc}")
+    if len(data) > limit:
+        raise ParseError(f"El cuerpo descomprimido supera {limit} bytes.")
+    return io.BytesIO(data)
+
+
+class CompressedJSONParser(JSONParser):
+    """JSONParser que además acepta cuerpos con Content-Encoding: gzip."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return super().parse(_request_stream(stream, parser_context), media_type, parser_context)
+
+
+class BeaconJSONParser(BaseParser):
+    """JSON enviado como text/plain (navigator.sendBeacon con una cadena)."""
+
+    media_type = 'text/plain'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        stream = _request_stream(stream, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return json.load(codecs.getreader(encoding)(stream))
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+def expand_event(event, defaults=None):
+    """Traduce un evento con códigos cortos a los nombres de campo de la API."""
+    if not isinstance(event, dict):
+        return event
+    expanded = dict(defaults or {})
+    for key, value in event.items():
+        expanded[SHORT_FIELDS.get(key, key)] = value
+    interaction_type = expanded.get('interaction_type')
+    # bool es subclase de int: true no es el código 1 (el serializador lo rechaza).
+    if (isinstance(interaction_type, int) and not isinstance(interaction_type, bool)
+            and 0 <= interaction_type < len(INTERACTION_TYPE_CODES)):
+        expanded['interaction_type'] = INTERACTION_TYPE_CODES[interaction_type]
+    return expanded
+
+
+def expand_payload(payload):
+    """
+    Un evento, una lista de eventos o un sobre {"e": [...], ...campos comunes} -> datos de la API.
+    Los sobres se convierten en {"events": [...]} (el formato del endpoint en lote).
+    """
+    if isinstance(payload, list):
+        return [expand_event(event) for event in payload]
+    if isinstance(payload, dict) and 'e' in payload:
+        defaults = expand_event({key: value for key, value in payload.items() if key != 'e'})
+        events = payload['e'] if isinstance(payload['e'], list) else []
+        return {'events': [expand_event(event, defaults) for event in events]}
+    return expand_event(payload)
+
+
+class MessagePackParser(BaseParser):
+    """MessagePack con códigos cortos de campo (ver SHORT_FIELDS)."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        stream = _request_stream(stream, parser_context)
+        try:
+            payload = msgpack.unpackb(stream.read(), raw=False, strict_map_key=True)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+        return expand_payload(payload)
+
+
+class LegacyMessagePackParser(MessagePackParser):
+    media_type = 'application/x-msgpack'
+
+
+INTERACTION_PARSERS = (CompressedJSONParser, MessagePackParser, LegacyMessagePackParser)
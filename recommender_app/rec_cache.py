@@ -0,0 +1,151 @@
+# lti_recommender_project/recommender_app/rec_cache.py
+
+"""
+Caché de recomendaciones por (lti_user_id, lti_context_id, versión de los modelos).
+
+- Las entradas caducan tras RECOMMENDATION_CACHE_TTL segundos.
+- Una interacción nueva del usuario en el curso incrementa su contador de generación,
+  que forma parte de la clave, así que la entrada anterior deja de usarse al instante.
+  El contador caduca (GENERATION_TTL_FACTOR veces RECOMMENDATION_CACHE_TTL desde que se
+  crea; incr no renueva la caducidad) para que no quede una clave por cada par (usuario,
+  curso) que haya interactuado alguna vez. Al recrearlo no vuelve a 1 sino que empieza en
+  el instante actual en milisegundos: una entrada escrita con la generación anterior justo
+  antes de que caducara nunca coincide con la nueva.
+- Cuando falta una entrada, solo un cálculo la rellena: dentro del proceso con un candado
+  por clave y entre procesos con un candado en la caché (cache.add). El resto espera el
+  resultado en lugar de recalcular (protección contra estampidas al inicio de clase).
+
+Los contadores rec_cache.* (hit, miss, eviction.expired, eviction.invalidated, wait,
+wait_timeout) se exponen en /api/metrics/.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+from .conf import get_setting
+from . import content_index, metrics, mf_model
+
+_MISSING = object()
+
+# Vida de los contadores de generación en múltiplos de RECOMMENDATION_CACHE_TTL.
+GENERATION_TTL_FACTOR = 4
+
+
+def _generation_key(user_id, context_id):
+    return f"rec_cache:generation:{user_id}:{context_id}"
+
+
+def model_version():
+    """Versión combinada de los modelos publicados; cambia cuando se publica un modelo nuevo."""
+    return f"{mf_model.model_version() or '-'}.{content_index.index_version() or '-'}"
+
+
+def invalidate(user_id, context_id):
+    """Deja obsoleta la entrada del usuario en el curso (en todos los procesos que comparten caché)."""
+    key = _generation_key(user_id, context_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Mayor que cualquier valor que haya tenido el contador caducado (salvo más de mil
+        # invalidaciones por segundo durante toda su vida).
+        cache.set(key, int(time.time() * 1000), timeout=get_setting('RECOMMENDATION_CACHE_TTL') * GENERATION_TTL_FACTOR)
+    metrics.incr('rec_cache.eviction.invalidated')
+
+
+class _KeyLocks:
+    """Candados por clave dentro del proceso; se liberan cuando nadie los usa."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def acquire(self, key):
+        with self._lock:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        lock.acquire()
+        return lock
+
+    def release(self, key, lock):
+        lock.release()
+        with self._lock:
+            _, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+_key_locks = _KeyLocks()
+
+
+def _read(key):
+    """Devuelve el valor guardado o _MISSING si no existe o ha caducado."""
+    entry = cache.get(key)
+    if entry is None:
+        return _MISSING
+    expires_at, value = entry
+    if expires_at < time.time():
+        metrics.incr('rec_cache.eviction.expired')
+        return _MISSING
+    return value
+
+
+def _write(key, value):
+    ttl = get_setting('RECOMMENDATION_CACHE_TTL')
+    # La caducidad se guarda junto al valor para poder contar las entradas caducadas.
+    cache.set(key, (time.time() + ttl, value), timeout=ttl * 2)
+
+
+def get_or_compute(user_id, context_id, compute, variant=''):
+    """
+    Devuelve las recomendaciones cacheadas o las calcula con `compute()` una sola vez.
+    `variant` separa otras formas de la lista del mismo usuario (p. ej. la clasificación
+    completa de la API); se invalidan igual que la lista del lanzamiento.
+    """
+    generation = cache.get(_generation_key(user_id, context_id), 0)
+    key = f"rec_cache:{model_version()}:{generation}:{user_id}:{context_id}"
+    if variant:
+        key = f"{key}:{variant}"
+
+    value = _read(key)
+    if value is not _MISSING:
+        metrics.incr('rec_cache.hit')
+        return value
+    metrics.incr('rec_cache.miss')
+
+    lock = _key_locks.acquire(key)
+    try:
+        # Otro hilo del proceso puede haberla calculado mientras esperábamos.
+        value = _read(key)
+        if value is not _MISSING:
+            metrics.incr('rec_cache.wait')
+            return value
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, timeout=get_setting('RECOMMENDATION_CACHE_LOCK_TIMEOUT')):
+            try:
+                value = compute()
+                _write(key, value)
+                return value
+            finally:
+                cache.delete(lock_key)
+
+        # Otro proceso la está calculando: espera su resultado un tiempo acotado.
+        deadline = time.monotonic() + get_setting('RECOMMENDATION_CACHE_WAIT')
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = _read(key)
+            if value is not _MISSING:
+                metrics.incr('rec_cache.wait')
+                return value
+        metrics.incr('rec_cache.wait_timeout')
+        value = compute()
+        _write(key, value)
+        return value
+    finally:
+        _key_locks.release(key, lock)
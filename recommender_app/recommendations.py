@@ -0,0 +1,201 @@
+# lti_recommender_project/recommender_app/recommendations.py
+
+"""
+Cálculo de recomendaciones: combina los motores disponibles y carga los recursos elegidos.
+Lo usan tanto el lanzamiento LTI (en vivo) como el comando build_recommendations.
+"""
+
+import logging
+
+from django.db.models import Q
+
+from .conf import get_setting
+from .models import EducationalResource
+from . import ann_index, content_index, cooccurrence, item_similarity, mf_model, sampling, trending
+
+logger = logging.getLogger(__name__)
+
+# Campos que se pueden pedir de cada recomendación (nombre en la API -> campo del modelo).
+RESOURCE_FIELDS = {
+    'resource_id': 'resource_id',
+    'title': 'title',
+    'url': 'url',
+    'description': 'description',
+    'type': 'resource_type',
+    'author': 'author',
+    'tags': 'tags',
+    'difficulty_level': 'difficulty_level',
+}
+# Campos que muestra el lanzamiento LTI.
+DEFAULT_FIELDS = ('title', 'url', 'description', 'type')
+
+# Motores personalizados: cada uno devuelve PKs ordenadas para (user_id, context_id, limit).
+PERSONALIZED_ENGINES = (
+    mf_model.recommend_for_user,
+    item_similarity.recommend_for_user,
+    cooccurrence.recommend_for_user,
+)
+
+
+def compute_recommendations(user_id, context_id, course_title=None):
+    """
+    Calcula las recomendaciones sin pasar por la caché (ver recommended_rows).
+    Devuelve una lista vacía si no hay ningún recurso que recomendar.
+    """
+    return [_resource_to_dict(resource) for resource in recommended_rows(user_id, context_id, course_title)]
+
+
+def recommended_rows(user_id, context_id, course_title=None, count=None):
+    """
+    Filas de values() (con 'pk') de los `count` recursos recomendados (RECOMMENDATION_COUNT por defecto).
+    Primero combina los motores personalizados (factorización, ítem-ítem y co-ocurrencias);
+    si no hay historial usa las tendencias del curso; en un curso nuevo busca recursos parecidos
+    al título del curso en el índice TF-IDF y, como último recurso, elige recursos del curso al azar.
+    """
+    count = count or get_setting('RECOMMENDATION_COUNT')
+
+    # Recomendaciones personalizadas: se combinan las listas de los motores (modelo de
+    # factorización, vecinos precalculados y co-ocurrencias en vivo).
+    # Se piden candidatos de más porque algunos pueden pertenecer a otro curso.
+    rankings = [engine(user_id, context_id, limit=count * 4) for engine in PERSONALIZED_ENGINES]
+    personalized = _resources_in_order(_fuse_rankings(rankings), context_id)[:count]
+    if personalized:
+        return personalized
+
+    # Usuario nuevo en un curso con actividad: lo que está en tendencia en el curso.
+    trending_pks = trending.top_for_context(context_id, limit=count)
+    popular = _resources_in_order(trending_pks, context_id)
+    if popular:
+        return popular
+
+    # Arranque en frío: recursos cuyo contenido se parece al título del curso.
+    if course_title and course_title != "N/A":
+        similar_pks = content_index.recommend_for_text(course_title, limit=count * 4)
+        similar = _resources_in_order(similar_pks, context_id)[:count]
+        if similar:
+            return similar
+
+    # Muestra aleatoria de los recursos del curso actual (PKs en memoria + una consulta pk__in).
+    # Asegúrate de que los recursos que agregaste en el admin tengan el mismo lti_context_id
+    # que el curso de Moodle desde el que estás lanzando (ej. "2" para "base de datos I").
+    resources_from_db = sampling.sampler.sample_resources(context_id, count, fields=_model_fields(DEFAULT_FIELDS))
+
+    if not resources_from_db:
+        logger.info(f"No se encontraron recursos para el contexto LTI: {context_id}. Intentando buscar recursos genéricos.")
+        # Si no hay recursos específicos del curso, busca algunos recursos sin contexto LTI asignado
+        resources_from_db = sampling.sampler.sample_resources(
+            sampling.GENERIC_CONTEXT, count, fields=_model_fields(DEFAULT_FIELDS)
+        )
+        if not resources_from_db:
+            # Lista vacía: la plantilla (o el JS del lanzamiento diferido) muestra el aviso.
+            logger.info("No se encontraron recursos genéricos.")
+            return []
+
+    return resources_from_db
+
+
+def _fuse_rankings(rankings, k=60):
+    """
+    Combina varias listas ordenadas con Reciprocal Rank Fusion: cada aparición suma 1 / (k + posición).
+    Un recurso que varios motores ponen arriba gana; una lista vacía no aporta nada.
+    """
+    scores = {}
+    for ranking in rankings:
+        for position, resource_pk in enumerate(ranking):
+            scores[resource_pk] = scores.get(resource_pk, 0.0) + 1.0 / (k + position)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def ranked_resource_pks(user_id, context_id, limit):
+    """
+    PKs recomendadas en orden, hasta `limit`: primero las de los motores personalizados
+    combinadas y después las tendencias del curso. Solo recursos del curso o genéricos.
+    Es la lista que recorre la API paginada; más allá de ella se sigue por el catálogo.
+    """
+    rankings = [engine(user_id, context_id, limit=limit) for engine in PERSONALIZED_ENGINES]
+    candidates = _fuse_rankings(rankings)
+    seen = set(candidates)
+    candidates += [pk for pk in trending.top_for_context(context_id, limit=limit) if pk not in seen]
+    if not candidates:
+        return []
+    allowed = set(
+        EducationalResource.objects.filter(pk__in=candidates).filter(
+            Q(lti_context_id=context_id) | Q(lti_context_id__isnull=True)
+        ).values_list('pk', flat=True)
+    )
+    return [pk for pk in candidates if pk in allowed][:limit]
+
+
+def catalog_after(context_id, last_pk, count, exclude=(), fields=DEFAULT_FIELDS):
+    """
+    Recursos del curso con PK mayor que `last_pk`, en orden de PK (paginación por clave,
+    sin OFFSET). Devuelve filas de values() con 'pk' y los campos pedidos.
+    """
+    resources = EducationalResource.objects.filter(lti_context_id=context_id)
+    if last_pk is not None:
+        resources = resources.filter(pk__gt=last_pk)
+    if exclude:
+        resources = resources.exclude(pk__in=exclude)
+    return list(resources.order_by('pk').values('pk', *_model_fields(fields))[:count])
+
+
+def recommendation_page(ranked_pks, context_id, position, last_pk, page_size, fields=DEFAULT_FIELDS):
+    """
+    Una página de la lista de la API. Primero se recorre `ranked_pks` desde `position`; cuando
+    se agota, el catálogo del curso por PK a partir de `last_pk` (sin repetir las ya clasificadas).
+    Devuelve (elementos, posición siguiente, última PK) o, en la última página, (elementos, None, None).
+    """
+    items = []
+    if position < len(ranked_pks):
+        page_pks = ranked_pks[position:position + page_size]
+        position += len(page_pks)
+        items = [_resource_to_dict(row, fields) for row in _resources_in_order(page_pks, context_id, fields)]
+    missing = page_size - len(items)
+    if missing > 0:
+        # Se pide una fila de más para saber si hay otra página.
+        rows = catalog_after(context_id, last_pk, missing + 1, exclude=ranked_pks, fields=fields)
+        more = len(rows) > missing
+        rows = rows[:missing]
+        items += [_resource_to_dict(row, fields) for row in rows]
+        if rows:
+            last_pk = rows[-1]['pk']
+        if not more:
+            return items, None, None
+    return items, position, last_pk
+
+
+def similar_resources(resource_pk, context_id, limit, fields=DEFAULT_FIELDS):
+    """
+    "Más como este": los recursos del curso (o genéricos) más parecidos a uno dado según el
+    índice ANN. Vacío si el índice no está construido o el recurso no está indexado.
+    """
+    # Se piden candidatos de más porque algunos pueden pertenecer a otro curso.
+    similar_pks = ann_index.similar_resources(resource_pk, limit * 4)
+    return [_resource_to_dict(row, fields) for row in _resources_in_order(similar_pks, context_id, fields)[:limit]]
+
+
+def _model_fields(fields):
+    return [RESOURCE_FIELDS[name] for name in fields]
+
+
+def _resources_in_order(resource_pks, context_id, fields=DEFAULT_FIELDS):
+    """
+    Carga los recursos indicados conservando el orden de `resource_pks`.
+    Solo devuelve los del curso actual o los genéricos (sin contexto LTI).
+    Se leen con values(): filas con 'pk' y los campos pedidos, sin instanciar modelos.
+    """
+    if not resource_pks:
+        return []
+    rows = EducationalResource.objects.filter(pk__in=resource_pks).values(
+        'pk', 'lti_context_id', *_model_fields(fields)
+    )
+    resources = {row['pk']: row for row in rows}
+    return [
+        resources[pk] for pk in resource_pks
+        if pk in resources and resources[pk]['lti_context_id'] in (context_id, None)
+    ]
+
+
+def _resource_to_dict(resource, fields=DEFAULT_FIELDS):
+    """Convierte una fila de values() en el diccionario que se muestra o se devuelve en la API."""
+    return {name: resource[RESOURCE_FIELDS[name]] for name in fields}
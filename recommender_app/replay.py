@@ -0,0 +1,321 @@
+# lti_recommender_project/recommender_app/replay.py
+
+"""
+Banco de pruebas fuera de línea para comparar motores de recomendación.
+
+Se reproducen las interacciones en orden de timestamp contra un motor con la interfaz
+ReplayEngine: antes de cada interacción se le piden k recomendaciones para ese usuario y
+curso (midiendo la latencia) y se anota si el recurso que el usuario consultó de verdad
+estaba entre ellas; después se le entrega el evento con observe(). Al final se informa
+hit-rate@k, cobertura del catálogo, latencias p50/p95/p99 y el pico de memoria.
+
+Los eventos pueden venir de UserInteraction o de un generador sintético, de modo que el
+banco funciona en una máquina sin datos de producción.
+
+Además de los motores en memoria hay adaptadores de los motores desplegados, que leen las
+tablas ya construidas (ResourceNeighbors, ResourceCooccurrence, el modelo de factorización)
+sin escribir en ellas. Necesitan PKs reales de EducationalResource y, como esas tablas se
+construyeron con todas las interacciones, su hit-rate no es comparable con el de los motores
+en memoria (el modelo de factorización y la cadena desplegada, por ejemplo, descartan lo que
+el usuario ya vio, futuro incluido); sirven sobre todo para comparar latencias y cobertura.
+"""
+
+import heapq
+import math
+import random
+import time
+import tracemalloc
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils.module_loading import import_string
+
+from .conf import get_setting
+from .item_similarity import interaction_weight
+from .models import EducationalResource, UserInteraction
+from .recommendations import recommended_rows
+from . import cooccurrence, item_similarity, mf_model
+
+ReplayEvent = namedtuple('ReplayEvent', 'user_id context_id resource_pk interaction_type value timestamp')
+
+
+class ReplayEngine:
+    """
+    Interfaz de los motores del banco de pruebas.
+    `catalog` es un diccionario lti_context_id -> lista de PKs de recursos recomendables.
+    """
+
+    name = 'base'
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def observe(self, event):
+        """Recibe una interacción ya ocurrida."""
+
+    def recommend(self, user_id, context_id, k):
+        """Devuelve hasta k PKs de recursos ordenadas por relevancia."""
+        raise NotImplementedError
+
+
+class RandomEngine(ReplayEngine):
+    """El comportamiento original: k recursos al azar del curso."""
+
+    name = 'random'
+
+    def __init__(self, catalog, seed=0):
+        super().__init__(catalog)
+        self._random = random.Random(seed)
+
+    def recommend(self, user_id, context_id, k):
+        pool = self.catalog.get(context_id) or self.catalog.get(None) or []
+        return self._random.sample(pool, min(k, len(pool)))
+
+
+class PopularityEngine(ReplayEngine):
+    """Lo más popular del curso con decaimiento exponencial (como trending.py)."""
+
+    name = 'popularity'
+
+    def __init__(self, catalog, half_life_hours=24):
+        super().__init__(catalog)
+        self._rate = math.log(2) / (half_life_hours * 3600.0)
+        self._scores = defaultdict(dict)  # contexto -> recurso -> (puntuación, instante)
+        self._now = None
+
+    def observe(self, event):
+        self._now = event.timestamp
+        scores = self._scores[event.context_id]
+        score, updated_at = scores.get(event.resource_pk, (0.0, event.timestamp))
+        elapsed = (event.timestamp - updated_at).total_seconds()
+        scores[event.resource_pk] = (
+            score * math.exp(-self._rate * elapsed) + interaction_weight(event.interaction_type, event.value),
+            event.timestamp,
+        )
+
+    def recommend(self, user_id, context_id, k):
+        scores = self._scores.get(context_id)
+        if not scores:
+            return []
+        now = self._now
+        return heapq.nlargest(
+            k, scores, key=lambda pk: scores[pk][0] * math.exp(-self._rate * (now - scores[pk][1]).total_seconds())
+        )
+
+
+class CooccurrenceEngine(ReplayEngine):
+    """Versión en memoria de cooccurrence.py: ventana de recientes por usuario y pesos por par."""
+
+    name = 'cooccurrence'
+
+    def __init__(self, catalog, window=20):
+        super().__init__(catalog)
+        self.window = window
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+        self._pairs = defaultdict(lambda: defaultdict(float))
+        self._popularity = defaultdict(float)
+
+    def observe(self, event):
+        amount = interaction_weight(event.interaction_type, event.value)
+        recent = self._recent[(event.user_id, event.context_id)]
+        for other in set(recent):
+            if other != event.resource_pk:
+                self._pairs[event.resource_pk][other] += amount
+                self._pairs[other][event.resource_pk] += amount
+        self._popularity[event.resource_pk] += amount
+        if event.resource_pk in recent:
+            recent.remove(event.resource_pk)
+        recent.appendleft(event.resource_pk)
+
+    def recommend(self, user_id, context_id, k):
+        seeds = self._recent.get((user_id, context_id))
+        if not seeds:
+            return []
+        scores = defaultdict(float)
+        for seed in seeds:
+            for other, weight in self._pairs.get(seed, {}).items():
+                if other not in seeds:
+                    scores[other] += weight
+        return heapq.nlargest(k, scores, key=lambda pk: scores[pk] / math.sqrt(max(self._popularity[pk], 1.0)))
+
+
+class ItemSimilarityEngine(ReplayEngine):
+    """item_similarity.py sobre ResourceNeighbors; el historial de cada usuario se lleva en memoria."""
+
+    name = 'item_similarity'
+
+    def __init__(self, catalog):
+        super().__init__(catalog)
+        history_size = get_setting('USER_HISTORY_SIZE')
+        self._history = defaultdict(lambda: deque(maxlen=history_size))
+
+    def observe(self, event):
+        weight = interaction_weight(event.interaction_type, event.value)
+        self._history[(event.user_id, event.context_id)].appendleft((event.resource_pk, weight))
+
+    def recommend(self, user_id, context_id, k):
+        seeds = {}
+        for resource_pk, weight in self._history.get((user_id, context_id), ()):
+            seeds[resource_pk] = seeds.get(resource_pk, 0.0) + weight
+        return item_similarity.recommend_for_seeds(seeds, k)
+
+
+class DatabaseCooccurrenceEngine(ReplayEngine):
+    """
+    cooccurrence.py sobre ResourceCooccurrence y ResourcePopularity; la ventana de recientes
+    se lleva en memoria en lugar de en la caché.
+    """
+
+    name = 'cooccurrence_db'
+
+    def __init__(self, catalog):
+        super().__init__(catalog)
+        self._recent = {}
+
+    def observe(self, event):
+        key = (event.user_id, event.context_id)
+        self._recent[key] = cooccurrence._push(self._recent.get(key, []), event.resource_pk)
+
+    def recommend(self, user_id, context_id, k):
+        return cooccurrence.recommend_for_seeds(self._recent.get((user_id, context_id), []), k)
+
+
+class MatrixFactorizationEngine(ReplayEngine):
+    """El modelo de factorización publicado (mf_model.py); no aprende durante la reproducción."""
+
+    name = 'mf_model'
+
+    def recommend(self, user_id, context_id, k):
+        return mf_model.recommend_for_user(user_id, context_id, k)
+
+
+class DeployedEngine(ReplayEngine):
+    """
+    La cadena completa del lanzamiento (recommendations.recommended_rows) sin la caché.
+    Lee el historial de UserInteraction, así que solo tiene sentido con database_events.
+    """
+
+    name = 'deployed'
+
+    def recommend(self, user_id, context_id, k):
+        return [row['pk'] for row in recommended_rows(user_id, context_id, count=k)]
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (
+        RandomEngine, PopularityEngine, CooccurrenceEngine,
+        ItemSimilarityEngine, DatabaseCooccurrenceEngine, MatrixFactorizationEngine, DeployedEngine,
+    )
+}
+
+
+def get_engine_class(name):
+    """Motor por nombre corto o por ruta con puntos (p. ej. 'mi_paquete.motores.MiMotor')."""
+    if name in ENGINES:
+        return ENGINES[name]
+    return import_string(name)
+
+
+def _percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percentile / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay(events, engine, k, measure_memory=True):
+    """
+    Reproduce `events` (ya ordenados por timestamp) contra `engine` y devuelve un diccionario
+    con las métricas. La memoria se mide con tracemalloc durante toda la reproducción; como
+    tracemalloc encarece cada asignación, para latencias limpias usar measure_memory=False.
+    """
+    catalog_size = len({pk for pks in engine.catalog.values() for pk in pks})
+    latencies, recommended, hits, total = [], set(), 0, 0
+    peak = None
+
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        for event in events:
+            start = time.perf_counter()
+            recommendations = engine.recommend(event.user_id, event.context_id, k)
+            latencies.append(time.perf_counter() - start)
+            total += 1
+            if event.resource_pk in recommendations:
+                hits += 1
+            recommended.update(recommendations)
+            engine.observe(event)
+        if measure_memory:
+            _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'engine': engine.name,
+        'events': total,
+        'hit_rate': hits / total if total else 0.0,
+        'coverage': len(recommended) / catalog_size if catalog_size else 0.0,
+        'p50_ms': _percentile(latencies, 50) * 1000.0,
+        'p95_ms': _percentile(latencies, 95) * 1000.0,
+        'p99_ms': _percentile(latencies, 99) * 1000.0,
+        'peak_memory_mb': peak / (1024.0 * 1024.0) if peak is not None else None,
+    }
+
+
+def database_events(limit=None, chunk_size=5000):
+    """Interacciones reales en orden de timestamp."""
+    interactions = UserInteraction.objects.order_by('timestamp', 'pk').values_list(
+        'lti_user_id', 'lti_context_id', 'resource_id', 'interaction_type', 'value', 'timestamp'
+    )
+    if limit:
+        interactions = interactions[:limit]
+    for row in interactions.iterator(chunk_size=chunk_size):
+        yield ReplayEvent(*row)
+
+
+def database_catalog():
+    catalog = defaultdict(list)
+    for pk, context_id in EducationalResource.objects.values_list('pk', 'lti_context_id').iterator(chunk_size=10000):
+        catalog[context_id].append(pk)
+    return dict(catalog)
+
+
+def synthetic_dataset(n_events=50000, n_users=2000, n_contexts=20, resources_per_context=200, n_topics=10, seed=0):
+    """
+    Genera (catálogo, eventos) sintéticos con algo de estructura: cada recurso pertenece a un
+    tema, cada estudiante prefiere un par de temas y dentro de cada tema la popularidad sigue
+    una ley de Zipf. Los eventos salen ordenados por timestamp.
+    """
+    rng = random.Random(seed)
+    catalog, topics = {}, {}
+    next_pk = 1
+    for context_number in range(n_contexts):
+        context_id = f'course-{context_number}'
+        pks = list(range(next_pk, next_pk + resources_per_context))
+        next_pk += resources_per_context
+        catalog[context_id] = pks
+        by_topic = defaultdict(list)
+        for pk in pks:
+            by_topic[rng.randrange(n_topics)].append(pk)
+        topics[context_id] = by_topic
+
+    users = []
+    for user_number in range(n_users):
+        context_id = f'course-{rng.randrange(n_contexts)}'
+        favourite_topics = rng.sample(sorted(topics[context_id]), min(2, len(topics[context_id])))
+        users.append((f'student-{user_number}', context_id, favourite_topics))
+
+    interaction_types = ['viewed'] * 6 + ['downloaded'] * 2 + ['completed']
+    timestamp = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    events = []
+    for _ in range(n_events):
+        user_id, context_id, favourite_topics = rng.choice(users)
+        topic = rng.choice(favourite_topics) if rng.random() < 0.8 else rng.choice(sorted(topics[context_id]))
+        candidates = topics[context_id][topic]
+        rank = min(int(rng.paretovariate(1.2)) - 1, len(candidates) - 1)
+        timestamp += timedelta(seconds=rng.randint(1, 120))
+        events.append(ReplayEvent(user_id, context_id, candidates[rank], rng.choice(interaction_types), None, timestamp))
+    return catalog, events
@@ -0,0 +1,165 @@
+# lti_recommender_project/recommender_app/resource_lookup.py
+
+"""
+Caché de (resource_id, lti_context_id) -> PK de EducationalResource.
+
+Cada interacción que llega por la API trae el resource_id externo y hay que traducirlo a la
+PK del recurso. La respuesta casi nunca cambia, así que se guarda en dos niveles:
+
+- L1: un LRU acotado en memoria de cada proceso (RESOURCE_LOOKUP_L1_SIZE entradas) con una
+  vida corta (RESOURCE_LOOKUP_L1_TTL) para acotar lo que tarda en verse un cambio hecho
+  desde otro proceso.
+- L2: la caché de Django, compartida entre procesos.
+
+Las respuestas "no existe" también se guardan, durante RESOURCE_LOOKUP_NEGATIVE_TTL
+segundos, para que un cliente con IDs inválidos no martillee la base de datos. Guardar o
+borrar un recurso invalida su par (y el par anterior si cambió) en este proceso y en L2
+(ver signals.py); los demás procesos lo siguen viendo en su L1 hasta que caduca, y si una
+inserción falla por ello ingest.py lo olvida con forget().
+
+Los contadores resource_lookup.* (l1_hit, l2_hit, miss, negative) y la tasa de aciertos se
+exponen en /api/metrics/.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .conf import get_setting
+from .models import EducationalResource
+from . import metrics
+
+# Valor guardado para "el recurso no existe" (las PK empiezan en 1).
+NOT_FOUND = 0
+
+_l1 = OrderedDict()
+_l1_lock = threading.Lock()
+
+
+def _cache_key(resource_id, context_id):
+    digest = hashlib.sha1(f"{context_id}\x00{resource_id}".encode('utf-8')).hexdigest()
+    return f"resource_lookup:{digest}"
+
+
+def _l1_get(pair, now):
+    with _l1_lock:
+        entry = _l1.get(pair)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < now:
+            del _l1[pair]
+            return None
+        _l1.move_to_end(pair)
+        return value
+
+
+def _l1_set(pair, value, now):
+    ttl = get_setting('RESOURCE_LOOKUP_L1_TTL')
+    if value == NOT_FOUND:
+        ttl = min(ttl, get_setting('RESOURCE_LOOKUP_NEGATIVE_TTL'))
+    max_size = get_setting('RESOURCE_LOOKUP_L1_SIZE')
+    with _l1_lock:
+        _l1[pair] = (now + ttl, value)
+        _l1.move_to_end(pair)
+        while len(_l1) > max_size:
+            _l1.popitem(last=False)
+
+
+def _count(value, level):
+    metrics.incr('resource_lookup.negative' if value == NOT_FOUND else f'resource_lookup.{level}_hit')
+
+
+def lookup_many(pairs):
+    """
+    Devuelve {(resource_id, lti_context_id): PK} para los pares que existen.
+    Los que no están en L1 se buscan en L2 con un get_many y el resto con una sola consulta.
+    """
+    now = time.monotonic()
+    found = {}
+    missing = []
+    for pair in set(pairs):
+        value = _l1_get(pair, now)
+        if value is None:
+            missing.append(pair)
+            continue
+        _count(value, 'l1')
+        if value != NOT_FOUND:
+            found[pair] = value
+
+    if missing:
+        keys = {_cache_key(*pair): pair for pair in missing}
+        cached = cache.get_many(list(keys))
+        for key, value in cached.items():
+            pair = keys[key]
+            _count(value, 'l2')
+            _l1_set(pair, value, now)
+            if value != NOT_FOUND:
+                found[pair] = value
+        missing = [pair for key, pair in keys.items() if key not in cached]
+
+    if missing:
+        metrics.incr('resource_lookup.miss', len(missing))
+        rows = EducationalResource.objects.filter(
+            resource_id__in={resource_id for resource_id, _ in missing},
+            lti_context_id__in={context_id for _, context_id in missing},
+        ).values_list('pk', 'resource_id', 'lti_context_id')
+        resolved = {(resource_id, context_id): pk for pk, resource_id, context_id in rows}
+        positive, negative = {}, {}
+        for pair in missing:
+            value = resolved.get(pair, NOT_FOUND)
+            _l1_set(pair, value, now)
+            (positive if value != NOT_FOUND else negative)[_cache_key(*pair)] = value
+            if value != NOT_FOUND:
+                found[pair] = value
+        if positive:
+            cache.set_many(positive, get_setting('RESOURCE_LOOKUP_TTL'))
+        if negative:
+            cache.set_many(negative, get_setting('RESOURCE_LOOKUP_NEGATIVE_TTL'))
+    return found
+
+
+def lookup(resource_id, context_id):
+    """PK del recurso o None si no existe."""
+    return lookup_many([(resource_id, context_id)]).get((resource_id, context_id))
+
+
+def invalidate(resource_id, context_id):
+    """Olvida un par en este proceso y en la caché compartida."""
+    with _l1_lock:
+        _l1.pop((resource_id, context_id), None)
+    cache.delete(_cache_key(resource_id, context_id))
+
+
+def forget(resource_pks):
+    """
+    Olvida los pares que apuntan a estas PK (recursos borrados que L1 aún daba por existentes
+    porque el borrado se hizo en otro proceso).
+    """
+    with _l1_lock:
+        pairs = [pair for pair, (_, value) in _l1.items() if value in resource_pks]
+        for pair in pairs:
+            del _l1[pair]
+    if pairs:
+        cache.delete_many([_cache_key(*pair) for pair in pairs])
+
+
+def clear():
+    with _l1_lock:
+        _l1.clear()
+
+
+def stats():
+    """Tasa de aciertos (L1 + L2 + negativos) y tamaño de L1 de este proceso."""
+    counters = metrics.snapshot('resource_lookup.')
+    hits = sum(counters.get(f'resource_lookup.{name}', 0) for name in ('l1_hit', 'l2_hit', 'negative'))
+    total = hits + counters.get('resource_lookup.miss', 0)
+    with _l1_lock:
+        size = len(_l1)
+    return {
+        'resource_lookup.hit_rate': hits / total if total else 0.0,
+        'resource_lookup.l1_size': size,
+    }
@@ -0,0 +1,151 @@
+# lti_recommender_project/recommender_app/rollups.py
+
+"""
+Resúmenes diarios de UserInteraction: número de interacciones y suma de valores por
+(día, curso, recurso, tipo) en InteractionDailyRollup.
+
+Las consultas analíticas (qué recursos se usan en un curso, cuánto, con qué puntuación
+media) leen estos resúmenes en lugar de agrupar la tabla en bruto, que además se puede
+archivar (ver archive.py) sin perder los totales.
+
+Se mantienen de forma incremental con la señal interactions_recorded: un lote se combina en
+memoria y cada fila afectada se lee y se escribe una sola vez. Los resúmenes se pueden
+reconstruir desde las interacciones que siguen en la base de datos con el comando
+build_rollups.
+"""
+
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import InteractionDailyRollup, UserInteraction
+
+
+def _day(timestamp):
+    return timezone.localdate(timestamp or timezone.now())
+
+
+def _deltas(interactions):
+    """(día, curso, recurso, tipo) -> [interacciones, suma de valores, interacciones con valor]."""
+    deltas = {}
+    for interaction in interactions:
+        key = (_day(interaction.timestamp), interaction.lti_context_id, interaction.resource_id, interaction.interaction_type)
+        delta = deltas.setdefault(key, [0, 0.0, 0])
+        delta[0] += 1
+        if interaction.value is not None:
+            delta[1] += interaction.value
+            delta[2] += 1
+    return deltas
+
+
+def _add(pk, count, value_sum, value_count):
+    InteractionDailyRollup.objects.filter(pk=pk).update(
+        count=F('count') + count,
+        value_sum=F('value_sum') + value_sum,
+        value_count=F('value_count') + value_count,
+    )
+
+
+def _existing(keys):
+    rows = InteractionDailyRollup.objects.filter(
+        day__in={key[0] for key in keys},
+        lti_context_id__in={key[1] for key in keys},
+        resource_id__in={key[2] for key in keys},
+        interaction_type__in={key[3] for key in keys},
+    ).values_list('pk', 'day', 'lti_context_id', 'resource_id', 'interaction_type')
+    return {(day, context_id, resource_pk, interaction_type): pk for pk, day, context_id, resource_pk, interaction_type in rows}
+
+
+def record_interactions(interactions):
+    """Suma un lote de interacciones a los resúmenes de sus días."""
+    deltas = _deltas(interactions)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = _existing(deltas)
+        for key, pk in existing.items():
+            if key in deltas:
+                _add(pk, *deltas[key])
+        new = {key: delta for key, delta in deltas.items() if key not in existing}
+        if not new:
+            return
+        try:
+            with transaction.atomic():
+                InteractionDailyRollup.objects.bulk_create([
+                    InteractionDailyRollup(
+                        day=day, lti_context_id=context_id, resource_id=resource_pk, interaction_type=interaction_type,
+                        count=count, value_sum=value_sum, value_count=value_count,
+                    )
+                    for (day, context_id, resource_pk, interaction_type), (count, value_sum, value_count) in new.items()
+                ])
+        except IntegrityError:
+            # Otro proceso ha creado alguna de las filas entre la lectura y la inserción:
+            # se suman fila a fila para no perder ninguna interacción.
+            for key, delta in new.items():
+                pk = _existing([key]).get(key)
+                if pk is not None:
+                    _add(pk, *delta)
+                else:
+                    day, context_id, resource_pk, interaction_type = key
+                    InteractionDailyRollup.objects.create(
+                        day=day, lti_context_id=context_id, resource_id=resource_pk, interaction_type=interaction_type,
+                        count=delta[0], value_sum=delta[1], value_count=delta[2],
+                    )
+
+
+def rebuild(since=None):
+    """
+    Recalcula los resúmenes desde `since` (fecha; por defecto el día de la interacción más
+    antigua que sigue en la base de datos) con un GROUP BY sobre UserInteraction. Los días
+    anteriores, cuyas interacciones pueden estar archivadas, no se tocan. Devuelve las filas creadas.
+    """
+    if since is None:
+        oldest = UserInteraction.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return 0
+        since = _day(oldest)
+
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    rows = (
+        UserInteraction.objects.filter(timestamp__gte=start)
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'lti_context_id', 'resource_id', 'interaction_type')
+        .annotate(count=Count('pk'), value_sum=Sum('value'), value_count=Count('value'))
+        .order_by()
+    )
+    with transaction.atomic():
+        InteractionDailyRollup.objects.filter(day__gte=since).delete()
+        created = InteractionDailyRollup.objects.bulk_create(
+            [
+                InteractionDailyRollup(
+                    day=row['day'], lti_context_id=row['lti_context_id'], resource_id=row['resource_id'],
+                    interaction_type=row['interaction_type'], count=row['count'],
+                    value_sum=row['value_sum'] or 0.0, value_count=row['value_count'],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def context_summary(context_id, start=None, end=None):
+    """
+    Totales por recurso y tipo de interacción de un curso entre dos fechas (incluidas),
+    con el índice (lti_context_id, day). Devuelve filas con resource_id, interaction_type,
+    count, value_sum y value_count.
+    """
+    rows = InteractionDailyRollup.objects.filter(lti_context_id=context_id)
+    if start is not None:
+        rows = rows.filter(day__gte=start)
+    if end is not None:
+        rows = rows.filter(day__lte=end)
+    return list(
+        rows.values('resource_id', 'interaction_type')
+        .annotate(count=Sum('count'), value_sum=Sum('value_sum'), value_count=Sum('value_count'))
+        .order_by('-count')
+    )
@@ -0,0 +1,189 @@
+# lti_recommender_project/recommender_app/roster.py
+
+"""
+Precarga de recomendaciones de todo un curso a partir de su lista de miembros (NRPS).
+
+Cuando un profesor lanza la herramienta se encola un trabajo en segundo plano que descarga
+la lista de miembros del curso con el servicio Names and Roles Provisioning (NRPS) y calcula
+y guarda en la caché de recomendaciones (rec_cache.py) las de cada estudiante activo. Así los
+primeros lanzamientos de una clase no pagan todos a la vez el coste de una caché fría.
+
+- Las páginas se recorren siguiendo la cabecera Link rel="next". Se interpreta aquí y no con
+  el next_page_url de PyLTI1p3, que pasa la URL a minúsculas.
+- Todas las páginas usan el mismo ServiceConnector, que guarda el token de acceso por scope:
+  se pide un solo token por trabajo.
+- Un curso se precarga como mucho una vez cada ROSTER_PREFETCH_INTERVAL segundos (candado
+  con cache.add), por muchos profesores que lancen la herramienta.
+- Los estudiantes activos se guardan en CourseMembership: altas y sincronización de los que
+  siguen, y bajas de los que ya no aparecen. Si la lista se corta en ROSTER_MAX_MEMBERS no
+  se da de baja a nadie: los que faltan pueden estar en las páginas no leídas.
+
+Los contadores roster.* se exponen en /api/metrics/.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .conf import get_setting
+from .models import CourseMembership
+from . import metrics, serving
+
+logger = logging.getLogger(__name__)
+
+LEARNER_ROLE = re.compile(r'(^|[#/])Learner$')
+NEXT_LINK = re.compile(r'<([^>]*)>\s*;\s*rel="?next"?', re.IGNORECASE)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Un solo hilo: los cursos se precargan de uno en uno para no competir con los lanzamientos.
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='roster')
+    return _executor
+
+
+def _next_page_url(headers):
+    for name, value in headers.items():
+        if name.lower() == 'link':
+            match = NEXT_LINK.search(value.replace('\n', ' '))
+            if match:
+                return match.group(1)
+    return None
+
+
+def iter_members(nrps, members_url=None, max_members=None):
+    """
+    Miembros del curso página a página. `nrps` es un NamesRolesProvisioningService de PyLTI1p3
+    (el de message_launch.get_nrps() o uno construido a mano).
+    """
+    count = 0
+    while True:
+        data = nrps.get_nrps_data(members_url)
+        metrics.incr('roster.pages')
+        body = data.get('body') or {}
+        for member in body.get('members', []):
+            yield member
+            count += 1
+            if max_members and count >= max_members:
+                return
+        members_url = _next_page_url(data.get('headers') or {})
+        if not members_url:
+            return
+
+
+def is_active_learner(member):
+    if member.get('status', 'Active') != 'Active':
+        return False
+    return any(LEARNER_ROLE.search(role) for role in member.get('roles', []))
+
+
+def learner_ids(nrps, members_url=None):
+    """
+    lti_user_id de los estudiantes activos del curso, sin repetir y en el orden de NRPS.
+    Devuelve (ids, completa): completa es False si la lista se ha cortado en ROSTER_MAX_MEMBERS.
+    """
+    max_members = get_setting('ROSTER_MAX_MEMBERS')
+    seen = {}
+    count = 0
+    for member in iter_members(nrps, members_url, max_members=max_members):
+        metrics.incr('roster.members')
+        count += 1
+        user_id = member.get('user_id')
+        if user_id and is_active_learner(member):
+            seen.setdefault(user_id, None)
+    return list(seen), not max_members or count < max_members
+
+
+def sync_members(context_id, user_ids, remove_missing=True):
+    """
+    Guarda los estudiantes del curso en CourseMembership: crea los nuevos, actualiza synced_at
+    de los que siguen y, con remove_missing, borra los que ya no están. Devuelve (altas, bajas).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        members = CourseMembership.objects.filter(lti_context_id=context_id)
+        existing = set(members.values_list('lti_user_id', flat=True))
+        CourseMembership.objects.bulk_create(
+            [CourseMembership(lti_context_id=context_id, lti_user_id=user_id, synced_at=now)
+             for user_id in user_ids if user_id not in existing],
+            # Otra sincronización del mismo curso puede haber creado alguno a la vez.
+            ignore_conflicts=True,
+        )
+        members.filter(lti_user_id__in=existing & set(user_ids)).update(synced_at=now)
+        removed = 0
+        if remove_missing:
+            removed, _ = members.exclude(lti_user_id__in=user_ids).delete()
+    added = len(set(user_ids) - existing)
+    metrics.incr('roster.added', added)
+    metrics.incr('roster.removed', removed)
+    return added, removed
+
+
+def warm_course(context_id, user_ids, course_title=None):
+    """
+    Calcula y deja en la caché las recomendaciones de cada usuario en el curso.
+    Los que ya estaban en caché cuestan una lectura. Devuelve el número de usuarios procesados.
+    """
+    warmed = 0
+    for user_id in user_ids:
+        try:
+            serving.cached_recommendations(user_id, context_id, course_title)
+        except Exception as e:
+            metrics.incr('roster.warm_error')
+            logger.error(f"Error al precalcular recomendaciones de {user_id} en {context_id}: {e}")
+            continue
+        warmed += 1
+        metrics.incr('roster.warmed')
+    return warmed
+
+
+def prefetch_course(nrps, context_id, course_title=None, members_url=None):
+    """Descarga la lista de miembros, la guarda y precarga sus recomendaciones. Devuelve (estudiantes, precargados)."""
+    user_ids, complete = learner_ids(nrps, members_url)
+    sync_members(context_id, user_ids, remove_missing=complete)
+    warmed = warm_course(context_id, user_ids, course_title)
+    logger.info(f"Precarga del curso {context_id}: {warmed} de {len(user_ids)} estudiantes.")
+    return len(user_ids), warmed
+
+
+def _run_prefetch(nrps, context_id, course_title):
+    close_old_connections()
+    try:
+        prefetch_course(nrps, context_id, course_title)
+    except Exception as e:
+        metrics.incr('roster.error')
+        logger.error(f"Error al precargar el curso {context_id} con NRPS: {e}")
+        # Se libera el candado para que el siguiente lanzamiento de un profesor lo reintente.
+        cache.delete(_lock_key(context_id))
+    finally:
+        close_old_connections()
+
+
+def _lock_key(context_id):
+    return f"roster:prefetch:{context_id}"
+
+
+def schedule_prefetch(nrps, context_id, course_title=None):
+    """
+    Encola la precarga del curso si no se ha hecho en los últimos ROSTER_PREFETCH_INTERVAL
+    segundos. Devuelve True si se encoló.
+    """
+    if not get_setting('ROSTER_PREFETCH'):
+        return False
+    if not cache.add(_lock_key(context_id), True, get_setting('ROSTER_PREFETCH_INTERVAL')):
+        metrics.incr('roster.skipped')
+        return False
+    metrics.incr('roster.scheduled')
+    _get_executor().submit(_run_prefetch, nrps, context_id, course_title)
+    return True
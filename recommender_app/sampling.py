@@ -0,0 +1,122 @@
+# lti_recommender_project/recommender_app/sampling.py
+
+"""
+Muestreo aleatorio de recursos por curso sin ORDER BY RANDOM().
+
+Cada proceso guarda en memoria un arreglo compacto con las PKs de los recursos de cada
+contexto LTI. Elegir k recursos al azar cuesta O(k) y después basta una única consulta
+`pk__in`. Los arreglos se invalidan cuando se guarda o elimina un EducationalResource
+del contexto (ver signals.py) mediante un contador de generación guardado en la caché de
+Django, de modo que todos los procesos que comparten la caché se enteran del cambio.
+"""
+
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .models import EducationalResource
+
+# Clave usada para los recursos genéricos (sin lti_context_id).
+GENERIC_CONTEXT = None
+
+
+def _generation_key(context_id):
+    return f"resource_sampler:generation:{context_id if context_id is not None else '__generic__'}"
+
+
+def _context_filter(context_id):
+    if context_id is GENERIC_CONTEXT:
+        return {'lti_context_id__isnull': True}
+    return {'lti_context_id': context_id}
+
+
+class ResourceSampler:
+    """
+    Caché por proceso de las PKs de recursos de cada contexto.
+    `max_contexts` limita la memoria (se descartan los contextos menos usados) y
+    `max_age` fuerza una recarga periódica como red de seguridad.
+    """
+
+    def __init__(self, max_contexts=1000, max_age=600):
+        self.max_contexts = max_contexts
+        self.max_age = max_age
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sample(self, context_id, k):
+        """Devuelve hasta k PKs distintas elegidas al azar entre los recursos del contexto."""
+        pool = self._get_pool(context_id)
+        if len(pool) <= k:
+            picks = list(pool)
+            random.shuffle(picks)
+            return picks
+        # random.sample sobre un range elige índices sin materializar la población.
+        return [pool[index] for index in random.sample(range(len(pool)), k)]
+
+    def pks(self, context_id):
+        """PKs de los recursos del contexto (array('q') compartido: no se debe modificar)."""
+        return self._get_pool(context_id)
+
+    def sample_resources(self, context_id, k, fields=None):
+        """
+        Devuelve hasta k recursos aleatorios del contexto con una sola consulta.
+        Con `fields` se devuelven filas de values() (con 'pk' y esos campos) en lugar de modelos.
+        Si alguna PK ya no pertenece al contexto, se descarta el arreglo para recargarlo.
+        """
+        picks = self.sample(context_id, k)
+        if not picks:
+            return []
+        resources = EducationalResource.objects.filter(pk__in=picks, **_context_filter(context_id))
+        if fields:
+            resources = resources.values('pk', *fields)
+        resources = list(resources)
+        if len(resources) < len(picks):
+            self.invalidate(context_id)
+        random.shuffle(resources)
+        return resources
+
+    def invalidate(self, context_id):
+        """Descarta el arreglo local del contexto; se recargará en el próximo muestreo."""
+        with self._lock:
+            self._pools.pop(context_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+
+    def _get_pool(self, context_id):
+        generation = cache.get(_generation_key(context_id), 0)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pools.get(context_id)
+            if entry is not None and entry[0] == generation and now - entry[1] < self.max_age:
+                self._pools.move_to_end(context_id)
+                return entry[2]
+
+        pks = EducationalResource.objects.filter(**_context_filter(context_id)).values_list('pk', flat=True)
+        pool = array('q', pks.iterator(chunk_size=10000))
+
+        with self._lock:
+            self._pools[context_id] = (generation, now, pool)
+            self._pools.move_to_end(context_id)
+            while len(self._pools) > self.max_contexts:
+                self._pools.popitem(last=False)
+        return pool
+
+
+def bump_generation(context_id):
+    """Marca como obsoletos los arreglos del contexto en todos los procesos."""
+    key = _generation_key(context_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    sampler.invalidate(context_id)
+
+
+# Instancia compartida por el proceso.
+sampler = ResourceSampler()
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import UserInteraction, EducationalResource
+from .models import UserInteraction
+from . import resource_lookup
+from .recommendations import DEFAULT_FIELDS, RESOURCE_FIELDS
 
 class UserInteractionSerializer(serializers.ModelSerializer):
     # Campos que esperamos recibir en la API para una interacción
@@ -9,21 +11,18 @@ class UserInteractionSerializer(serializers.ModelSerializer):
         model = UserInteraction
         # Campos que la API recibirá y/o devolverá
         fields = ['lti_user_id', 'lti_context_id', 'resource_id', 'interaction_type', 'value', 'timestamp']
-        # timestamp es auto_now_add, por lo que no es necesario enviarlo en la creación
+        # timestamp lo pone el servidor (instante de creación), por lo que no es necesario enviarlo
         read_only_fields = ['timestamp']
 
     def create(self, validated_data):
         # Lógica personalizada para manejar el 'resource_id' y obtener el objeto 'resource'
         resource_id_from_data = validated_data.pop('resource_id')
         
-        try:
-            # Intenta encontrar el recurso educativo por su resource_id y lti_context_id
-            # Es importante que el resource_id sea único dentro de un lti_context_id
-            resource = EducationalResource.objects.get(
-                resource_id=resource_id_from_data, 
-                lti_context_id=validated_data.get('lti_context_id') # Asocia el recurso al contexto LTI
-            )
-        except EducationalResource.DoesNotExist:
+        # Busca la PK del recurso por su resource_id y lti_context_id en la caché de
+        # resource_lookup (solo consulta la base de datos si el par no está cacheado).
+        # Es importante que el resource_id sea único dentro de un lti_context_id
+        resource_pk = resource_lookup.lookup(resource_id_from_data, validated_data.get('lti_context_id'))
+        if resource_pk is None:
             # Si el recurso no existe, puedes elegir cómo manejarlo:
             # 1. Crear el recurso automáticamente (si los metadatos son mínimos o se pueden inferir)
             # 2. Lanzar un error para indicar que el recurso debe existir previamente
@@ -33,5 +32,61 @@ class UserInteractionSerializer(serializers.ModelSerializer):
             )
 
         # Crea la interacción de usuario con el objeto EducationalResource
-        user_interaction = UserInteraction.objects.create(resource=resource, **validated_data)
-        return user_interaction
\ No newline at end of file
+        user_interaction = UserInteraction.objects.create(resource_id=resource_pk, **validated_data)
+        return user_interaction
+
+def parse_resource_fields(value):
+    """Campos de recurso pedidos ("title,url") como tupla sin repetidos."""
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in RESOURCE_FIELDS]
+    if unknown:
+        raise serializers.ValidationError(
+            f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(RESOURCE_FIELDS)}."
+        )
+    return tuple(dict.fromkeys(fields)) or DEFAULT_FIELDS
+
+
+class RecommendationQuerySerializer(serializers.Serializer):
+    # Parámetros de consulta de la API de recomendaciones.
+    # user_id y context_id solo los usan los usuarios staff; con token se toman del lanzamiento.
+    user_id = serializers.CharField(max_length=255, required=False)
+    context_id = serializers.CharField(max_length=255, required=False)
+    # Campos separados por comas (por defecto los que muestra el lanzamiento)
+    fields = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=50)
+    cursor = serializers.CharField(required=False)
+
+    def validate_fields(self, value):
+        return parse_resource_fields(value)
+
+
+class SimilarResourcesQuerySerializer(serializers.Serializer):
+    # Parámetros de consulta de "más como este"
+    fields = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50)
+
+    def validate_fields(self, value):
+        return parse_resource_fields(value)
+
+
+class InteractionExportQuerySerializer(serializers.Serializer):
+    # Parámetros de consulta de la exportación de interacciones
+    context_id = serializers.CharField(max_length=255, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    # "format" lo reserva DRF para elegir el renderer
+    output = serializers.ChoiceField(choices=['csv', 'jsonl'], default='csv')
+    gzip = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data.get('since') and data.get('until') and data['since'] >= data['until']:
+            raise serializers.ValidationError("'since' debe ser anterior a 'until'.")
+        return data
+
+
+class HistoryQuerySerializer(serializers.Serializer):
+    # Parámetros de consulta del historial de interacciones (el usuario y el curso salen del token)
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=200)
+    cursor = serializers.CharField(required=False)
+    # Solo resource_id e interaction_type
+    compact = serializers.BooleanField(default=False)
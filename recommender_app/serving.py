@@ -0,0 +1,149 @@
+# lti_recommender_project/recommender_app/serving.py
+
+"""
+Presupuesto de latencia para el paso de recomendación del lanzamiento LTI.
+
+El motor principal (caché, instantánea o cálculo en vivo) se ejecuta en un pool de hilos
+acotado y el lanzamiento espera como mucho RECOMMENDATION_DEADLINE_MS. Si no responde a
+tiempo, falla o el pool está saturado, se sirve la lista popular del curso: primero la
+guardada en memoria por este proceso, si no la instantánea de curso de build_recommendations
+y, si tampoco la hay, las tendencias del curso (una lectura LIMIT de un índice, ver
+trending.py). Un cálculo que vence el plazo sigue ejecutándose y deja su resultado en la
+caché de recomendaciones para el siguiente lanzamiento.
+
+Cada degradación se registra en el log y en los contadores serving.* de /api/metrics/.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.db import close_old_connections
+
+from .conf import get_setting
+from . import metrics, rec_cache, snapshots, trending
+from .recommendations import _resource_to_dict, _resources_in_order, compute_recommendations
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que se reutiliza en memoria la lista popular de un curso.
+FALLBACK_TTL = 300
+FALLBACK_MAX_CONTEXTS = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+_fallbacks = OrderedDict()
+_fallbacks_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_setting('RECOMMENDATION_WORKERS'), thread_name_prefix='recommendations'
+                )
+    return _executor
+
+
+def _run_in_thread(func):
+    """Ejecuta func en un hilo del pool con su propia conexión a la base de datos."""
+    global _in_flight
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def fallback_for_context(context_id):
+    """
+    Lista popular del curso para servir en modo degradado, o None si no hay ninguna.
+    Se guarda en memoria para que una racha de degradaciones no consulte la base de datos.
+    """
+    now = time.monotonic()
+    with _fallbacks_lock:
+        entry = _fallbacks.get(context_id)
+        if entry is not None and now - entry[0] < FALLBACK_TTL:
+            _fallbacks.move_to_end(context_id)
+            return entry[1]
+
+    recommendations = snapshots.lookup('', context_id)
+    if recommendations is None:
+        trending_pks = trending.top_for_context(context_id, limit=get_setting('RECOMMENDATION_COUNT'))
+        recommendations = [_resource_to_dict(resource) for resource in _resources_in_order(trending_pks, context_id)]
+        if not recommendations:
+            return None
+    with _fallbacks_lock:
+        _fallbacks[context_id] = (now, recommendations)
+        _fallbacks.move_to_end(context_id)
+        while len(_fallbacks) > FALLBACK_MAX_CONTEXTS:
+            _fallbacks.popitem(last=False)
+    return recommendations
+
+
+def cached_recommendations(user_id, context_id, course_title=None):
+    """
+    El motor principal: la caché de recomendaciones por usuario y curso (ver rec_cache.py).
+    En un fallo de caché se usa la instantánea precalculada por build_recommendations (la del
+    curso si el usuario no tiene historial) y solo si no existe se calculan en vivo.
+    """
+    def compute():
+        recommendations = snapshots.lookup_for_user(user_id, context_id)
+        if recommendations is None:
+            recommendations = compute_recommendations(user_id, context_id, course_title)
+        return recommendations
+
+    return rec_cache.get_or_compute(user_id, context_id, compute)
+
+
+def _degrade(context_id, reason):
+    metrics.incr(f'serving.degraded.{reason}')
+    try:
+        recommendations = fallback_for_context(context_id)
+    except Exception as e:
+        logger.error(f"Error al cargar la lista popular del contexto {context_id}: {e}")
+        recommendations = None
+    metrics.incr('serving.fallback.hit' if recommendations is not None else 'serving.fallback.miss')
+    return recommendations
+
+
+def serve_with_deadline(context_id, primary):
+    """
+    Devuelve `primary()` si responde dentro del presupuesto; si no, la lista popular del curso.
+    Devuelve None si tampoco hay lista popular.
+    """
+    deadline_ms = get_setting('RECOMMENDATION_DEADLINE_MS')
+    if not deadline_ms:
+        return primary()
+
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= get_setting('RECOMMENDATION_WORKERS') * 2:
+            overloaded = True
+        else:
+            overloaded = False
+            _in_flight += 1
+    if overloaded:
+        logger.warning(f"Pool de recomendaciones saturado; se sirve la lista popular del contexto {context_id}.")
+        return _degrade(context_id, 'overload')
+
+    future = _get_executor().submit(_run_in_thread, primary)
+    try:
+        recommendations = future.result(timeout=deadline_ms / 1000.0)
+    except FutureTimeoutError:
+        logger.warning(f"Las recomendaciones superaron {deadline_ms} ms; se sirve la lista popular del contexto {context_id}.")
+        return _degrade(context_id, 'timeout')
+    except Exception as e:
+        logger.error(f"Error del motor de recomendaciones: {e}; se sirve la lista popular del contexto {context_id}.")
+        return _degrade(context_id, 'error')
+    metrics.incr('serving.primary')
+    return recommendations
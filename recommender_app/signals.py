@@ -0,0 +1,91 @@
+# lti_recommender_project/recommender_app/signals.py
+
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from pylti1p3.contrib.django.lti1p3_tool_config.models import LtiTool, LtiToolKey
+
+from .models import EducationalResource, UserInteraction
+from . import cooccurrence, lti_config, rec_cache, resource_lookup, rollups, sampling, snapshots, trending
+
+logger = logging.getLogger(__name__)
+
+# Se emite con `interactions=[...]` cuando se registran interacciones nuevas, tanto de una en
+# una (post_save) como en lote (bulk_create no emite post_save, así que quien inserta en
+# lote debe enviar esta señal). Los receptores mantienen las estructuras derivadas.
+interactions_recorded = Signal()
+
+
+@receiver(pre_save, sender=EducationalResource)
+def remember_resource_key(sender, instance, **kwargs):
+    """
+    Guarda el par (resource_id, lti_context_id) anterior de un recurso que se va a modificar,
+    para invalidar también su entrada de resource_lookup (y el muestreo del curso anterior) si cambia.
+    """
+    if instance.pk is not None:
+        instance._previous_lookup_key = EducationalResource.objects.filter(pk=instance.pk).values_list(
+            'resource_id', 'lti_context_id'
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=EducationalResource)
+def resource_changed(sender, instance, **kwargs):
+    """
+    Invalida las estructuras en memoria que dependen de los recursos del contexto.
+    """
+    sampling.bump_generation(instance.lti_context_id)
+    # El par actual (también borra un "no existe" cacheado al crear el recurso) y el anterior.
+    resource_lookup.invalidate(instance.resource_id, instance.lti_context_id)
+    previous = getattr(instance, '_previous_lookup_key', None)
+    if previous is not None and previous != (instance.resource_id, instance.lti_context_id):
+        resource_lookup.invalidate(*previous)
+        # Si el recurso cambió de curso, el arreglo del curso anterior ya no debe incluirlo.
+        if previous[1] != instance.lti_context_id:
+            sampling.bump_generation(previous[1])
+
+
+@receiver([post_save, post_delete], sender=LtiTool)
+@receiver([post_save, post_delete], sender=LtiToolKey)
+def lti_config_changed(sender, **kwargs):
+    """La configuración de la herramienta ha cambiado (p. ej. desde el admin): se vuelve a leer en todos los procesos."""
+    lti_config.bump_generation()
+
+
+@receiver(post_save, sender=UserInteraction)
+def interaction_saved(sender, instance, created, **kwargs):
+    if created:
+        notify_interactions_recorded([instance])
+
+
+def notify_interactions_recorded(interactions):
+    """
+    Envía interactions_recorded. Un fallo al actualizar una estructura derivada se registra
+    pero no impide guardar la interacción.
+    """
+    for handler, response in interactions_recorded.send_robust(sender=UserInteraction, interactions=interactions):
+        if isinstance(response, Exception):
+            logger.error(f"Error en {getattr(handler, '__name__', handler)} al procesar interacciones: {response}")
+
+
+@receiver(interactions_recorded)
+def update_cooccurrences(sender, interactions, **kwargs):
+    cooccurrence.record_interactions(interactions)
+
+
+@receiver(interactions_recorded)
+def update_trending(sender, interactions, **kwargs):
+    trending.record_interactions(interactions)
+
+
+@receiver(interactions_recorded)
+def update_rollups(sender, interactions, **kwargs):
+    rollups.record_interactions(interactions)
+
+
+@receiver(interactions_recorded)
+def invalidate_recommendations(sender, interactions, **kwargs):
+    pairs = {(interaction.lti_user_id, interaction.lti_context_id) for interaction in interactions}
+    snapshots.discard(pairs)
+    for user_id, context_id in pairs:
+        rec_cache.invalidate(user_id, context_id)
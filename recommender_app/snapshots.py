@@ -0,0 +1,164 @@
+# lti_recommender_project/recommender_app/snapshots.py
+
+"""
+Instantáneas de recomendaciones precalculadas (tabla RecommendationSnapshot).
+
+El comando build_recommendations calcula en lote las listas de cada (usuario, curso) activo
+y de cada curso, y el lanzamiento LTI las lee con una única búsqueda por clave primaria.
+Un usuario sin instantánea y sin historial en el curso recibe la instantánea del curso (es la
+lista que le daría el cálculo en vivo); solo si tampoco la hay, o si el usuario tiene historial,
+se calcula la lista en vivo. Cuando un usuario registra una interacción nueva se borra su
+instantánea para que sus clics se reflejen de inmediato.
+
+El título del curso (para el arranque en frío por contenido) solo llega en el lanzamiento:
+remember_course_title lo guarda en CourseTitle para que build_snapshots pueda usarlo.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .conf import get_setting
+from .models import CourseTitle, EducationalResource, RecommendationSnapshot, UserInteraction
+from .recommendations import (
+    DEFAULT_FIELDS, _model_fields, _resource_to_dict, _resources_in_order, compute_recommendations,
+)
+from . import trending
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(user_id, context_id):
+    return f"{context_id}|{user_id or ''}"
+
+
+def lookup(user_id, context_id):
+    """Recomendaciones precalculadas para el usuario en el curso, o None si no hay instantánea."""
+    return RecommendationSnapshot.objects.filter(
+        pk=snapshot_key(user_id, context_id)
+    ).values_list('recommendations', flat=True).first()
+
+
+def lookup_for_user(user_id, context_id):
+    """
+    Como lookup, pero si el usuario no tiene instantánea ni interacciones en el curso devuelve
+    la instantánea del curso. None si hay que calcular la lista en vivo.
+    """
+    recommendations = lookup(user_id, context_id)
+    if recommendations is None and user_id and not UserInteraction.objects.filter(
+        lti_user_id=user_id, lti_context_id=context_id
+    ).exists():
+        recommendations = lookup('', context_id)
+    return recommendations
+
+
+# Títulos ya guardados por este proceso: solo se escribe cuando un curso cambia de título.
+_remembered_titles = {}
+_remembered_titles_lock = threading.Lock()
+
+
+def remember_course_title(context_id, course_title):
+    """Guarda el título del curso visto en un lanzamiento (una escritura por curso y proceso)."""
+    if not course_title or course_title == "N/A":
+        return
+    with _remembered_titles_lock:
+        if _remembered_titles.get(context_id) == course_title:
+            return
+        _remembered_titles[context_id] = course_title
+    CourseTitle.objects.update_or_create(lti_context_id=context_id, defaults={'title': course_title})
+
+
+def discard(user_context_pairs):
+    """Borra las instantáneas de los pares (usuario, curso) indicados."""
+    keys = [snapshot_key(user_id, context_id) for user_id, context_id in user_context_pairs]
+    if keys:
+        RecommendationSnapshot.objects.filter(pk__in=keys).delete()
+
+
+def popular_for_context(context_id, count, course_title=None):
+    """
+    Lista de curso para usuarios sin historial: tendencias recientes, si no la popularidad
+    acumulada y, si el curso aún no tiene interacciones, el cálculo genérico (con el título
+    del curso para el arranque en frío).
+    """
+    trending_pks = trending.top_for_context(context_id, limit=count)
+    if trending_pks:
+        return [_resource_to_dict(resource) for resource in _resources_in_order(trending_pks, context_id)]
+    resources = EducationalResource.objects.filter(
+        lti_context_id=context_id, popularity__isnull=False
+    ).order_by('-popularity__weight').values(*_model_fields(DEFAULT_FIELDS))[:count]
+    recommendations = [_resource_to_dict(resource) for resource in resources]
+    return recommendations or compute_recommendations('', context_id, course_title)
+
+
+def _write(rows, batch_size):
+    RecommendationSnapshot.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['key'],
+        update_fields=['recommendations', 'built_at'],
+    )
+
+
+def build_snapshots(active_days=30, batch_size=1000):
+    """
+    Recalcula las instantáneas de todos los cursos y de los pares (usuario, curso) con
+    interacciones en los últimos `active_days` días. Las filas que no se han regenerado en
+    esta ejecución (usuarios inactivos, cursos sin recursos) se eliminan al final.
+    Devuelve (instantáneas de usuario, instantáneas de curso).
+    """
+    started_at = timezone.now()
+    count = get_setting('RECOMMENDATION_COUNT')
+    since = started_at - timedelta(days=active_days)
+
+    pairs = (
+        UserInteraction.objects.filter(timestamp__gte=since)
+        .values_list('lti_user_id', 'lti_context_id')
+        .distinct()
+        .order_by()
+    )
+    contexts = set(
+        EducationalResource.objects.exclude(lti_context_id__isnull=True)
+        .values_list('lti_context_id', flat=True)
+        .distinct()
+        .order_by()
+    )
+    titles = dict(CourseTitle.objects.values_list('lti_context_id', 'title'))
+    contexts.update(titles)
+
+    user_rows, batch = 0, []
+    for user_id, context_id in pairs.iterator(chunk_size=batch_size):
+        contexts.add(context_id)
+        batch.append(RecommendationSnapshot(
+            key=snapshot_key(user_id, context_id),
+            lti_context_id=context_id,
+            lti_user_id=user_id,
+            recommendations=compute_recommendations(user_id, context_id, titles.get(context_id)),
+            built_at=timezone.now(),
+        ))
+        if len(batch) >= batch_size:
+            _write(batch, batch_size)
+            user_rows += len(batch)
+            batch = []
+    _write(batch, batch_size)
+    user_rows += len(batch)
+
+    batch = [
+        RecommendationSnapshot(
+            key=snapshot_key('', context_id),
+            lti_context_id=context_id,
+            recommendations=popular_for_context(context_id, count, titles.get(context_id)),
+            built_at=timezone.now(),
+        )
+        for context_id in contexts
+    ]
+    _write(batch, batch_size)
+
+    with transaction.atomic():
+        RecommendationSnapshot.objects.filter(built_at__lt=started_at).delete()
+    logger.info(f"Instantáneas generadas: {user_rows} de usuario, {len(contexts)} de curso.")
+    return user_rows, len(contexts)
@@ -0,0 +1,34 @@
+# lti_recommender_project/recommender_app/test_runner.py
+
+"""
+Runner de `manage.py test` (settings.TEST_RUNNER).
+
+La caché de settings.CACHES es un archivo compartido por todos los procesos de la máquina
+(recommender_data/cache.sqlite3): si las pruebas la usaran, dejarían generaciones, ventanas
+de recientes y candados con PKs de la base de datos de pruebas que el servidor de desarrollo
+leería después. Durante toda la ejecución se usa el mismo backend (TwoTierCache, del que
+dependen p. ej. los límites de admisión compartidos) sobre un archivo en un directorio
+temporal que se borra al terminar.
+"""
+
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class RecommenderTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self._cache_override = override_settings(CACHES={'default': {
+            'BACKEND': 'recommender_app.cache_backend.TwoTierCache',
+            'LOCATION': Path(self._cache_dir.name) / 'cache.sqlite3',
+        }})
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1256 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import TestCase as DjangoTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import msgpack
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from pylti1p3.contrib.django.lti1p3_tool_config.models import LtiTool, LtiToolKey
+from pylti1p3.exception import LtiException
+from pylti1p3.names_roles import NamesRolesProvisioningService
+from pylti1p3.registration import Registration
+from pylti1p3.service_connector import ServiceConnector
+
+from . import (
+    admission, ann_index, archive, compaction, content_index, cooccurrence, event_log, export, history, item_similarity,
+    lti_config, mf_model, rec_cache, replay, resource_lookup, roster, sampling, serving, snapshots, trending,
+)
+from .cache_backend import TwoTierCache
+from .management.commands import nrps_standin
+from .models import (
+    CourseMembership, EducationalResource, EventLogOffset, ResourceCooccurrence, ResourceNeighbors, ResourcePopularity, TrendingScore,
+    UserInteraction,
+)
+from .recommendations import _fuse_rankings, compute_recommendations
+from .views import get_recommendations_from_api, make_launch_token
+
+
+class TestCase(DjangoTestCase):
+    """
+    Las claves de la caché y el L1 de resource_lookup no se deshacen con la transacción de
+    cada prueba: se vacían antes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        resource_lookup.clear()
+
+
+def create_resources(context_id, count, start=0):
+    return [
+        EducationalResource.objects.create(
+            resource_id=f'{context_id}-r{number}', title=f'Recurso {number}',
+            url=f'https://example.com/{context_id}/{number}', lti_context_id=context_id,
+        )
+        for number in range(start, start + count)
+    ]
+
+
+class RecommendationsApiAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.resources = create_resources('c1', 3)
+        create_resources('c2', 3)
+
+    def test_without_credentials_is_forbidden(self):
+        response = self.client.get(reverse('recommendations_api'), {'user_id': 'u0', 'context_id': 'c1'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_token_is_forbidden(self):
+        response = self.client.get(reverse('recommendations_api'), {'token': 'falso'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_token_scopes_to_launch(self):
+        # user_id y context_id de la consulta no cuentan: se usan los del token.
+        response = self.client.get(reverse('recommendations_api'), {
+            'token': make_launch_token('u0', 'c1'), 'user_id': 'u1', 'context_id': 'c2', 'fields': 'resource_id',
+        })
+        self.assertEqual(response.status_code, 200)
+        resource_ids = {item['resource_id'] for item in response.json()['results']}
+        self.assertEqual(resource_ids, {resource.resource_id for resource in self.resources})
+
+    def test_staff_can_query_any_user(self):
+        staff = get_user_model().objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('recommendations_api'), {'user_id': 'u0', 'context_id': 'c2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(self.client.get(reverse('recommendations_api')).status_code, 400)
+
+
+class InteractionHistoryAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        resource = create_resources('c1', 1)[0]
+        for user_id in ('u0', 'u1'):
+            UserInteraction.objects.create(lti_user_id=user_id, lti_context_id='c1', resource=resource, interaction_type='viewed')
+
+    def test_without_token_is_forbidden(self):
+        response = self.client.get(reverse('interaction_history'), {'user_id': 'u0', 'context_id': 'c1'})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('results', response.json())
+
+    def test_token_scopes_to_launch(self):
+        response = self.client.get(reverse('interaction_history'), {
+            'token': make_launch_token('u1', 'c1'), 'user_id': 'u0',
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['id'], UserInteraction.objects.get(lti_user_id='u1').pk)
+
+
+def temporary_cache(test_case, **options):
+    """TwoTierCache sobre un archivo de un directorio temporal."""
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    return TwoTierCache(f'{directory.name}/cache.sqlite3', {'OPTIONS': options})
+
+
+def use_temporary_index_dir(test_case):
+    """INDEX_DIR en un directorio temporal durante la prueba."""
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    settings_override = override_settings(RECOMMENDER_CONFIG={'INDEX_DIR': directory.name})
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+
+
+class SimilarResourcesTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_index_dir(self)
+        self.addCleanup(ann_index._loaded.reset)
+
+        def resource(resource_id, context_id, title):
+            return EducationalResource.objects.create(
+                resource_id=resource_id, title=title, url=f'https://example.com/{resource_id}', lti_context_id=context_id,
+            )
+
+        self.source = resource('a', 'c1', 'Álgebra lineal: matrices y determinantes')
+        self.same_course = resource('b', 'c1', 'Álgebra lineal: matrices y determinantes')
+        resource('c', 'c2', 'Álgebra lineal: matrices y determinantes')
+        resource('d', 'c1', 'Historia del arte barroco')
+        ann_index.build_ann_index()
+
+    def similar(self, pk, **params):
+        return self.client.get(reverse('resource_similar', args=[pk]), params)
+
+    def test_only_resources_from_launch_course(self):
+        response = self.similar(self.source.pk, token=make_launch_token('u0', 'c1'), fields='resource_id')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'resource_id': 'b'}])
+
+    def test_without_credentials_is_forbidden(self):
+        self.assertEqual(self.similar(self.source.pk).status_code, 403)
+
+    def test_resource_from_another_course_is_not_found(self):
+        self.assertEqual(self.similar(self.source.pk, token=make_launch_token('u0', 'c2')).status_code, 404)
+
+
+class ItemSimilarityTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.a, self.b, self.c, self.d = create_resources('c1', 4)
+        views = {'u0': (self.a, self.b), 'u1': (self.a, self.b), 'u2': (self.a, self.c), 'u3': (self.a,)}
+        UserInteraction.objects.bulk_create([
+            UserInteraction(lti_user_id=user_id, lti_context_id='c1', resource=resource, interaction_type='viewed')
+            for user_id, resources in views.items()
+            for resource in resources
+        ])
+
+    def test_neighbors_are_ranked_by_cosine(self):
+        self.assertEqual(item_similarity.build_item_neighbors(), 3)
+        neighbors = ResourceNeighbors.objects.get(resource=self.a)
+        self.assertEqual(neighbors.neighbor_ids, [self.b.pk, self.c.pk])
+        # A la ven 4 perfiles, B 2 (ambos con A) y C 1: cos(A, B) = 2 / (2·√2), cos(A, C) = 1 / 2.
+        self.assertEqual(neighbors.scores, [round(2 / (2 * 2 ** 0.5), 6), 0.5])
+
+    def test_recommendations_skip_history(self):
+        item_similarity.build_item_neighbors()
+        # Una consulta para el historial y otra para los vecinos de todas las semillas.
+        with self.assertNumQueries(2):
+            self.assertEqual(item_similarity.recommend_for_user('u3', 'c1', 5), [self.b.pk, self.c.pk])
+        self.assertEqual(item_similarity.recommend_for_user('u0', 'c1', 5), [self.c.pk])
+        self.assertEqual(item_similarity.recommend_for_user('nuevo', 'c1', 5), [])
+
+
+class ResourceSamplerTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(sampling.sampler.clear)
+        self.course = create_resources('c1', 3)
+        self.other_course = create_resources('c2', 2)
+        # Otro proceso: su propio arreglo en memoria, la misma caché compartida.
+        self.other_process = sampling.ResourceSampler()
+
+    def test_pool_is_reused_until_context_changes(self):
+        self.assertEqual(sorted(self.other_process.pks('c1')), [resource.pk for resource in self.course])
+        other_pool = self.other_process.pks('c2')
+        with self.assertNumQueries(0):
+            self.other_process.pks('c1')
+            self.assertEqual(len(self.other_process.sample('c1', 2)), 2)
+
+        # Guardar un recurso sube la generación de su contexto (signals.py).
+        added = create_resources('c1', 1, start=3)[0]
+        self.assertIn(added.pk, self.other_process.pks('c1'))
+        self.assertIs(self.other_process.pks('c2'), other_pool)
+
+        self.course[0].delete()
+        self.assertNotIn(self.course[0].pk, self.other_process.pks('c1'))
+
+    def test_moving_a_resource_bumps_both_contexts(self):
+        self.other_process.pks('c1')
+        self.other_process.pks('c2')
+        resource = self.course[0]
+        resource.lti_context_id = 'c2'
+        resource.save()
+        self.assertNotIn(resource.pk, self.other_process.pks('c1'))
+        self.assertIn(resource.pk, self.other_process.pks('c2'))
+
+    def test_sample_resources_returns_course_rows(self):
+        rows = sampling.sampler.sample_resources('c1', 5, fields=['title'])
+        self.assertEqual(sorted(row['pk'] for row in rows), [resource.pk for resource in self.course])
+        self.assertEqual(set(rows[0]), {'pk', 'title'})
+
+
+class ContentIndexTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_index_dir(self)
+        self.addCleanup(content_index._loaded.reset)
+        titles = ['Álgebra lineal', 'Historia moderna', 'Química orgánica', 'Física cuántica', 'Biología celular', 'Economía']
+        self.resources = [
+            EducationalResource.objects.create(
+                resource_id=f'r{number}', title=title, url=f'https://example.com/{number}', lti_context_id='c1',
+            )
+            for number, title in enumerate(titles)
+        ]
+
+    def search(self, text):
+        content_index._loaded.reset()
+        return content_index.recommend_for_text(text, 5)
+
+    def test_incremental_build_only_revectorizes_changes(self):
+        self.assertEqual(content_index.build_content_index(), (6, 6))
+        self.assertEqual(self.search('algebra'), [self.resources[0].pk])
+        first_version = content_index.index_version()
+
+        algebra, history = self.resources[0], self.resources[1]
+        algebra.title = 'Geometría analítica'
+        algebra.save()
+        history.delete()
+        added = EducationalResource.objects.create(
+            resource_id='r6', title='Álgebra abstracta', url='https://example.com/6', lti_context_id='c1',
+        )
+        total, updated = content_index.build_content_index()
+        self.assertEqual(total, 6)
+        # Los dos cambios y, como mucho, los guardados en el instante de la marca de agua.
+        self.assertGreaterEqual(updated, 2)
+        self.assertLess(updated, total)
+
+        self.assertNotEqual(content_index.index_version(), first_version)
+        self.assertEqual(self.search('algebra'), [added.pk])
+        self.assertEqual(self.search('geometria'), [algebra.pk])
+        self.assertEqual(self.search('historia'), [])
+        # Las filas conservadas siguen en el índice.
+        self.assertEqual(self.search('biologia'), [self.resources[4].pk])
+
+    def test_full_build_matches_incremental(self):
+        content_index.build_content_index()
+        self.resources[2].tags = 'laboratorio'
+        self.resources[2].save()
+        content_index.build_content_index()
+        incremental = self.search('laboratorio quimica')
+        self.assertEqual(content_index.build_content_index(full=True), (6, 6))
+        self.assertEqual(self.search('laboratorio quimica'), incremental)
+
+
+class CooccurrenceTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.a, self.b, self.c = create_resources('c1', 3)
+        self.now = timezone.now()
+
+    def interact(self, user_id, resource, interaction_type='viewed', seconds=0):
+        # post_save envía interactions_recorded y se actualizan los pares.
+        UserInteraction.objects.create(
+            lti_user_id=user_id, lti_context_id='c1', resource=resource, interaction_type=interaction_type,
+            timestamp=self.now + timedelta(seconds=seconds),
+        )
+
+    def pairs(self):
+        rows = ResourceCooccurrence.objects.values_list('resource', 'other', 'weight')
+        return {(source, other): weight for source, other, weight in rows}
+
+    def test_pairs_and_popularity_are_incremental(self):
+        self.interact('u0', self.a)
+        self.interact('u0', self.b, seconds=1)
+        self.interact('u1', self.a)
+        self.interact('u1', self.c, 'downloaded', seconds=1)
+        self.assertEqual(self.pairs(), {
+            (self.a.pk, self.b.pk): 1.0, (self.b.pk, self.a.pk): 1.0,
+            (self.a.pk, self.c.pk): 2.0, (self.c.pk, self.a.pk): 2.0,
+        })
+        self.assertEqual(
+            dict(ResourcePopularity.objects.values_list('resource', 'weight')),
+            {self.a.pk: 2.0, self.b.pk: 1.0, self.c.pk: 2.0},
+        )
+        # Repetir un recurso de la ventana suma a sus pares, no crea uno consigo mismo.
+        self.interact('u0', self.a, seconds=2)
+        self.assertEqual(self.pairs()[(self.a.pk, self.b.pk)], 2.0)
+        self.assertNotIn((self.a.pk, self.a.pk), self.pairs())
+
+    def test_recommendations_from_recent_window(self):
+        self.interact('u0', self.a)
+        self.interact('u0', self.b, seconds=1)
+        self.interact('u1', self.a)
+        self.interact('u1', self.c, 'downloaded', seconds=1)
+        self.interact('u2', self.a)
+        with self.assertNumQueries(0):
+            self.assertEqual(cooccurrence.recent_items('u2', 'c1'), [self.a.pk])
+        # C: 2 / √2 frente a B: 1 / √1; el recurso visto no se recomienda.
+        self.assertEqual(cooccurrence.recommend_for_user('u2', 'c1', 5), [self.c.pk, self.b.pk])
+        self.assertEqual(cooccurrence.recommend_for_user('nuevo', 'c1', 5), [])
+
+    def test_window_is_rebuilt_from_history(self):
+        self.interact('u0', self.a)
+        self.interact('u0', self.b, seconds=1)
+        self.interact('u0', self.a, seconds=2)
+        cache.clear()
+        self.assertEqual(cooccurrence.recent_items('u0', 'c1'), [self.a.pk, self.b.pk])
+
+
+class MatrixFactorizationContextTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_index_dir(self)
+        self.addCleanup(mf_model._loaded.reset)
+        self.addCleanup(sampling.sampler.clear)
+        self.course = create_resources('c1', 10)
+        self.other_course = create_resources('c2', 40)
+        interactions = [
+            UserInteraction(lti_user_id=f'u{user}', lti_context_id=resource.lti_context_id, resource=resource, interaction_type='viewed')
+            for user in range(6)
+            for resource in self.course[:2 + user % 3] + self.other_course[user:user + 30]
+        ]
+        UserInteraction.objects.bulk_create(interactions)
+        mf_model.train_mf_model(n_factors=4, iterations=3)
+
+    def test_scores_only_course_resources(self):
+        recommendations = mf_model.recommend_for_user('u0', 'c1', 5)
+        self.assertTrue(recommendations)
+        course_pks = {resource.pk for resource in self.course}
+        self.assertLessEqual(set(recommendations), course_pks - {resource.pk for resource in self.course[:2]})
+
+    def test_global_ranking_without_candidates(self):
+        model = mf_model._loaded.get()
+        other_pks = {resource.pk for resource in self.other_course}
+        self.assertTrue(set(model.recommend('u0', 20)) & other_pks)
+
+
+class TwoTierCacheCullTests(TestCase):
+    def test_suite_does_not_use_shared_file(self):
+        # Lo garantiza RecommenderTestRunner: el resto de pruebas no escribe en recommender_data.
+        self.assertNotEqual(caches['default']._path, Path(settings.BASE_DIR) / 'recommender_data' / 'cache.sqlite3')
+
+    def test_cull_keeps_launch_state(self):
+        cache = temporary_cache(self, MAX_ENTRIES=50, CULL_FREQUENCY=2, L1_TIMEOUT=0)
+        cache.set('lti1p3-state-abc', {'nonce': 'n'}, timeout=600)
+        for number in range(199):
+            cache.set(f'dato-{number}', number, timeout=None)
+        self.assertEqual(cache.get('lti1p3-state-abc'), {'nonce': 'n'})
+        self.assertLess(len(cache.get_many([f'dato-{number}' for number in range(199)])), 199)
+
+
+class RecommendationCacheGenerationTests(TestCase):
+    def test_generation_keys_expire(self):
+        with mock.patch.object(rec_cache, 'cache', temporary_cache(self, L1_TIMEOUT=0)) as cache:
+            rec_cache.invalidate('u0', 'c1')
+            first = cache.get(rec_cache._generation_key('u0', 'c1'))
+            rec_cache.invalidate('u0', 'c1')
+            self.assertEqual(cache.get(rec_cache._generation_key('u0', 'c1')), first + 1)
+            (expires,) = cache._connection().execute(
+                "SELECT expires FROM cache WHERE key = ?", (cache.make_key(rec_cache._generation_key('u0', 'c1')),)
+            ).fetchone()
+        self.assertLess(expires, float('inf'))
+
+    @override_settings(RECOMMENDER_CONFIG={'RECOMMENDATION_CACHE_TTL': 60})
+    def test_entry_from_expired_generation_is_not_served(self):
+        clock = mock.Mock(return_value=1000.0)
+        with mock.patch.object(rec_cache, 'cache', temporary_cache(self, L1_TIMEOUT=0)), mock.patch('time.time', clock):
+            rec_cache.invalidate('u0', 'c1')
+            # Justo antes de que caduque el contador (4 * 60 s): la entrada dura más que él.
+            clock.return_value = 1235.0
+            self.assertEqual(rec_cache.get_or_compute('u0', 'c1', lambda: ['antigua']), ['antigua'])
+            clock.return_value = 1245.0
+            rec_cache.invalidate('u0', 'c1')
+            self.assertEqual(rec_cache.get_or_compute('u0', 'c1', lambda: ['nueva']), ['nueva'])
+
+
+class SharedTokenBucketTests(TestCase):
+    COSTS = [(('user', 'u0'), 1, 1.0, 3)]
+
+    def setUp(self):
+        super().setUp()
+        self.first = temporary_cache(self)
+        # Otro proceso: su propio L1 y su propia conexión al mismo archivo.
+        self.second = TwoTierCache(self.first._path, {})
+        self.buckets = admission.CacheTokenBuckets()
+
+    def take(self, cache, now):
+        with mock.patch.object(admission, 'cache', cache):
+            return self.buckets.take(self.COSTS, now=now)[0]
+
+    def test_burst_is_shared_across_processes(self):
+        self.assertEqual([self.take(cache, 100.0) for cache in (self.first, self.second, self.first)], [True] * 3)
+        self.assertFalse(self.take(self.second, 100.0))
+        # Un segundo después hay un token, no una ventana nueva con la capacidad entera.
+        self.assertEqual([self.take(self.first, 101.0), self.take(self.second, 101.0)], [True, False])
+
+    def test_clear_refills_buckets(self):
+        for _ in range(3):
+            self.take(self.first, 100.0)
+        with mock.patch.object(admission, 'cache', self.second):
+            self.buckets.clear()
+        self.assertTrue(self.take(self.first, 100.0))
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.old, cls.recent, cls.other = create_resources('c1', 3)
+
+    def record(self, resource, count, timestamp):
+        trending.record_interactions([
+            UserInteraction(lti_user_id=f'u{number}', lti_context_id='c1', resource=resource, interaction_type='viewed', timestamp=timestamp)
+            for number in range(count)
+        ])
+
+    def test_old_burst_ranks_below_recent_activity(self):
+        now = timezone.now()
+        self.record(self.old, 500, now - timedelta(days=15))
+        self.record(self.recent, 5, now - timedelta(hours=1))
+        self.record(self.other, 1, now - timedelta(days=1))
+        self.assertEqual(trending.top_for_context('c1', 2), [self.recent.pk, self.other.pk])
+
+    def test_score_is_decayed_sum(self):
+        now = timezone.now()
+        half_life = timedelta(hours=24)  # TRENDING_HALF_LIFE_HOURS por defecto
+        self.record(self.old, 4, now - half_life)
+        self.record(self.old, 1, now)
+        score = TrendingScore.objects.get(resource=self.old).score
+        self.assertAlmostEqual(trending.current_score(score, now), 3.0)
+
+    def test_concurrent_insert_keeps_both_amounts(self):
+        now = timezone.now()
+        self.record(self.old, 1, now)
+        # Otro proceso creó la fila después de que este leyera las existentes.
+        with mock.patch.object(trending, '_existing', return_value=set()):
+            self.record(self.old, 2, now)
+        score = TrendingScore.objects.get(resource=self.old).score
+        self.assertAlmostEqual(trending.current_score(score, now), 3.0)
+
+
+@override_settings(RECOMMENDER_CONFIG={'RECOMMENDATION_DEADLINE_MS': 20})
+class ServingDeadlineTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(serving._fallbacks.clear)
+
+    def slow(self):
+        time.sleep(0.2)
+        return [{'title': 'tarde', 'url': '#'}]
+
+    def test_timeout_falls_back_to_trending(self):
+        resource = create_resources('c1', 1)[0]
+        trending.record_interactions([
+            UserInteraction(lti_user_id='u0', lti_context_id='c1', resource=resource, interaction_type='viewed', timestamp=timezone.now())
+        ])
+        with self.assertLogs('recommender_app.serving', 'WARNING'):
+            recommendations = serving.serve_with_deadline('c1', self.slow)
+        self.assertEqual([item['title'] for item in recommendations], [resource.title])
+
+    def test_timeout_without_popular_list_is_not_an_error(self):
+        with mock.patch.object(serving, 'cached_recommendations', side_effect=lambda *args: self.slow()):
+            with self.assertLogs('recommender_app.serving', 'WARNING'):
+                self.assertEqual(get_recommendations_from_api('u0', 'c-vacio'), [])
+
+
+class EmptyCourseTests(TestCase):
+    def test_no_resources_gives_empty_list(self):
+        self.assertEqual(compute_recommendations('u0', 'c-vacio'), [])
+        # La instantánea de curso tampoco guarda una tarjeta de aviso.
+        self.assertEqual(snapshots.popular_for_context('c-vacio', 5), [])
+
+    def test_generic_resources_are_used(self):
+        resource = EducationalResource.objects.create(resource_id='g1', title='Genérico', url='https://example.com/g1')
+        self.assertEqual(compute_recommendations('u0', 'c-vacio'), [
+            {'title': resource.title, 'url': resource.url, 'description': None, 'type': 'other'},
+        ])
+
+
+class SnapshotServingTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(snapshots._remembered_titles.clear)
+        self.resources = create_resources('c1', 6)
+        UserInteraction.objects.bulk_create([
+            UserInteraction(lti_user_id='u1', lti_context_id='c1', resource=resource, interaction_type='viewed')
+            for resource in self.resources[:3]
+        ])
+        trending.record_interactions(UserInteraction.objects.all())
+
+    def test_new_user_is_served_the_course_snapshot(self):
+        snapshots.build_snapshots()
+        course = snapshots.lookup('', 'c1')
+        self.assertTrue(course)
+        with mock.patch.object(serving, 'compute_recommendations') as compute:
+            self.assertEqual(serving.cached_recommendations('nuevo', 'c1'), course)
+            self.assertEqual(serving.cached_recommendations('u1', 'c1'), snapshots.lookup('u1', 'c1'))
+        compute.assert_not_called()
+
+    def test_user_with_history_and_no_snapshot_is_computed(self):
+        snapshots.build_snapshots()
+        # Una interacción nueva borra la instantánea del usuario.
+        snapshots.discard([('u1', 'c1')])
+        with mock.patch.object(serving, 'compute_recommendations', return_value=[]) as compute:
+            serving.cached_recommendations('u1', 'c1', 'Curso')
+        compute.assert_called_once_with('u1', 'c1', 'Curso')
+
+    def test_build_uses_titles_from_launches(self):
+        snapshots.remember_course_title('c1', 'Álgebra')
+        snapshots.remember_course_title('c-nuevo', 'Historia')
+        with self.assertNumQueries(0):
+            snapshots.remember_course_title('c1', 'Álgebra')
+        with mock.patch.object(snapshots, 'compute_recommendations', return_value=[]) as compute:
+            snapshots.build_snapshots()
+        compute.assert_any_call('u1', 'c1', 'Álgebra')
+        # Un curso sin recursos propios también tiene instantánea (arranque en frío por título).
+        compute.assert_any_call('', 'c-nuevo', 'Historia')
+        self.assertEqual(snapshots.lookup('', 'c-nuevo'), [])
+
+
+class ReplayArchivedEventsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_index_dir(self)
+        resources = create_resources('c1', 4)
+        now = timezone.now()
+        UserInteraction.objects.bulk_create([
+            UserInteraction(
+                lti_user_id=f'u{number % 3}', lti_context_id='c1', resource=resources[number % 4],
+                interaction_type='viewed', timestamp=now - timedelta(days=400 - number * 10),
+            )
+            for number in range(40)
+        ])
+
+    def derived_tables(self):
+        return (
+            sorted(ResourcePopularity.objects.values_list('resource_id', 'weight', 'interactions')),
+            sorted(ResourceCooccurrence.objects.values_list('resource_id', 'other_id', 'weight')),
+            sorted(TrendingScore.objects.values_list('resource_id', 'score')),
+        )
+
+    def test_replay_includes_archived_interactions(self):
+        call_command('replay_events', stdout=StringIO())
+        expected = self.derived_tables()
+        archived = archive.archive_before(archive.retention_cutoff(180))
+        self.assertTrue(archived)
+        self.assertLess(UserInteraction.objects.count(), 40)
+        call_command('replay_events', stdout=StringIO())
+        self.assertEqual(self.derived_tables(), expected)
+
+    def test_skip_archive_warns(self):
+        archive.archive_before(archive.retention_cutoff(180))
+        stderr = StringIO()
+        call_command('replay_events', '--skip-archive', stdout=StringIO(), stderr=stderr)
+        self.assertIn('no incluirán', stderr.getvalue())
+
+
+class ReplayAdapterTests(TestCase):
+    """Los adaptadores de los motores desplegados sobre un conjunto sintético con PKs reales."""
+
+    def setUp(self):
+        super().setUp()
+        use_temporary_index_dir(self)
+        self.addCleanup(mf_model._loaded.reset)
+        self.addCleanup(sampling.sampler.clear)
+        synthetic_catalog, synthetic_events = replay.synthetic_dataset(
+            n_events=300, n_users=20, n_contexts=2, resources_per_context=10, seed=1,
+        )
+        real_pks, self.catalog = {}, {}
+        for context_id, pks in synthetic_catalog.items():
+            resources = create_resources(context_id, len(pks))
+            real_pks.update(zip(pks, (resource.pk for resource in resources)))
+            self.catalog[context_id] = [resource.pk for resource in resources]
+        self.events = [event._replace(resource_pk=real_pks[event.resource_pk]) for event in synthetic_events]
+        UserInteraction.objects.bulk_create([
+            UserInteraction(
+                lti_user_id=event.user_id, lti_context_id=event.context_id, resource_id=event.resource_pk,
+                interaction_type=event.interaction_type, value=event.value, timestamp=event.timestamp,
+            )
+            for event in self.events
+        ])
+        item_similarity.build_item_neighbors()
+        call_command('replay_events', stdout=StringIO())
+        mf_model.train_mf_model(n_factors=4, iterations=3)
+
+    def test_adapters_replay_without_writing_tables(self):
+        cooccurrences = ResourceCooccurrence.objects.count()
+        for name in ('item_similarity', 'cooccurrence_db', 'mf_model', 'deployed'):
+            with self.subTest(engine=name):
+                report = replay.replay(self.events, replay.get_engine_class(name)(self.catalog), 5, measure_memory=False)
+                self.assertEqual(report['engine'], name)
+                self.assertEqual(report['events'], len(self.events))
+                if name in ('item_similarity', 'cooccurrence_db'):
+                    # Llevan el historial en memoria; los otros descartan todo lo que el usuario verá.
+                    self.assertGreater(report['hit_rate'], 0.0)
+                self.assertGreater(report['coverage'], 0.0)
+                self.assertLessEqual(report['coverage'], 1.0)
+        self.assertEqual(ResourceCooccurrence.objects.count(), cooccurrences)
+
+    def test_command_streams_database_events(self):
+        stdout = StringIO()
+        with mock.patch.object(replay, 'database_events', wraps=replay.database_events) as database_events:
+            call_command('replay_interactions', '--engines', 'item_similarity,cooccurrence_db', '--no-memory', stdout=stdout)
+        # Un recorrido de la tabla por motor, sin construir la lista antes.
+        self.assertEqual(database_events.call_count, 2)
+        self.assertEqual(stdout.getvalue().count(f'eventos={len(self.events)} '), 2)
+
+
+class EventLogCompactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 1)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def event(self, number):
+        return {
+            'lti_user_id': f'u{number}', 'lti_context_id': 'c1', 'resource_id': 'c1-r0',
+            'interaction_type': 'viewed', 'timestamp': timezone.now().isoformat(),
+        }
+
+    def write_segment(self, numbers, suffix=event_log.SEALED_SUFFIX, tail=b''):
+        # Segmento de este proceso: seal_abandoned no lo toca mientras siga abierto.
+        path = self.directory / f'0000000000001-{os.getpid()}{suffix}'
+        with open(path, 'ab') as segment:
+            segment.write(b''.join(json.dumps(self.event(number)).encode('utf-8') + b'\n' for number in numbers) + tail)
+        return path
+
+    def compact(self):
+        with self.assertNoLogs('recommender_app.compaction', level='ERROR'):
+            return compaction.compact(directory=self.directory)
+
+    def test_partial_last_line_is_discarded(self):
+        path = self.write_segment(range(2), tail=b'{"lti_user_id": "u2", "lti_con')
+        with self.assertLogs('recommender_app.compaction', level='WARNING') as logs:
+            self.assertEqual(compaction.compact(directory=self.directory), (2, 0))
+        self.assertIn('incompleta', logs.output[0])
+        self.assertEqual(UserInteraction.objects.count(), 2)
+        self.assertFalse(path.exists())
+        self.assertFalse(EventLogOffset.objects.exists())
+
+    def test_offset_is_committed_with_rows(self):
+        path = self.write_segment(range(3), suffix=event_log.OPEN_SUFFIX)
+        with mock.patch.object(EventLogOffset.objects, 'update_or_create', side_effect=RuntimeError('caída')):
+            with self.assertRaises(RuntimeError):
+                compaction.compact(directory=self.directory)
+        # Sin posición guardada tampoco quedan filas: al reanudar se vuelca el lote entero una vez.
+        self.assertEqual(UserInteraction.objects.count(), 0)
+        self.assertEqual(self.compact(), (3, 0))
+        self.assertEqual(EventLogOffset.objects.get(segment=path.stem).offset, path.stat().st_size)
+
+    def test_restart_does_not_insert_twice(self):
+        self.write_segment(range(3), suffix=event_log.OPEN_SUFFIX)
+        self.assertEqual(self.compact(), (3, 0))
+        self.assertEqual(self.compact(), (0, 0))
+        self.write_segment(range(3, 5), suffix=event_log.OPEN_SUFFIX)
+        self.assertEqual(self.compact(), (2, 0))
+        self.assertEqual(
+            sorted(UserInteraction.objects.values_list('lti_user_id', flat=True)), [f'u{number}' for number in range(5)],
+        )
+
+
+class TwoTierCacheSharedFileTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = temporary_cache(self)
+        self.second = TwoTierCache(self.first._path, {})
+
+    def test_add_is_atomic_across_processes(self):
+        self.assertTrue(self.first.add('candado', 'primero', timeout=60))
+        self.assertFalse(self.second.add('candado', 'segundo', timeout=60))
+        self.assertEqual(self.second.get('candado'), 'primero')
+
+    def test_incr_is_shared(self):
+        self.first.set('contador', 0, timeout=60)
+        self.assertEqual([cache.incr('contador') for cache in (self.first, self.second, self.first)], [1, 2, 3])
+        with self.assertRaises(ValueError):
+            self.second.incr('inexistente')
+
+    def test_expired_keys_are_missing(self):
+        self.first.set('breve', 'valor', timeout=0.05)
+        self.assertEqual(self.second.get('breve'), 'valor')
+        time.sleep(0.1)
+        self.assertIsNone(self.first.get('breve'))
+        self.assertIsNone(self.second.get('breve'))
+        self.assertTrue(self.second.add('breve', 'nuevo', timeout=60))
+
+    def test_cull_drops_soonest_expiring_first(self):
+        cache = temporary_cache(self, MAX_ENTRIES=50, CULL_FREQUENCY=2, L1_TIMEOUT=0)
+        cache.set('permanente', 1, timeout=None)
+        for number in range(199):
+            cache.set(f'dato-{number}', number, timeout=60 + number)
+        self.assertEqual(cache.get('permanente'), 1)
+        self.assertIsNone(cache.get('dato-0'))
+
+
+class HistoryCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        resource = create_resources('c1', 1)[0]
+        cls.now = timezone.now()
+        # Varias filas con el mismo timestamp: el id desempata.
+        cls.interactions = UserInteraction.objects.bulk_create([
+            UserInteraction(
+                lti_user_id='u0', lti_context_id='c1', resource=resource, interaction_type='viewed',
+                timestamp=cls.now - timedelta(minutes=number // 3),
+            )
+            for number in range(10)
+        ])
+
+    def test_cursor_round_trip(self):
+        cursor = history.encode_cursor(self.now, 42)
+        self.assertEqual(history.decode_cursor(cursor), (self.now, 42))
+
+    def test_invalid_cursors(self):
+        naive = timezone.make_naive(self.now).isoformat()
+        for cursor in ('no es base64!', history.encode_cursor(self.now, 1)[:-4], signing.b64_encode(b'{"t": "x", "i": 1}').decode(),
+                       signing.b64_encode(json.dumps({'t': naive, 'i': 1}).encode()).decode(),
+                       signing.b64_encode(json.dumps({'t': self.now.isoformat(), 'i': '1'}).encode()).decode()):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                history.decode_cursor(cursor)
+
+    def test_keyset_pages_follow_index_order(self):
+        pages, after = [], None
+        while True:
+            rows, cursor = history.history_page('u0', 'c1', 4, after=after)
+            pages.append([row['id'] for row in rows])
+            if cursor is None:
+                break
+            after = history.decode_cursor(cursor)
+            if len(pages) == 1:
+                # Una interacción nueva no desplaza las páginas siguientes.
+                UserInteraction.objects.create(
+                    lti_user_id='u0', lti_context_id='c1', resource=self.interactions[0].resource, interaction_type='viewed',
+                )
+        expected = [
+            interaction.pk for interaction in sorted(self.interactions, key=lambda row: (row.timestamp, row.pk), reverse=True)
+        ]
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+
+
+class FuseRankingsTests(TestCase):
+    def test_agreement_between_engines_wins(self):
+        self.assertEqual(_fuse_rankings([[1, 2, 3], [2, 4], []]), [2, 1, 4, 3])
+
+    def test_empty_rankings(self):
+        self.assertEqual(_fuse_rankings([[], []]), [])
+
+
+class ApiAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 1)
+        cls.user = get_user_model().objects.create_user('alumno', password='x')
+
+    def test_expired_token_is_forbidden(self):
+        token = make_launch_token('u0', 'c1')
+        with override_settings(RECOMMENDER_CONFIG={'LAUNCH_TOKEN_MAX_AGE': -1}):
+            for name in ('recommendations_api', 'interaction_history', 'launch_recommendations'):
+                with self.subTest(name=name):
+                    response = self.client.get(reverse(name), {'token': token})
+                    self.assertEqual(response.status_code, 403)
+                    self.assertIn('caducado', response.json()['error'])
+
+    def test_session_without_staff_needs_token(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('recommendations_api'), {'user_id': 'u0', 'context_id': 'c1'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_endpoints(self):
+        for name in ('metrics', 'export_interactions'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+                # SessionAuthentication va primero y no pide credenciales: DRF responde 403, no 401.
+                response = self.client.get(reverse(name), HTTP_AUTHORIZATION='Basic bm9lczpjbGF2ZQ==')
+                self.assertEqual(response.status_code, 403)
+                self.assertNotIn('WWW-Authenticate', response)
+                self.client.force_login(self.user)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+                self.client.logout()
+
+
+class InteractionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        resources = create_resources('c1', 2) + create_resources('c2', 1)
+        cls.start = timezone.now() - timedelta(days=10)
+        cls.interactions = UserInteraction.objects.bulk_create([
+            UserInteraction(
+                lti_user_id=f'u{number % 3}', lti_context_id=resources[number % 3].lti_context_id,
+                resource=resources[number % 3], interaction_type='viewed', value=number or None,
+                timestamp=cls.start + timedelta(days=number),
+            )
+            for number in range(9)
+        ])
+        cls.staff = get_user_model().objects.create_user('admin', password='x', is_staff=True)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def export(self, **params):
+        # Bloques pequeños para que la respuesta se reparta en varios trozos del generador.
+        with override_settings(RECOMMENDER_CONFIG={'EXPORT_CHUNK_SIZE': 2, 'EXPORT_BUFFER_BYTES': 64}):
+            response = self.client.get(reverse('export_interactions'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        return response, b''.join(chunks)
+
+    def test_csv_has_every_row_in_pk_order(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="interactions.csv"')
+        lines = body.decode('utf-8').splitlines()
+        self.assertEqual(lines[0], ','.join(export.COLUMNS))
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], [interaction.pk for interaction in self.interactions])
+
+    def test_filters(self):
+        since = self.start + timedelta(days=2)
+        until = self.start + timedelta(days=7)
+        _, body = self.export(context_id='c1', since=since.isoformat(), until=until.isoformat(), output='jsonl')
+        rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        expected = [
+            interaction for interaction in self.interactions
+            if interaction.lti_context_id == 'c1' and since <= interaction.timestamp < until
+        ]
+        self.assertEqual([row['id'] for row in rows], [interaction.pk for interaction in expected])
+        self.assertEqual(rows[0]['resource_id'], expected[0].resource.resource_id)
+
+    def test_gzip(self):
+        response, body = self.export(gzip='true', output='jsonl', context_id='c2')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="interactions-c2.jsonl.gz"')
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 3)
+
+    def test_invalid_range(self):
+        response = self.client.get(reverse('export_interactions'), {
+            'since': self.start.isoformat(), 'until': self.start.isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export_interactions')).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user('alumno', password='x'))
+        self.assertEqual(self.client.get(reverse('export_interactions')).status_code, 403)
+
+
+def create_lti_tool(issuer='https://moodle.example.com', client_id='cliente'):
+    private_pem, public_pem = lti_config._generate_key(1024)
+    tool_key = LtiToolKey.objects.create(name=f'clave-{client_id}', private_key=private_pem, public_key=public_pem)
+    return LtiTool.objects.create(
+        title='Recomendador', issuer=issuer, client_id=client_id,
+        auth_login_url=f'{issuer}/auth.php', auth_token_url=f'{issuer}/token.php',
+        key_set_url=f'{issuer}/certs.php', tool_key=tool_key, deployment_ids='["1"]',
+    )
+
+
+class LtiConfigCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tool = create_lti_tool()
+        self.tool_conf = lti_config.CachedDbToolConf()
+
+    def test_registration_is_read_once(self):
+        registration = self.tool_conf.find_registration_by_params(self.tool.issuer, 'cliente')
+        self.assertEqual(registration.get_auth_login_url(), self.tool.auth_login_url)
+        self.assertEqual(registration.get_kid(), Registration.get_jwk(self.tool.tool_key.public_key)['kid'])
+        with self.assertNumQueries(0):
+            self.tool_conf.find_registration_by_params(self.tool.issuer, 'cliente')
+            self.assertIsNotNone(self.tool_conf.find_deployment_by_params(self.tool.issuer, '1', 'cliente'))
+            self.assertIsNone(self.tool_conf.find_deployment_by_params(self.tool.issuer, '2', 'cliente'))
+
+    def test_saving_the_tool_invalidates_cached_config(self):
+        self.tool_conf.find_registration_by_params(self.tool.issuer, 'cliente')
+        # p. ej. un cambio desde el admin: la señal sube la generación.
+        self.tool.auth_login_url = 'https://moodle.example.com/otra-auth.php'
+        self.tool.save()
+        registration = self.tool_conf.find_registration_by_params(self.tool.issuer, 'cliente')
+        self.assertEqual(registration.get_auth_login_url(), 'https://moodle.example.com/otra-auth.php')
+
+    def test_platform_keys_are_fetched_once_per_kid(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=1024)
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('ascii')
+        jwk = Registration.get_jwk(public_pem)
+        session = mock.Mock()
+        session.get.return_value.json.return_value = {'keys': [jwk]}
+        key_set = lti_config.PlatformKeySet()
+        url = 'https://moodle.example.com/certs.php'
+
+        self.assertIsNotNone(key_set.public_key(url, jwk['kid'], 'RS256', session))
+        key_set.public_key(url, jwk['kid'], 'RS256', session)
+        self.assertEqual(session.get.call_count, 1)
+        # Un kid desconocido descarga de nuevo, pero no más de una vez por intervalo.
+        for _ in range(2):
+            with self.assertRaises(LtiException):
+                key_set.public_key(url, 'inventado', 'RS256', session)
+        self.assertEqual(session.get.call_count, 1)
+        with override_settings(RECOMMENDER_CONFIG={'LTI_JWKS_MIN_REFRESH_INTERVAL': 0}):
+            with self.assertRaises(LtiException):
+                key_set.public_key(url, 'inventado', 'RS256', session)
+        self.assertEqual(session.get.call_count, 2)
+
+
+class ToolJwksTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        # El documento serializado vive en memoria del proceso: cada prueba empieza sin él.
+        patcher = mock.patch.object(lti_config, '_jwks_document', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tool = create_lti_tool()
+
+    def kids(self):
+        return {key['kid'] for key in self.client.get(reverse('lti_jwks')).json()['keys']}
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(reverse('lti_jwks'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('lti_jwks'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(reverse('lti_jwks'), HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_rotation_keeps_old_kid_until_pruned(self):
+        old_kid = Registration.get_jwk(self.tool.tool_key.public_key)['kid']
+        etag = self.client.get(reverse('lti_jwks'))['ETag']
+
+        new_key = lti_config.rotate_tool_key([self.tool], key_size=1024)
+        new_kid = Registration.get_jwk(new_key.public_key)['kid']
+        self.tool.refresh_from_db()
+        self.assertEqual(self.tool.tool_key, new_key)
+        response = self.client.get(reverse('lti_jwks'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({key['kid'] for key in response.json()['keys']}, {old_kid, new_kid})
+        # La herramienta firma ya con la clave nueva.
+        registration = lti_config.CachedDbToolConf().find_registration_by_params(self.tool.issuer, 'cliente')
+        self.assertEqual(registration.get_kid(), new_kid)
+
+        # Dentro del solapamiento no se borra nada.
+        self.assertEqual(lti_config.prune_retired_keys(48), [])
+        self.assertEqual(self.kids(), {old_kid, new_kid})
+        self.assertEqual(lti_config.prune_retired_keys(0), ['clave-cliente'])
+        self.assertEqual(self.kids(), {new_kid})
+
+
+class RosterSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 3)
+
+    def setUp(self):
+        super().setUp()
+        self.members = nrps_standin.standin_members(7)
+        self.server = nrps_standin.make_server(0, 'c1', self.members, page_size=3)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        )
+        self.registration = (
+            Registration().set_issuer('https://lms.example.com').set_client_id('herramienta')
+            .set_auth_token_url(f'http://127.0.0.1:{self.server.server_port}/token')
+            .set_tool_private_key(private_key.decode('ascii'))
+        )
+
+    def sync(self):
+        nrps = NamesRolesProvisioningService(
+            ServiceConnector(self.registration),
+            {'context_memberships_url': f'http://127.0.0.1:{self.server.server_port}/members'},
+        )
+        return roster.prefetch_course(nrps, 'c1')
+
+    def enrolled(self):
+        return set(CourseMembership.objects.filter(lti_context_id='c1').values_list('lti_user_id', flat=True))
+
+    def test_sync_follows_pages_and_reuses_token(self):
+        self.assertEqual(self.sync(), (7, 7))
+        # Ocho miembros en páginas de tres, con un solo token; el profesor no se guarda.
+        self.assertEqual(self.server.token_requests, 1)
+        self.assertEqual(self.enrolled(), {f'standin-student-{number}' for number in range(7)})
+
+    def test_users_who_left_are_removed(self):
+        self.sync()
+        synced_at = CourseMembership.objects.get(lti_user_id='standin-student-0').synced_at
+        del self.members[-1]
+        self.members[1]['status'] = 'Inactive'
+        self.assertEqual(self.sync(), (5, 5))
+        self.assertEqual(self.enrolled(), {f'standin-student-{number}' for number in range(1, 6)})
+        self.assertGreater(CourseMembership.objects.get(lti_user_id='standin-student-1').synced_at, synced_at)
+
+    def test_truncated_roster_removes_nobody(self):
+        self.sync()
+        with override_settings(RECOMMENDER_CONFIG={'ROSTER_MAX_MEMBERS': 4}):
+            self.assertEqual(self.sync(), (3, 3))
+        self.assertEqual(len(self.enrolled()), 7)
+
+
+@override_settings(RECOMMENDER_CONFIG={'RATE_LIMIT_USER_RATE': 1, 'RATE_LIMIT_USER_BURST': 3})
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 1)
+
+    def setUp(self):
+        super().setUp()
+        admission.buckets.clear()
+        self.addCleanup(admission.buckets.clear)
+
+    def post(self, count, user_id='u0'):
+        events = [
+            {'lti_user_id': user_id, 'lti_context_id': 'c1', 'resource_id': 'c1-r0', 'interaction_type': 'viewed'}
+        ] * count
+        return self.client.post(reverse('record_interactions_bulk'), events, content_type='application/json')
+
+    def test_exhausted_bucket_is_rejected_with_retry_after(self):
+        self.assertEqual(self.post(3).status_code, 201)
+        response = self.post(1)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        # El rechazo no gasta tokens de otros usuarios ni guarda nada.
+        self.assertEqual(self.post(1, user_id='u1').status_code, 201)
+        self.assertEqual(UserInteraction.objects.count(), 4)
+
+    def test_batch_larger_than_burst_is_never_admitted(self):
+        response = self.post(4)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_overloaded_process_sheds_requests(self):
+        with mock.patch.object(admission, '_in_flight', 16):
+            response = self.post(1)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(UserInteraction.objects.exists())
+
+    def test_process_buckets_refill(self):
+        costs = [(('user', 'u0'), 2, 1.0, 3)]
+        self.assertTrue(admission.buckets.take(costs, now=10.0)[0])
+        self.assertEqual(admission.buckets.take(costs, now=10.5), (False, 0.5, ('user', 'u0')))
+        self.assertTrue(admission.buckets.take(costs, now=11.0)[0])
+
+    @override_settings(RECOMMENDER_CONFIG={'RATE_LIMIT_BACKEND': 'cache', 'RATE_LIMIT_USER_RATE': 1, 'RATE_LIMIT_USER_BURST': 3})
+    def test_shared_backend_rejects_through_endpoint(self):
+        with mock.patch.object(admission, 'cache', temporary_cache(self)):
+            self.assertEqual(self.post(3).status_code, 201)
+            response = self.post(1)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class CompressedPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 2)
+
+    def post(self, name, body, content_type, **headers):
+        return self.client.post(reverse(name), body, content_type=content_type, **headers)
+
+    def events(self):
+        return [
+            {'lti_user_id': 'u0', 'lti_context_id': 'c1', 'resource_id': f'c1-r{number}', 'interaction_type': 'viewed'}
+            for number in range(2)
+        ]
+
+    def test_gzip_json_round_trip(self):
+        body = gzip.compress(json.dumps(self.events()).encode('utf-8'))
+        response = self.post('record_interactions_bulk', body, 'application/json', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+
+    def test_msgpack_envelope_round_trip(self):
+        envelope = {'u': 'u0', 'c': 'c1', 'e': [{'r': 'c1-r0', 't': 0}, {'r': 'c1-r1', 't': 4, 'v': 30.0}]}
+        for content_type in ('application/msgpack', 'application/x-msgpack'):
+            with self.subTest(content_type=content_type):
+                response = self.post(
+                    'record_interactions_bulk', gzip.compress(msgpack.packb(envelope)), content_type,
+                    HTTP_CONTENT_ENCODING='gzip',
+                )
+                self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(UserInteraction.objects.values_list('interaction_type', 'value')),
+            [('completed', 30.0), ('completed', 30.0), ('viewed', None), ('viewed', None)],
+        )
+
+    def test_boolean_type_code_is_rejected(self):
+        envelope = {'u': 'u0', 'c': 'c1', 'e': [{'r': 'c1-r0', 't': True}, {'r': 'c1-r1', 't': 1}]}
+        with self.assertLogs('recommender_app.views', level='WARNING'):
+            response = self.post('record_interactions_bulk', msgpack.packb(envelope), 'application/msgpack')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0])
+        self.assertEqual(list(UserInteraction.objects.values_list('interaction_type', flat=True)), ['clicked'])
+
+    def test_malformed_bodies(self):
+        cases = [
+            (b'no es gzip', 'application/json', {'HTTP_CONTENT_ENCODING': 'gzip'}),
+            (json.dumps(self.events()).encode(), 'application/json', {'HTTP_CONTENT_ENCODING': 'br'}),
+            (b'\xc1\xc1', 'application/msgpack', {}),
+        ]
+        for body, content_type, headers in cases:
+            with self.subTest(body=body, headers=headers):
+                self.assertEqual(self.post('record_interactions_bulk', body, content_type, **headers).status_code, 400)
+
+    @override_settings(RECOMMENDER_CONFIG={'MAX_DECOMPRESSED_BODY_BYTES': 1024})
+    def test_oversized_decompressed_body(self):
+        body = gzip.compress(json.dumps(self.events() * 50).encode('utf-8'))
+        self.assertLess(len(body), 1024)
+        response = self.post('record_interactions_bulk', body, 'application/json', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1024', response.json()['detail'])
+        self.assertFalse(UserInteraction.objects.exists())
+
+    def test_beacon_accepts_text_plain(self):
+        response = self.post('record_interactions_beacon', json.dumps(self.events()), 'text/plain;charset=UTF-8')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(UserInteraction.objects.count(), 2)
+        self.assertEqual(self.post('record_interactions_beacon', '{"roto', 'text/plain').status_code, 400)
+        self.assertEqual(self.post('record_interactions_beacon', '"texto"', 'text/plain').status_code, 400)
+
+
+class BulkIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_resources('c1', 2)
+
+    def post(self, payload, rejected=False):
+        if not rejected:
+            return self.client.post(reverse('record_interactions_bulk'), payload, content_type='application/json')
+        with self.assertLogs('recommender_app.views', level='WARNING'):
+            return self.client.post(reverse('record_interactions_bulk'), payload, content_type='application/json')
+
+    def event(self, resource_id='c1-r0', **fields):
+        return dict({'lti_user_id': 'u0', 'lti_context_id': 'c1', 'resource_id': resource_id, 'interaction_type': 'viewed'}, **fields)
+
+    def test_mixed_batch_reports_each_rejected_event(self):
+        events = [self.event(), 'no es un objeto', self.event('inexistente'), self.event('c1-r1', value='mucho'), self.event('c1-r1')]
+        response = self.post({'events': events}, rejected=True)
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3])
+        self.assertIn('non_field_errors', body['errors'][0]['errors'])
+        self.assertIn('resource_id', body['errors'][1]['errors'])
+        self.assertIn('value', body['errors'][2]['errors'])
+        self.assertEqual(
+            sorted(UserInteraction.objects.values_list('resource__resource_id', flat=True)), ['c1-r0', 'c1-r1'],
+        )
+
+    def test_all_valid_and_all_invalid(self):
+        self.assertEqual(self.post([self.event(), self.event('c1-r1')]).status_code, 201)
+        response = self.post([self.event('inexistente')], rejected=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(self.post({'no': 'es un lote'}).status_code, 400)
+
+    @override_settings(RECOMMENDER_CONFIG={'BULK_INTERACTIONS_MAX': 3})
+    def test_batch_size_limit(self):
+        self.assertEqual(self.post([self.event()] * 3).status_code, 201)
+        response = self.post([self.event()] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('3', response.json()['error'])
+        self.assertEqual(UserInteraction.objects.count(), 3)
+
+
+class ResourceLookupTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.resource = create_resources('c1', 1)[0]
+
+    def test_levels_and_negative_answers(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(resource_lookup.lookup('c1-r0', 'c1'), self.resource.pk)
+            self.assertIsNone(resource_lookup.lookup('inexistente', 'c1'))
+        with self.assertNumQueries(0):
+            self.assertEqual(resource_lookup.lookup('c1-r0', 'c1'), self.resource.pk)
+            self.assertIsNone(resource_lookup.lookup('inexistente', 'c1'))
+            # Otro proceso: L1 vacío, responde L2.
+            resource_lookup.clear()
+            self.assertEqual(resource_lookup.lookup_many([('c1-r0', 'c1')]), {('c1-r0', 'c1'): self.resource.pk})
+
+    def test_changes_invalidate_pairs(self):
+        resource_lookup.lookup('c1-r0', 'c1')
+        self.resource.resource_id = 'renombrado'
+        self.resource.save()
+        self.assertIsNone(resource_lookup.lookup('c1-r0', 'c1'))
+        self.assertEqual(resource_lookup.lookup('renombrado', 'c1'), self.resource.pk)
+        self.resource.delete()
+        self.assertIsNone(resource_lookup.lookup('renombrado', 'c1'))
+
+
+class DeletedResourceIngestTests(TransactionTestCase):
+    # Las claves foráneas de SQLite se comprueban al confirmar: hace falta una transacción real.
+
+    def setUp(self):
+        cache.clear()
+        resource_lookup.clear()
+        self.kept, self.deleted = create_resources('c1', 2)
+
+    def test_stale_pk_from_another_process_rejects_only_its_events(self):
+        pair, deleted_pk = ('c1-r1', 'c1'), self.deleted.pk
+        resource_lookup.lookup_many([('c1-r0', 'c1'), pair])
+        self.deleted.delete()
+        # El borrado se hizo en otro proceso: este conserva la PK en su L1.
+        resource_lookup._l1_set(pair, deleted_pk, time.monotonic())
+        events = [
+            {'lti_user_id': 'u0', 'lti_context_id': 'c1', 'resource_id': resource_id, 'interaction_type': 'viewed'}
+            for resource_id in ('c1-r0', 'c1-r1', 'c1-r0')
+        ]
+        with self.assertLogs('recommender_app.views', level='WARNING'):
+            response = self.client.post(reverse('record_interactions_bulk'), events, content_type='application/json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+        self.assertEqual(UserInteraction.objects.count(), 2)
+        self.assertIsNone(resource_lookup.lookup(*pair))
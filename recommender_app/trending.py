@@ -0,0 +1,135 @@
+# lti_recommender_project/recommender_app/trending.py
+
+"""
+"Tendencias en este curso" con contadores de decaimiento exponencial.
+
+Cada interacción actualiza una sola fila TrendingScore (curso, recurso). Nunca se hace un
+GROUP BY sobre UserInteraction.
+
+La puntuación no se guarda decaída hasta el último evento, sino referida a un instante fijo
+(EPOCH) y en escala logarítmica:
+
+    score = log(Σ peso_i · e^(λ·(t_i − EPOCH)))
+
+La puntuación actual es e^(score − λ·(ahora − EPOCH)): el mismo factor para todas las filas,
+así que el orden de `score` es el orden actual y el top-N de un curso es una lectura
+LIMIT N del índice (lti_context_id, -score). Sumar un evento es un logaddexp, que se hace en
+la propia base de datos (expresión F()) sin leer la fila.
+
+λ depende de TRENDING_HALF_LIFE_HOURS: si se cambia, hay que recalcular las tendencias con
+replay_events.
+"""
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .conf import get_setting
+from .item_similarity import interaction_weight
+from .models import TrendingScore
+
+# Instante de referencia de las puntuaciones guardadas.
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _decay_rate():
+    return math.log(2) / (get_setting('TRENDING_HALF_LIFE_HOURS') * 3600.0)
+
+
+def _log_add(a, b):
+    """log(e^a + e^b) sin desbordamiento."""
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def log_amount(amount, timestamp, rate=None):
+    """Peso `amount` ocurrido en `timestamp`, en la escala de las puntuaciones guardadas."""
+    rate = _decay_rate() if rate is None else rate
+    return math.log(amount) + rate * (timestamp - EPOCH).total_seconds()
+
+
+def current_score(score, now=None, rate=None):
+    """Puntuación guardada convertida en la suma de pesos decaída hasta `now`."""
+    rate = _decay_rate() if rate is None else rate
+    return math.exp(score - rate * ((now or timezone.now()) - EPOCH).total_seconds())
+
+
+def _add(context_id, resource_pk, score, timestamp):
+    """Suma `score` (escala log) a una fila existente; devuelve las filas actualizadas (0 o 1)."""
+    score = Value(score)
+    return TrendingScore.objects.filter(lti_context_id=context_id, resource_id=resource_pk).update(
+        score=Greatest(F('score'), score) + Ln(Value(1.0) + Exp(-Abs(F('score') - score))),
+        updated_at=Greatest(F('updated_at'), Value(timestamp)),
+    )
+
+
+def _existing(keys):
+    """Los pares (curso, recurso) de `keys` que ya tienen fila."""
+    return set(TrendingScore.objects.filter(
+        lti_context_id__in={context_id for context_id, _ in keys},
+        resource_id__in={resource_pk for _, resource_pk in keys},
+    ).values_list('lti_context_id', 'resource_id'))
+
+
+def record_interaction(interaction):
+    """Suma la interacción a la tendencia de su recurso en su curso (una fila, O(1))."""
+    record_interactions([interaction])
+
+
+def record_interactions(interactions):
+    """
+    Suma un lote de interacciones a las tendencias. Las de un mismo (curso, recurso) se
+    combinan en memoria, así que cada fila afectada se escribe una sola vez.
+    """
+    rate = _decay_rate()
+    combined = {}  # (curso, recurso) -> (puntuación en escala log, último instante)
+    for interaction in interactions:
+        amount = interaction_weight(interaction.interaction_type, interaction.value)
+        if amount <= 0:
+            continue
+        key = (interaction.lti_context_id, interaction.resource_id)
+        timestamp = interaction.timestamp or timezone.now()
+        score = log_amount(amount, timestamp, rate)
+        if key in combined:
+            previous, last = combined[key]
+            combined[key] = (_log_add(previous, score), max(last, timestamp))
+        else:
+            combined[key] = (score, timestamp)
+    if not combined:
+        return
+
+    with transaction.atomic():
+        existing = _existing(combined)
+        for key in existing & combined.keys():
+            _add(*key, *combined[key])
+        new = {key: value for key, value in combined.items() if key not in existing}
+        if not new:
+            return
+        try:
+            with transaction.atomic():
+                TrendingScore.objects.bulk_create([
+                    TrendingScore(lti_context_id=context_id, resource_id=resource_pk, score=score, updated_at=timestamp)
+                    for (context_id, resource_pk), (score, timestamp) in new.items()
+                ])
+        except IntegrityError:
+            # Otro proceso ha creado alguna de las filas entre la lectura y la inserción:
+            # se suman fila a fila para no perder ninguna interacción.
+            for (context_id, resource_pk), (score, timestamp) in new.items():
+                if not _add(context_id, resource_pk, score, timestamp):
+                    TrendingScore.objects.create(
+                        lti_context_id=context_id, resource_id=resource_pk, score=score, updated_at=timestamp,
+                    )
+
+
+def top_for_context(context_id, limit):
+    """
+    PKs de los `limit` recursos con más tendencia en el curso, de mayor a menor puntuación
+    actual. Una lectura LIMIT del índice (lti_context_id, -score).
+    """
+    return list(
+        TrendingScore.objects.filter(lti_context_id=context_id)
+        .order_by('-score').values_list('resource_id', flat=True)[:limit]
+    )
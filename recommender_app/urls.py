@@ -6,6 +6,14 @@ from . import views
 urlpatterns = [
     path('lti/login/', views.lti_login, name='lti_login'),
     path('lti/launch/', views.lti_launch, name='lti_launch'),
+    path('lti/launch/recommendations/', views.launch_recommendations, name='launch_recommendations'),
     path('lti/jwks/', views.jwks, name='lti_jwks'),
     path('api/interactions/', views.record_interaction, name='record_interaction'),
+    path('api/interactions/bulk/', views.record_interactions_bulk, name='record_interactions_bulk'),
+    path('api/interactions/history/', views.interaction_history, name='interaction_history'),
+    path('api/interactions/export/', views.export_interactions, name='export_interactions'),
+    path('api/interactions/beacon/', views.record_interactions_beacon, name='record_interactions_beacon'),
+    path('api/recommendations/', views.recommendations_api, name='recommendations_api'),
+    path('api/resources/<int:pk>/similar/', views.resource_similar, name='resource_similar'),
+    path('api/metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,27 +1,43 @@
 # lti_recommender_project/recommender_app/views.py
 
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
+import base64
+import binascii
 import json
 import logging
 from django.conf import settings
+from django.core import signing
+from . import admission, export, history, ingest, lti_config, metrics, rec_cache, resource_lookup, roster, serving, snapshots
+from .conf import get_setting
 from .models import EducationalResource
+from .recommendations import DEFAULT_FIELDS, ranked_resource_pks, recommendation_page, similar_resources
 
 # Importaciones de PyLTI1p3
-from pylti1p3.contrib.django import DjangoMessageLaunch, DjangoOIDCLogin, DjangoDbToolConf
+from pylti1p3.contrib.django import DjangoOIDCLogin
 from pylti1p3.contrib.django import DjangoCacheDataStorage
 from pylti1p3.exception import LtiException # Importa LtiException para un manejo de errores más específico
 # Importaciones para la API (Django REST Framework)
 from rest_framework import status 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response 
-from .serializers import UserInteractionSerializer 
+from rest_framework.utils.urls import replace_query_param
+from .parsers import INTERACTION_PARSERS, BeaconJSONParser
+from .serializers import (
+    HistoryQuerySerializer, InteractionExportQuerySerializer, RecommendationQuerySerializer,
+    SimilarResourcesQuerySerializer, UserInteractionSerializer,
+)
 logger = logging.getLogger(__name__)
 
-# Inicialización global de tool_conf usando DjangoDbToolConf
-# Esta instancia se encarga de cargar la configuración de la herramienta desde la base de datos de Django.
-tool_conf = DjangoDbToolConf()
+# Inicialización global de tool_conf.
+# Esta instancia carga la configuración de la herramienta desde la base de datos de Django y la
+# mantiene en memoria hasta que caduca o se edita (ver lti_config.py).
+tool_conf = lti_config.CachedDbToolConf()
 
 @csrf_exempt
 def lti_login(request):
@@ -68,8 +84,9 @@ def lti_launch(request):
         # Inicializa el almacenamiento de datos de lanzamiento usando el caché de Django.
         launch_data_storage = DjangoCacheDataStorage(cache_name='default')
 
-        # Crea una instancia de DjangoMessageLaunch para manejar el lanzamiento LTI.
-        message_launch = DjangoMessageLaunch(request, tool_conf, launch_data_storage=launch_data_storage)
+        # Crea una instancia de DjangoMessageLaunch para manejar el lanzamiento LTI
+        # (con las claves públicas de la plataforma cacheadas por kid).
+        message_launch = lti_config.CachedMessageLaunch(request, tool_conf, launch_data_storage=launch_data_storage)
 
         # Valida el lanzamiento LTI y obtiene los datos decodificados.
         # Si la validación falla, se lanzará una LtiException.
@@ -101,8 +118,18 @@ def lti_launch(request):
         platform_name = tool_platform_claim.get("name", "N/A")
         # --- FIN DE EXTRACCIÓN DE DATOS ---
 
-        # Lógica para obtener recomendaciones (aquí se llama a la función de ejemplo).
-        recommendations = get_recommendations_from_api(user_id, context_id)
+        # Para el arranque en frío de build_recommendations (solo escribe si el título cambia).
+        try:
+            snapshots.remember_course_title(context_id, course_title)
+        except Exception as e:
+            logger.error(f"No se pudo guardar el título del curso {context_id}: {e}")
+
+        # Si lanza un profesor, precarga en segundo plano las recomendaciones de sus estudiantes.
+        if message_launch.check_teacher_access() and message_launch.has_nrps():
+            try:
+                roster.schedule_prefetch(message_launch.get_nrps(), context_id, course_title)
+            except Exception as e:
+                logger.error(f"No se pudo encolar la precarga del curso {context_id}: {e}")
 
         # Prepara los datos para pasar a la plantilla.
         context = {
@@ -114,10 +141,18 @@ def lti_launch(request):
             'course_title': course_title,
             'activity_title': activity_title,
             'platform_name': platform_name,
-            'recommendations': recommendations,
-            'raw_lti_data': json.dumps(launch_data, indent=2, ensure_ascii=False), # Datos brutos para depuración
         }
 
+        if get_setting('DEFERRED_LAUNCH'):
+            # La página sale ya; el navegador pide las recomendaciones con un token de corta duración.
+            context['launch_token'] = make_launch_token(user_id, context_id, course_title)
+        else:
+            # Lógica para obtener recomendaciones (aquí se llama a la función de ejemplo).
+            context['recommendations'] = get_recommendations_from_api(user_id, context_id, course_title)
+
+        if get_setting('LAUNCH_DEBUG_DATA'):
+            context['raw_lti_data'] = json.dumps(launch_data, indent=2, ensure_ascii=False) # Datos brutos para depuración
+
         # Renderiza la plantilla con las recomendaciones obtenidas.
         return render(request, 'recommender_app/recommendations.html', context)
 
@@ -130,44 +165,68 @@ def lti_launch(request):
         logger.exception("Unexpected error during LTI launch:")
         return render(request, 'recommender_app/error.html', {'message': f'Error inesperado durante el lanzamiento LTI: {e}'})
 
-def get_recommendations_from_api(user_id, context_id):
+LAUNCH_TOKEN_SALT = 'recommender_app.launch'
+
+
+def make_launch_token(user_id, context_id, course_title=None):
     """
-    Función para obtener recomendaciones reales consultando la base de datos de EducationalResource.
-    Por ahora, filtra recursos por el ID del curso.
+    Token firmado (con SECRET_KEY) que autoriza a pedir las recomendaciones de un lanzamiento
+    ya validado. Caduca a los LAUNCH_TOKEN_MAX_AGE segundos.
+    """
+    return signing.dumps({'u': user_id, 'c': context_id, 't': course_title}, salt=LAUNCH_TOKEN_SALT, compress=True)
+
+
+def read_launch_token(token):
+    """Devuelve (user_id, context_id, course_title) o lanza signing.BadSignature (o SignatureExpired)."""
+    data = signing.loads(token, salt=LAUNCH_TOKEN_SALT, max_age=get_setting('LAUNCH_TOKEN_MAX_AGE'))
+    return data['u'], data['c'], data.get('t')
+
+
+def launch_from_request(request):
+    """
+    Lee el token del lanzamiento del parámetro "token".
+    Devuelve ((user_id, context_id, course_title), None) o, si falta, no es válido o ha
+    caducado, (None, respuesta 403).
     """
-    recommended_resources = []
     try:
-        # Filtra los recursos por el lti_context_id del curso actual
-        # Asegúrate de que los recursos que agregaste en el admin tengan el mismo lti_context_id
-        # que el curso de Moodle desde el que estás lanzando (ej. "2" para "base de datos I").
-        resources_from_db = EducationalResource.objects.filter(lti_context_id=context_id).order_by('?')[:5] # Limita a 5, orden aleatorio
-
-        if not resources_from_db.exists():
-            logger.info(f"No se encontraron recursos para el contexto LTI: {context_id}. Intentando buscar recursos genéricos.")
-            # Si no hay recursos específicos del curso, busca algunos recursos sin contexto LTI asignado
-            resources_from_db = EducationalResource.objects.filter(lti_context_id__isnull=True).order_by('?')[:5]
-            if not resources_from_db.exists():
-                logger.info("No se encontraron recursos genéricos.")
-                return [
-                    {"title": "No hay recomendaciones disponibles para este curso. Intenta añadir más recursos.", "url": "#"}
-                ]
-
-        for resource in resources_from_db:
-            recommended_resources.append({
-                "title": resource.title,
-                "url": resource.url,
-                "description": resource.description, # Puedes usar la descripción en la plantilla si la modificas
-                "type": resource.resource_type,      # Puedes usar el tipo en la plantilla
-            })
+        return read_launch_token(request.query_params.get('token', '')), None
+    except signing.SignatureExpired:
+        return None, Response({'error': 'El lanzamiento ha caducado. Vuelve a abrir la actividad.'}, status=status.HTTP_403_FORBIDDEN)
+    except signing.BadSignature:
+        return None, Response({'error': 'Token de lanzamiento no válido.'}, status=status.HTTP_403_FORBIDDEN)
+
+
+@api_view(['GET'])
+def launch_recommendations(request):
+    """
+    Endpoint que usa la página del lanzamiento diferido para cargar las recomendaciones.
+    Espera el token del lanzamiento en el parámetro "token".
+    """
+    launch, forbidden = launch_from_request(request)
+    if forbidden is not None:
+        return forbidden
+    user_id, context_id, course_title = launch
+    return Response({'recommendations': get_recommendations_from_api(user_id, context_id, course_title)})
+
 
+def get_recommendations_from_api(user_id, context_id, course_title=None):
+    """
+    Función para obtener recomendaciones reales consultando la base de datos de EducationalResource.
+    Se sirven desde la caché de recomendaciones, la instantánea precalculada o el cálculo en
+    vivo (ver serving.cached_recommendations), con un presupuesto de latencia: si se supera,
+    se sirve la lista popular del curso (ver serving.py).
+    """
+    try:
+        recommendations = serving.serve_with_deadline(
+            context_id, lambda: serving.cached_recommendations(user_id, context_id, course_title)
+        )
+        if recommendations is not None:
+            return recommendations
     except Exception as e:
         logger.error(f"Error al obtener recomendaciones de la base de datos: {e}")
-        # En caso de error, devuelve un conjunto de recomendaciones de fallback
-        return [
-            {"title": "Error al cargar recomendaciones desde la base de datos.", "url": "#"}
-        ]
-    
-    return recommended_resources
+    # Sin recomendaciones ni lista popular (p. ej. un lanzamiento lento en un curso sin
+    # actividad): lista vacía, que la página muestra como "no hay recomendaciones por ahora".
+    return []
 
 
 @csrf_exempt
@@ -176,14 +235,25 @@ def jwks(request):
     Endpoint JWKS (JSON Web Key Set).
     Moodle usará esta URL para obtener las claves públicas de tu herramienta
     y verificar la firma de los JWTs que tu herramienta le envíe.
+    El documento se serializa una vez por rotación de claves y se sirve desde memoria, con
+    ETag y Cache-Control; una consulta con If-None-Match que coincide recibe un 304.
     """
     try:
-        # Renderiza el conjunto de claves públicas de la herramienta.
-        return DjangoJwks.render_jwks(tool_conf)
+        body, etag = lti_config.jwks_document()
     except Exception as e:
         logger.exception("Error generating JWKS:")
         return render(request, 'recommender_app/error.html', {'message': f'Error al generar JWKS: {e}'})
+
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=get_setting('JWKS_MAX_AGE'))
+    # Con If-None-Match coincidente devuelve un 304 con los mismos ETag y Cache-Control.
+    return get_conditional_response(request, etag=etag, response=response)
+
+
 @api_view(['POST'])
+@parser_classes(INTERACTION_PARSERS + (FormParser, MultiPartParser))
+@admission.limit_interactions(ingest.events_from_payload)
 def record_interaction(request):
     """
     Endpoint API para registrar interacciones de usuarios con recursos educativos.
@@ -193,6 +263,14 @@ def record_interaction(request):
 
     serializer = UserInteractionSerializer(data=request.data)
     if serializer.is_valid():
+        if ingest.log_mode():
+            # Se acepta en el registro de eventos; el compactor comprueba el recurso y la guarda.
+            try:
+                ingest.enqueue([serializer.validated_data])
+            except Exception as e:
+                logger.error(f"Error al añadir la interacción al registro de eventos: {e}")
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return Response(serializer.validated_data, status=status.HTTP_202_ACCEPTED)
         try:
             serializer.save()
             logger.info("Interacción guardada exitosamente.")
@@ -203,3 +281,243 @@ def record_interaction(request):
     else:
         logger.error(f"Datos de interacción inválidos: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@parser_classes(INTERACTION_PARSERS)
+@admission.limit_interactions(ingest.events_from_payload)
+def record_interactions_bulk(request):
+    """
+    Endpoint API para registrar un lote de interacciones en una sola petición.
+    Espera una lista JSON de eventos (o {"events": [...]}) con los mismos campos que record_interaction.
+    También acepta MessagePack con códigos cortos y cuerpos con gzip (ver parsers.py).
+    Responde 201 si se guardan todos, 207 si solo algunos y 400 si ninguno; "errors" indica
+    la posición de cada evento rechazado y su motivo. En modo 'log' responde 202 con los aceptados.
+    """
+    events = ingest.events_from_payload(request.data)
+    if events is None:
+        return Response({'error': 'Se esperaba una lista de eventos.'}, status=status.HTTP_400_BAD_REQUEST)
+    max_events = get_setting('BULK_INTERACTIONS_MAX')
+    if len(events) > max_events:
+        return Response({'error': f'Como máximo {max_events} eventos por petición.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if ingest.log_mode():
+        try:
+            accepted, errors = ingest.enqueue_interactions(events)
+        except Exception as e:
+            logger.error(f"Error al añadir el lote al registro de eventos: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(
+            {'accepted': accepted, 'errors': errors},
+            status=status.HTTP_202_ACCEPTED if accepted else status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        interactions, errors = ingest.record_interactions(events)
+    except Exception as e:
+        logger.error(f"Error al guardar el lote de interacciones: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if errors:
+        logger.warning(f"Lote de interacciones: {len(errors)} de {len(events)} eventos rechazados.")
+    if not errors:
+        response_status = status.HTTP_201_CREATED
+    elif interactions:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response({'created': len(interactions), 'errors': errors}, status=response_status)
+
+
+@api_view(['POST'])
+@parser_classes(INTERACTION_PARSERS + (BeaconJSONParser,))
+@admission.limit_interactions(ingest.events_from_payload)
+def record_interactions_beacon(request):
+    """
+    Endpoint para navigator.sendBeacon(): acepta un evento o un lote (JSON, text/plain con
+    JSON o MessagePack, opcionalmente con gzip) y responde 204 sin cuerpo. El navegador no
+    lee la respuesta, así que los eventos rechazados solo se registran en el log.
+    """
+    events = ingest.events_from_payload(request.data)
+    if events is None or len(events) > get_setting('BULK_INTERACTIONS_MAX'):
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    try:
+        if ingest.log_mode():
+            _, errors = ingest.enqueue_interactions(events)
+        else:
+            _, errors = ingest.record_interactions(events)
+    except Exception as e:
+        logger.error(f"Error al registrar interacciones de sendBeacon: {e}")
+        return Response(status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if errors:
+        logger.warning(f"sendBeacon: {len(errors)} de {len(events)} eventos rechazados: {errors[:3]}")
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Endpoint API con los contadores internos de este proceso (cachés, degradaciones, rechazos...).
+    Solo para usuarios staff.
+    """
+    data = metrics.snapshot()
+    data.update(resource_lookup.stats())
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_interactions(request):
+    """
+    Descarga de interacciones en streaming (CSV o JSON Lines, opcionalmente con gzip).
+    Parámetros: context_id, since, until (ISO 8601), output ("csv" o "jsonl") y gzip.
+    Solo para usuarios staff.
+    """
+    query = InteractionExportQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = query.validated_data
+    interactions = export.interactions_queryset(params.get('context_id'), params.get('since'), params.get('until'))
+
+    output, compress = params['output'], params['gzip']
+    response = StreamingHttpResponse(
+        export.stream(interactions, output, compress),
+        content_type='application/gzip' if compress else export.FORMATS[output][0],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export.filename(output, compress, params.get("context_id"))}"'
+    return response
+
+
+def _encode_cursor(position, last_pk):
+    raw = json.dumps({'r': position, 'p': last_pk}, separators=(',', ':')).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Devuelve (posición en la lista clasificada, última PK del catálogo) o lanza ValueError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        position, last_pk = int(data['r']), data['p']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError(cursor)
+    if position < 0 or (last_pk is not None and not isinstance(last_pk, int)):
+        raise ValueError(cursor)
+    return position, last_pk
+
+
+@api_view(['GET'])
+def recommendations_api(request):
+    """
+    Endpoint API con las recomendaciones de un usuario en un curso, en JSON.
+    Con el token de un lanzamiento ("token") devuelve las del usuario y el curso del token;
+    los usuarios staff pueden pedir las de cualquiera con user_id y context_id. Sin token ni
+    sesión de staff responde 403.
+    Parámetros: fields (p. ej. "title,url"), page_size y cursor.
+    La respuesta incluye "next": la URL de la página siguiente ("ver más") o null.
+    """
+    query = RecommendationQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = query.validated_data
+
+    if 'token' in request.query_params or not request.user.is_staff:
+        launch, forbidden = launch_from_request(request)
+        if forbidden is not None:
+            return forbidden
+        user_id, context_id, _ = launch
+    elif params.get('user_id') and params.get('context_id'):
+        user_id, context_id = params['user_id'], params['context_id']
+    else:
+        return Response({'error': 'Se requieren user_id y context_id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    position, last_pk = 0, None
+    if params.get('cursor'):
+        try:
+            position, last_pk = _decode_cursor(params['cursor'])
+        except ValueError:
+            return Response({'cursor': ['Cursor no válido.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    ranked_pks = rec_cache.get_or_compute(
+        user_id, context_id,
+        lambda: ranked_resource_pks(user_id, context_id, get_setting('RECOMMENDATION_API_MAX_RANKED')),
+        variant='ranked',
+    )
+    items, position, last_pk = recommendation_page(
+        ranked_pks, context_id, position, last_pk,
+        params.get('page_size') or get_setting('RECOMMENDATION_COUNT'),
+        params.get('fields') or DEFAULT_FIELDS,
+    )
+    next_url = None
+    if position is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', _encode_cursor(position, last_pk))
+    return Response({'results': items, 'next': next_url})
+
+
+@api_view(['GET'])
+def resource_similar(request, pk):
+    """
+    Endpoint API "más como este": recursos parecidos a uno dado según el índice ANN
+    (ver ann_index.py). Con el token de un lanzamiento ("token") solo se devuelven recursos
+    del curso del lanzamiento; los usuarios staff ven los del curso del recurso.
+    Parámetros: fields y limit.
+    """
+    query = SimilarResourcesQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = query.validated_data
+
+    resource_context = EducationalResource.objects.filter(pk=pk).values_list('lti_context_id', flat=True)
+    if not resource_context:
+        return Response({'error': 'El recurso no existe.'}, status=status.HTTP_404_NOT_FOUND)
+    if 'token' in request.query_params or not request.user.is_staff:
+        launch, forbidden = launch_from_request(request)
+        if forbidden is not None:
+            return forbidden
+        context_id = launch[1]
+        if resource_context[0] not in (context_id, None):
+            return Response({'error': 'El recurso no existe.'}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        context_id = resource_context[0]
+
+    items = similar_resources(
+        pk, context_id, params.get('limit') or get_setting('RECOMMENDATION_COUNT'),
+        params.get('fields') or DEFAULT_FIELDS,
+    )
+    return Response({'results': items})
+
+
+@api_view(['GET'])
+def interaction_history(request):
+    """
+    Endpoint API con el historial de interacciones de un usuario en un curso, de la más
+    reciente a la más antigua. El usuario y el curso son los del token del lanzamiento
+    ("token"); sin token válido responde 403. Parámetros: page_size, cursor y compact
+    (solo resource_id e interaction_type). "next" es la URL de la página siguiente o null.
+    """
+    launch, forbidden = launch_from_request(request)
+    if forbidden is not None:
+        return forbidden
+    user_id, context_id, _ = launch
+
+    query = HistoryQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = query.validated_data
+
+    after = None
+    if params.get('cursor'):
+        try:
+            after = history.decode_cursor(params['cursor'])
+        except ValueError:
+            return Response({'cursor': ['Cursor no válido.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    items, next_cursor = history.history_page(
+        user_id, context_id,
+        params.get('page_size') or get_setting('HISTORY_PAGE_SIZE'),
+        after=after, compact=params['compact'],
+    )
+    next_url = None
+    if next_cursor is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+    return Response({'results': items, 'next': next_url})